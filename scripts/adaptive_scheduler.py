@@ -0,0 +1,156 @@
+"""Latency-budget scheduling for the per-camera detection workers.
+
+An ``AdaptiveScheduler`` replaces the fixed ``TARGET_FPS`` /
+``PROCESS_EVERY_N_FRAMES`` / ``time.sleep(0.033)`` settings. The worker reports
+the processing latency of every processed frame with ``record()``. When the
+smoothed latency exceeds the camera's budget, the scheduler moves one step down a
+quality ladder: first the detection resolution is reduced (down to
+``ADAPTIVE_MIN_SCALE``), then fewer frames are processed (up to every
+``ADAPTIVE_MAX_EVERY`` frames). When latency falls well below the budget, it
+steps back up. A worker whose decisions depend on a steady frame rate while its
+subject is in view (the gesture SOS vote) passes ``active_max_every``: while
+active, frames are never skipped beyond that, and only the scale adapts. Separately, the output rate follows the scene: ``active_fps``
+while a face or hand was seen in the last ``ADAPTIVE_IDLE_AFTER`` seconds, and
+``ADAPTIVE_IDLE_FPS`` when the scene is empty.
+
+``ADAPTIVE_SCHEDULER=0`` keeps the configured settings fixed (only the
+active/idle frame rate still applies if ``ADAPTIVE_IDLE_FPS`` is set).
+"""
+
+import os
+import threading
+import time
+
+import metrics
+
+EWMA_ALPHA = 0.2
+SAMPLES_PER_STEP = 5  # processed frames between two ladder moves
+SCALE_STEP = 0.8
+
+
+def _camera_env(name, camera, default):
+    value = os.environ.get(f"{name}_{str(camera).upper()}")
+    if value is None:
+        value = os.environ.get(name, default)
+    return value
+
+
+class AdaptiveScheduler:
+    """Per-camera controller for process-every-N, detection scale and output FPS"""
+
+    def __init__(self, camera, budget_ms=100.0, active_fps=20.0, base_every=1, active_max_every=None,
+                 log_prefix="[Scheduler]"):
+        self.camera = camera
+        self.log_prefix = log_prefix
+        self.enabled = os.environ.get('ADAPTIVE_SCHEDULER', '1') != '0'
+        # ADAPTIVE_BUDGET_MS_<CAMERA> overrides ADAPTIVE_BUDGET_MS for one camera
+        self.budget = float(_camera_env('ADAPTIVE_BUDGET_MS', camera, budget_ms)) / 1000.0
+        self.active_fps = float(_camera_env('ADAPTIVE_ACTIVE_FPS', camera, active_fps))
+        idle_default = 5.0 if self.enabled else self.active_fps
+        self.idle_fps = float(_camera_env('ADAPTIVE_IDLE_FPS', camera, idle_default))
+        self.idle_after = float(os.environ.get('ADAPTIVE_IDLE_AFTER', 3.0))
+        min_scale = float(os.environ.get('ADAPTIVE_MIN_SCALE', 0.5))
+        max_every = max(base_every, int(os.environ.get('ADAPTIVE_MAX_EVERY', 4)))
+        self.active_max_every = max(base_every, active_max_every) if active_max_every else None
+
+        # Quality ladder from best to cheapest: shrink the detection input first, then skip frames
+        self.ladder = [(1.0, base_every)]
+        scale = 1.0
+        while self.enabled and scale * SCALE_STEP >= min_scale - 1e-6:
+            scale *= SCALE_STEP
+            self.ladder.append((round(scale, 3), base_every))
+        every = base_every
+        while self.enabled and every < max_every:
+            every += 1
+            self.ladder.append((self.ladder[-1][0], every))
+
+        self.lock = threading.Lock()
+        self.level = 0
+        self.latency = None  # EWMA, seconds
+        self.samples_since_step = 0
+        self.frame_idx = 0
+        self.last_active = 0.0
+        self._export()
+
+    @property
+    def scale(self):
+        """Factor to apply to the configured detection/processing resolution"""
+        return self.ladder[self.level][0]
+
+    @property
+    def every(self):
+        every = self.ladder[self.level][1]
+        if self.active_max_every and self.active:
+            every = min(every, self.active_max_every)
+        return every
+
+    def _top_level(self, now):
+        """Cheapest ladder level allowed right now (caller holds the lock)"""
+        if self.active_max_every and now - self.last_active <= self.idle_after:
+            return max(i for i, (_, every) in enumerate(self.ladder) if every <= self.active_max_every)
+        return len(self.ladder) - 1
+
+    @property
+    def active(self):
+        return time.time() - self.last_active <= self.idle_after
+
+    @property
+    def fps(self):
+        return self.active_fps if self.active else self.idle_fps
+
+    def should_process(self):
+        """Call once per frame: True on the frames that should run the expensive model"""
+        with self.lock:
+            process = self.frame_idx % self.every == 0
+            self.frame_idx += 1
+            return process
+
+    def record(self, seconds, subject_present=False, now=None):
+        """Report the processing latency of one processed frame and whether a face / hand was in it"""
+        now = time.time() if now is None else now
+        with self.lock:
+            if subject_present:
+                self.last_active = now
+            self.latency = seconds if self.latency is None else \
+                EWMA_ALPHA * seconds + (1.0 - EWMA_ALPHA) * self.latency
+            self.samples_since_step += 1
+            if not self.enabled or self.samples_since_step < SAMPLES_PER_STEP:
+                return
+            step = 0
+            if self.latency > self.budget and self.level < self._top_level(now):
+                step = 1
+            elif self.latency < 0.5 * self.budget and self.level > 0:
+                step = -1
+            if step:
+                self.level += step
+                self.samples_since_step = 0
+                print(f"{self.log_prefix} {self.camera}: latency {self.latency * 1000:.0f} ms vs budget "
+                      f"{self.budget * 1000:.0f} ms -> scale {self.scale:g}, every {self.every} frame(s)")
+
+    def delay(self, started):
+        """Seconds to sleep after a frame that started at ``started`` (perf_counter) to hold the current FPS"""
+        fps = self.fps
+        if fps <= 0:
+            return 0.0
+        return max(0.0, 1.0 / fps - (time.perf_counter() - started))
+
+    def pace(self, started):
+        wait = self.delay(started)
+        if wait > 0:
+            time.sleep(wait)
+
+    def _export(self):
+        # Gauges are read at scrape time, so registering them once is enough
+        metrics.set_gauge('vision_scheduler_scale', lambda: self.scale, camera=self.camera)
+        metrics.set_gauge('vision_scheduler_every', lambda: self.every, camera=self.camera)
+        metrics.set_gauge('vision_scheduler_fps', lambda: self.fps, camera=self.camera)
+
+    def snapshot(self):
+        return {
+            "mode": "active" if self.active else "idle",
+            "fps": self.fps,
+            "every": self.every,
+            "scale": self.scale,
+            "latency_ms": round(self.latency * 1000.0, 1) if self.latency is not None else None,
+            "budget_ms": self.budget * 1000.0,
+        }
@@ -0,0 +1,59 @@
+"""Helpers shared by the bench_* and benchmark_pipelines scripts.
+
+Every benchmark takes ``--json`` to write its results, and the ones that replay
+recorded input take ``--images`` / ``--video`` / ``--max-frames``.
+"""
+
+import argparse
+import json
+import os
+
+import cv2
+
+from image_io import IMAGE_EXTENSIONS
+
+DEFAULT_IMAGES = os.path.join(os.path.dirname(__file__), '..', 'registered_faces')
+
+
+def bench_parser():
+    """Argument parser with the ``--json`` option every benchmark has"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--json', help='write results to this file')
+    return parser
+
+
+def add_frame_args(parser, max_frames):
+    """Add ``--images`` / ``--video`` / ``--max-frames`` for scripts that replay recorded frames"""
+    parser.add_argument('--images', default=DEFAULT_IMAGES)
+    parser.add_argument('--video', help='replay this clip instead of --images')
+    parser.add_argument('--max-frames', type=int, default=max_frames)
+
+
+def load_frames(args):
+    """BGR frames from ``args.video``, or from the images under ``args.images``, up to ``args.max_frames``"""
+    frames = []
+    if args.video:
+        cap = cv2.VideoCapture(args.video)
+        while len(frames) < args.max_frames:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames.append(frame)
+        cap.release()
+    else:
+        for root, _, files in os.walk(args.images):
+            for filename in sorted(files):
+                if filename.lower().endswith(IMAGE_EXTENSIONS) and len(frames) < args.max_frames:
+                    frame = cv2.imread(os.path.join(root, filename))
+                    if frame is not None:
+                        frames.append(frame)
+    return frames
+
+
+def write_json(path, results):
+    """Write ``results`` to ``path`` when ``--json`` was given"""
+    if not path:
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {path}")
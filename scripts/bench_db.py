@@ -0,0 +1,88 @@
+"""Registration insert throughput: connection per request vs the pooled db module.
+
+``connect`` mode reproduces the old handlers (new connection, SELECT on
+responders, INSERT, close); ``pool`` mode uses ``db.insert_registered_face``
+(pooled connection, one prepared INSERT ... SELECT). Rows are written with a
+``__bench__`` name prefix and deleted afterwards.
+
+Start the docker-compose MySQL first (``docker compose up -d mysql``), then:
+    python scripts/bench_db.py --requests 500 --clients 1,4,8
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import db
+from bench_common import bench_parser, write_json
+
+BENCH_PREFIX = "__bench__"
+
+
+def insert_with_new_connection(name, responder_id):
+    import mysql.connector
+    conn = mysql.connector.connect(**db.db_config())
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM responders WHERE id = %s", (responder_id,))
+    valid_responder = responder_id if cur.fetchone() else None
+    cur.execute("INSERT INTO registered_faces (name, responder_id, directory, images_count) VALUES (%s, %s, %s, %s)",
+                (name, valid_responder, "/tmp/bench", 4))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def insert_with_pool(name, responder_id):
+    db.insert_registered_face(name, responder_id, "/tmp/bench", 4)
+
+
+def run(mode, clients, requests, responder_id):
+    insert = insert_with_pool if mode == 'pool' else insert_with_new_connection
+
+    def one_request(i):
+        start = time.perf_counter()
+        insert(f"{BENCH_PREFIX}{mode}_{i}", responder_id)
+        return (time.perf_counter() - start) * 1000.0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        latencies = list(executor.map(one_request, range(requests)))
+    wall = time.perf_counter() - start
+    return {"mode": mode, "clients": clients, "requests": requests, "rps": requests / wall,
+            "p50_ms": float(np.percentile(latencies, 50)), "p95_ms": float(np.percentile(latencies, 95))}
+
+
+def cleanup():
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM registered_faces WHERE name LIKE %s", (BENCH_PREFIX + '%',))
+        conn.commit()
+        cur.close()
+
+
+def main():
+    parser = bench_parser()
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--clients', default='1,4,8')
+    parser.add_argument('--responder-id', type=int, default=1)
+    args = parser.parse_args()
+
+    config = db.db_config()
+    print(f"Benchmarking against {config['host']}:{config['port']}/{config['database']}")
+    print(f"{'mode':<9}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    rows = []
+    try:
+        for clients in [int(x) for x in args.clients.split(',') if x]:
+            for mode in ('connect', 'pool'):
+                row = run(mode, clients, args.requests, args.responder_id)
+                rows.append(row)
+                print(f"{mode:<9}{clients:>8}{row['rps']:>10.1f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}")
+    finally:
+        cleanup()
+
+    write_json(args.json, {"results": rows})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Recall-vs-latency benchmark of the IVF face index against exact matching.
+
+Builds a synthetic gallery that mimics dlib embeddings (identities ~0.9 apart,
+images of the same person ~0.3 apart) and compares the approximate gallery with
+the exact one for several nprobe values.
+
+Run with:
+    python scripts/bench_face_ann.py --people 5000 --queries 500 --nprobe 1,4,8,16
+"""
+
+import time
+
+import numpy as np
+
+from bench_common import bench_parser, write_json
+from face_gallery import FaceGallery
+
+
+def make_gallery(people, images_per_person, rng):
+    centers = rng.normal(size=(people, 128)).astype(np.float32) * 0.056
+    matrix = np.repeat(centers, images_per_person, axis=0)
+    matrix += rng.normal(size=matrix.shape).astype(np.float32) * 0.022
+    names = [f"person_{i:06d}" for i in range(people) for _ in range(images_per_person)]
+    return centers, names, matrix
+
+
+def time_matches(gallery, queries, batch):
+    start = time.perf_counter()
+    results = []
+    for i in range(0, len(queries), batch):
+        results.extend(gallery.match(queries[i:i + batch]))
+    elapsed = time.perf_counter() - start
+    return results, elapsed * 1000.0 / len(queries)
+
+
+def main():
+    parser = bench_parser()
+    parser.add_argument('--people', type=int, default=5000)
+    parser.add_argument('--images-per-person', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--batch', type=int, default=1, help='faces per match call (faces per frame)')
+    parser.add_argument('--nlist', type=int, default=0, help='IVF cells (0 = sqrt(N))')
+    parser.add_argument('--nprobe', default='1,4,8,16')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centers, names, matrix = make_gallery(args.people, args.images_per_person, rng)
+    truth = rng.integers(0, args.people, args.queries)
+    queries = centers[truth] + rng.normal(size=(args.queries, 128)).astype(np.float32) * 0.022
+
+    exact = FaceGallery(mode='exact')
+    exact.replace_all(names, names, matrix)
+    exact_results, exact_ms = time_matches(exact, queries, args.batch)
+    exact_acc = float(np.mean([r['person'] == f"person_{t:06d}" for r, t in zip(exact_results, truth)]))
+    print(f"Gallery: {len(names)} encodings, {args.people} people, {args.queries} queries, batch={args.batch}")
+    print(f"{'mode':<14}{'build ms':>10}{'ms/face':>10}{'recall@1':>10}{'accuracy':>10}")
+    print(f"{'exact':<14}{'-':>10}{exact_ms:>10.3f}{1.0:>10.3f}{exact_acc:>10.3f}")
+
+    rows = [{"mode": "exact", "ms_per_face": exact_ms, "recall": 1.0, "accuracy": exact_acc}]
+    for nprobe in [int(x) for x in args.nprobe.split(',') if x]:
+        start = time.perf_counter()
+        approx = FaceGallery(mode='ivf', ann_min_size=0, nlist=args.nlist, nprobe=nprobe)
+        approx.replace_all(names, names, matrix)
+        build_ms = (time.perf_counter() - start) * 1000.0
+        approx_results, approx_ms = time_matches(approx, queries, args.batch)
+        recall = float(np.mean([a['index'] == e['index'] for a, e in zip(approx_results, exact_results)]))
+        accuracy = float(np.mean([r['person'] == f"person_{t:06d}" for r, t in zip(approx_results, truth)]))
+        label = f"ivf/{nprobe}"
+        print(f"{label:<14}{build_ms:>10.1f}{approx_ms:>10.3f}{recall:>10.3f}{accuracy:>10.3f}")
+        rows.append({"mode": label, "nprobe": nprobe, "nlist": approx.snapshot().ann.centroids.shape[0],
+                     "build_ms": build_ms, "ms_per_face": approx_ms, "recall": recall, "accuracy": accuracy})
+
+    write_json(args.json, {"people": args.people, "encodings": len(names), "queries": args.queries, "results": rows})
+
+
+if __name__ == '__main__':
+    main()
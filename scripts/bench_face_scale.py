@@ -0,0 +1,59 @@
+"""Detection recall and latency of downscaled HOG face detection.
+
+Runs face detection at several scales over a directory of images (or frames of a
+video file) and compares the boxes against full-resolution detection: a face
+counts as recalled when a box at the reduced scale overlaps it with IoU >= 0.5.
+
+Run with:
+    python scripts/bench_face_scale.py --images registered_faces --scales 1.0,0.75,0.5,0.25
+    python scripts/bench_face_scale.py --video clip.mp4 --max-frames 200
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+from bench_common import add_frame_args, bench_parser, load_frames, write_json
+from face_detection import locate
+from face_tracker import box_iou
+
+
+def main():
+    parser = bench_parser()
+    add_frame_args(parser, max_frames=200)
+    parser.add_argument('--scales', default='1.0,0.75,0.5,0.35,0.25')
+    args = parser.parse_args()
+
+    frames = [np.ascontiguousarray(cv2.cvtColor(f, cv2.COLOR_BGR2RGB)) for f in load_frames(args)]
+    if not frames:
+        print("No frames to benchmark")
+        return
+    print(f"Benchmarking {len(frames)} frame(s), {frames[0].shape[1]}x{frames[0].shape[0]} first frame")
+
+    reference = [locate(rgb, scale=1.0) for rgb in frames]
+    total_ref = sum(len(r) for r in reference)
+    print(f"{'scale':>6}{'ms/frame':>10}{'faces':>8}{'recall':>9}")
+
+    rows = []
+    for scale in [float(x) for x in args.scales.split(',') if x]:
+        latencies = []
+        found = 0
+        recalled = 0
+        for rgb, ref in zip(frames, reference):
+            start = time.perf_counter()
+            boxes = locate(rgb, scale=scale)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            found += len(boxes)
+            recalled += sum(1 for r in ref if any(box_iou(r, b) >= 0.5 for b in boxes))
+        recall = recalled / total_ref if total_ref else 1.0
+        ms = float(np.mean(latencies))
+        print(f"{scale:>6.2f}{ms:>10.1f}{found:>8}{recall:>9.3f}")
+        rows.append({"scale": scale, "ms_per_frame": ms, "p95_ms": float(np.percentile(latencies, 95)),
+                     "faces": found, "recall": recall})
+
+    write_json(args.json, {"frames": len(frames), "reference_faces": total_ref, "results": rows})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Per-frame hand classification cost: per-landmark Python code vs the gesture classifier.
+
+``loop`` mode is the old ``GestureWorker`` code: ``is_sos_signal`` walking the
+landmark objects of each hand plus a ``points`` list built per landmark. The other
+modes convert each hand to a (21, 3) array once (the worker draws from it) and run
+every rule of the default classifier either hand by hand in plain Python
+(``per_hand``) or over all hands of the frame together with NumPy (``batched``).
+``gesture_classifier.BATCH_MIN_HANDS`` is the hand count from which ``batched``
+wins. Hands are random landmark sets shaped like MediaPipe results; every mode
+must agree on SOS.
+
+Run with:
+    python scripts/bench_gesture_classifier.py --frames 20000 --hands 1,2,4,8
+"""
+
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from bench_common import bench_parser, write_json
+from gesture_classifier import BATCH_MIN_HANDS, GestureClassifier, hands_array
+
+
+def legacy_is_sos_signal(hand_landmarks):
+    """The original per-landmark SOS rule, kept here as the reference"""
+    landmarks = hand_landmarks.landmark
+    fingers_up = 0
+    for tip, pip in zip([8, 12, 16, 20], [6, 10, 14, 18]):
+        if landmarks[tip].y < landmarks[pip].y:
+            fingers_up += 1
+    thumb_tip = landmarks[4]
+    index_tip = landmarks[8]
+    wrist = landmarks[0]
+
+    def dist(a, b):
+        return ((a.x - b.x) ** 2 + (a.y - b.y) ** 2) ** 0.5
+
+    thumb_tucked = dist(thumb_tip, wrist) < (0.75 * dist(index_tip, wrist))
+    return fingers_up == 4 and thumb_tucked
+
+
+def fake_results(rng, count, hands):
+    """MediaPipe-like result objects; about half the hands are drawn near an SOS pose"""
+    sos_pose = np.zeros((21, 3), dtype=np.float32)
+    sos_pose[:, 0] = np.linspace(0.4, 0.6, 21)
+    sos_pose[0, 1] = 0.9                      # wrist at the bottom
+    sos_pose[1:5, 1] = [0.8, 0.75, 0.7, 0.72]  # thumb folded in
+    for finger in range(4):
+        base = 5 + finger * 4
+        sos_pose[base:base + 4, 1] = [0.6, 0.5, 0.4, 0.3]  # MCP .. tip going up
+    results = []
+    for _ in range(count):
+        found = []
+        for _ in range(hands):
+            if rng.random() < 0.5:
+                points = sos_pose + rng.normal(0, 0.02, sos_pose.shape)
+            else:
+                points = rng.random((21, 3))
+            found.append(SimpleNamespace(landmark=[SimpleNamespace(x=float(x), y=float(y), z=float(z))
+                                                   for x, y, z in points]))
+        results.append(SimpleNamespace(multi_hand_landmarks=found))
+    return results
+
+
+def run_loop(results):
+    out = []
+    for result in results:
+        hands_out = []
+        for hand_landmarks in result.multi_hand_landmarks:
+            hands_out.append({"points": [(lm.x, lm.y) for lm in hand_landmarks.landmark],
+                              "is_sos": legacy_is_sos_signal(hand_landmarks)})
+        out.append([h["is_sos"] for h in hands_out])
+    return out
+
+
+def run_classifier(results, classifier):
+    out = []
+    for result in results:
+        hands = hands_array(result)
+        labels = classifier.classify(hands)
+        hands_out = [{"points": points[:, :2], "gesture": label, "is_sos": label == "sos"}
+                     for points, label in zip(hands, labels)]
+        out.append([h["is_sos"] for h in hands_out])
+    return out
+
+
+def main():
+    parser = bench_parser()
+    parser.add_argument('--frames', type=int, default=20000)
+    parser.add_argument('--hands', default='1,2,4,8')
+    args = parser.parse_args()
+
+    modes = {
+        'loop': run_loop,
+        'per_hand': lambda results: run_classifier(results, GestureClassifier(batch_min_hands=float('inf'))),
+        'batched': lambda results: run_classifier(results, GestureClassifier(batch_min_hands=1)),
+    }
+    rng = np.random.default_rng(0)
+    print(f"Default classifier: per_hand below {BATCH_MIN_HANDS} hands, batched from there")
+    print(f"{'hands':>6}{'mode':>12}{'us/frame':>10}{'speedup':>9}")
+    rows = []
+    for hands in [int(x) for x in args.hands.split(',') if x]:
+        results = fake_results(rng, args.frames, hands)
+        timings = {}
+        outputs = {}
+        for mode, fn in modes.items():
+            start = time.perf_counter()
+            outputs[mode] = fn(results)
+            timings[mode] = (time.perf_counter() - start) / args.frames * 1e6
+        mismatches = sum(any(a != out[i] for out in outputs.values()) for i, a in enumerate(outputs['loop']))
+        for mode in modes:
+            speedup = timings['loop'] / timings[mode]
+            print(f"{hands:>6}{mode:>12}{timings[mode]:>10.1f}{speedup:>8.2f}x")
+            rows.append({"hands": hands, "mode": mode, "us_per_frame": timings[mode], "speedup": speedup})
+        if mismatches:
+            print(f"  WARNING: {mismatches} frame(s) classified differently")
+
+    write_json(args.json, {"frames": args.frames, "results": rows})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Latency of /detect_frame-style hand detection: fresh graph per request vs HandsPool.
+
+Simulates concurrent clients in threads. In ``fresh`` mode every request builds
+its own static-image ``Hands`` graph (the old detect_frame behaviour); in
+``pool`` mode requests check an instance out of a ``HandsPool``.
+
+Run with:
+    python scripts/bench_hands_pool.py --image hand.jpg --clients 1,4,8 --requests 200
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from bench_common import bench_parser, write_json
+from hands_pool import PROCESS_WIDTH, HandsPool, static_hands_factory
+from image_io import fit_width
+
+
+def load_frame(path):
+    if path:
+        frame = cv2.imread(path)
+        if frame is None:
+            raise SystemExit(f"Could not read {path}")
+    else:
+        frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    frame = fit_width(frame, PROCESS_WIDTH)
+    return np.ascontiguousarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+
+def run(mode, rgb, clients, requests, pool_size):
+    factory = static_hands_factory()
+    pool = None
+    if mode == 'pool':
+        pool = HandsPool(factory, size=pool_size or clients)
+        pool.warm()
+
+    def one_request(_):
+        start = time.perf_counter()
+        if pool is not None:
+            pool.process(rgb)
+        else:
+            with factory() as hands:
+                hands.process(rgb)
+        return (time.perf_counter() - start) * 1000.0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        latencies = list(executor.map(one_request, range(requests)))
+    wall = time.perf_counter() - start
+    if pool is not None:
+        pool.close()
+    return {
+        "mode": mode, "clients": clients, "requests": requests,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "mean_ms": float(np.mean(latencies)),
+        "throughput_rps": requests / wall,
+    }
+
+
+def main():
+    parser = bench_parser()
+    parser.add_argument('--image', help='test image (default: random noise frame)')
+    parser.add_argument('--clients', default='1,4,8', help='concurrent client counts')
+    parser.add_argument('--requests', type=int, default=100, help='requests per run')
+    parser.add_argument('--pool-size', type=int, default=0, help='HandsPool size (0 = one per client)')
+    args = parser.parse_args()
+
+    rgb = load_frame(args.image)
+    print(f"{'mode':<8}{'clients':>8}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>10}")
+    rows = []
+    for clients in [int(x) for x in args.clients.split(',') if x]:
+        for mode in ('fresh', 'pool'):
+            row = run(mode, rgb, clients, args.requests, args.pool_size)
+            rows.append(row)
+            print(f"{mode:<8}{clients:>8}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['throughput_rps']:>10.1f}")
+
+    write_json(args.json, {"results": rows})
+
+
+if __name__ == '__main__':
+    main()
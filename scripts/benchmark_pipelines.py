@@ -0,0 +1,212 @@
+"""Offline throughput / latency / memory benchmark of the face and gesture pipelines.
+
+Replays a recorded clip or a directory of images (no camera needed) through:
+
+* ``face`` - colour conversion, HOG detection and encoding (inline or with
+  ``--workers`` detection processes, like ``FACE_WORKERS``) and matching against a
+  synthetic gallery of ``--gallery-size`` random encodings;
+* ``gesture`` - mirror/resize/convert, MediaPipe Hands in video mode and the
+  gesture classifier over every hand, like ``GestureWorker``.
+
+Per-stage latency comes from the same ``metrics`` timers the servers export on
+``/metrics``. Memory is the RSS of this process (detection worker processes
+are not included). Results can be written to JSON and compared with an earlier run:
+
+    python scripts/benchmark_pipelines.py --video clip.mp4 --json before.json
+    python scripts/benchmark_pipelines.py --video clip.mp4 --gallery-size 10000 --compare before.json
+    python scripts/benchmark_pipelines.py --images registered_faces --pipelines face --workers 4
+"""
+
+import collections
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import metrics
+from bench_common import add_frame_args, bench_parser, load_frames, write_json
+from face_detection import make_detector
+from face_gallery import ENCODING_DIM, FaceGallery
+from hands_pool import PROCESS_WIDTH
+from image_io import fit_width
+
+IMAGES_PER_PERSON = 4  # registration stores four images per person
+
+
+def rss_mb():
+    """(current, peak) resident set size in MB, None where the platform cannot tell"""
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        peak = getattr(info, 'peak_wset', None)  # Windows only
+        return info.rss / 1e6, (peak / 1e6 if peak else None)
+    except ImportError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak / 1e6 if sys.platform == 'darwin' else peak / 1e3  # bytes on macOS, KB on Linux
+    current = None
+    try:
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError, AttributeError):
+        pass
+    return current, peak
+
+
+def synthetic_gallery(size, mode, seed=0):
+    """Gallery of ``size`` random encodings with roughly the norm of real dlib encodings"""
+    rng = np.random.default_rng(seed)
+    matrix = rng.normal(0.0, 1.0 / np.sqrt(ENCODING_DIM), (size, ENCODING_DIM)).astype(np.float32)
+    names = [f"person_{i // IMAGES_PER_PERSON:06d}" for i in range(size)]
+    paths = [f"synthetic/{i}" for i in range(size)]
+    gallery = FaceGallery(mode=mode)
+    gallery.replace_all(names, paths, matrix)
+    return gallery
+
+
+def stage_report(camera):
+    """Per-stage latency (ms) recorded under ``camera`` since the registry was created"""
+    stages = {}
+    for row in metrics.REGISTRY.summary().get(metrics.STAGE_METRIC, []):
+        if row["labels"].get("camera") != camera:
+            continue
+        stages[row["labels"]["stage"]] = {
+            "count": row["count"],
+            "mean_ms": row["mean"] * 1000.0,
+            "p50_ms": row["p50"] * 1000.0,
+            "p95_ms": row["p95"] * 1000.0,
+            "p99_ms": row["p99"] * 1000.0,
+        }
+    return stages
+
+
+def run_face(frames, args):
+    camera = "bench_face"
+    gallery = synthetic_gallery(args.gallery_size, args.gallery_mode)
+    detector = make_detector(args.workers)
+    # Warm up (worker start-up, dlib model load) outside the timed run
+    detector.detect(np.ascontiguousarray(cv2.cvtColor(frames[0], cv2.COLOR_BGR2RGB)), scale=args.scale)
+
+    faces = 0
+    in_flight = collections.deque()
+    depth = max(1, args.workers)
+
+    def finish():
+        nonlocal faces
+        locations, encodings = in_flight.popleft().result()
+        with metrics.stage_timer('match', camera=camera):
+            gallery.match(encodings, tolerance=args.tolerance)
+        faces += len(locations)
+
+    start = time.perf_counter()
+    for frame in frames:
+        with metrics.stage_timer('convert', camera=camera):
+            rgb = np.ascontiguousarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        in_flight.append(detector.submit(rgb, scale=args.scale, camera=camera))
+        if len(in_flight) >= depth:
+            finish()
+    while in_flight:
+        finish()
+    wall = time.perf_counter() - start
+    detector.shutdown()
+    return {"wall_s": wall, "fps": len(frames) / wall, "faces": faces,
+            "gallery_size": len(gallery), "gallery_mode": args.gallery_mode,
+            "workers": args.workers, "scale": args.scale, "stages": stage_report(camera)}
+
+
+def run_gesture(frames, args):
+    import mediapipe as mp
+    from gesture_classifier import CLASSIFIER, hands_array
+
+    camera = "bench_gesture"
+    hands_found = 0
+    sos_frames = 0
+    with mp.solutions.hands.Hands(static_image_mode=False, max_num_hands=2,
+                                  min_detection_confidence=0.5, min_tracking_confidence=0.5) as hands:
+        start = time.perf_counter()
+        for frame in frames:
+            with metrics.stage_timer('preprocess', camera=camera):
+                frame = fit_width(cv2.flip(frame, 1), PROCESS_WIDTH)
+                rgb = np.ascontiguousarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            with metrics.stage_timer('hands', camera=camera):
+                results = hands.process(rgb)
+            with metrics.stage_timer('classify', camera=camera):
+                hand_points = hands_array(results)
+                labels = CLASSIFIER.classify(hand_points)
+            hands_found += len(labels)
+            sos_frames += "sos" in labels
+        wall = time.perf_counter() - start
+    return {"wall_s": wall, "fps": len(frames) / wall, "hands": hands_found, "sos_frames": sos_frames,
+            "stages": stage_report(camera)}
+
+
+def print_result(name, result, baseline=None):
+    def delta(new, old):
+        if old is None or not old:
+            return ""
+        return f" ({(new - old) / old * 100.0:+.1f}%)"
+
+    base = baseline or {}
+    print(f"\n[{name}] {result['fps']:.2f} frames/s{delta(result['fps'], base.get('fps'))}, "
+          f"peak RSS {result['peak_rss_mb'] or float('nan'):.0f} MB")
+    print(f"  {'stage':<12}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, row in result["stages"].items():
+        old = base.get("stages", {}).get(stage, {})
+        print(f"  {stage:<12}{row['count']:>7}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+              f"{delta(row['p95_ms'], old.get('p95_ms'))}")
+
+
+def main():
+    parser = bench_parser()
+    add_frame_args(parser, max_frames=300)
+    parser.add_argument('--pipelines', default='face,gesture')
+    parser.add_argument('--gallery-size', type=int, default=1000)
+    parser.add_argument('--gallery-mode', choices=('exact', 'ivf'), default='exact')
+    parser.add_argument('--tolerance', type=float, default=0.6)
+    parser.add_argument('--workers', type=int, default=0, help='face detection processes (0 = inline)')
+    parser.add_argument('--scale', type=float, default=1.0, help='face detection scale')
+    parser.add_argument('--compare', help='print changes against results from an earlier --json run')
+    args = parser.parse_args()
+
+    frames = load_frames(args)
+    if not frames:
+        print("No frames to benchmark")
+        return
+    print(f"Replaying {len(frames)} frame(s), {frames[0].shape[1]}x{frames[0].shape[0]} first frame")
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f).get("pipelines", {})
+
+    runners = {"face": run_face, "gesture": run_gesture}
+    results = {}
+    for name in [p.strip() for p in args.pipelines.split(',') if p.strip()]:
+        if name not in runners:
+            raise SystemExit(f"Unknown pipeline {name!r}; choose from {', '.join(runners)}")
+        result = runners[name](frames, args)
+        result["rss_mb"], result["peak_rss_mb"] = rss_mb()
+        results[name] = result
+        print_result(name, result, baseline.get(name))
+
+    write_json(args.json, {
+        "source": args.video or args.images,
+        "frames": len(frames),
+        "frame_size": [frames[0].shape[1], frames[0].shape[0]],
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.time(),
+        "pipelines": results,
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""Per-camera capture and detection pipelines for servers that cover several cameras.
+
+A server lists its cameras in one variable (``FACE_CAMERAS``, ``GESTURE_CAMERAS``):
+comma-separated ``id=source`` entries, where source is anything ``CAMERA_SOURCE``
+accepts, or ``db`` for every row of the ``cameras`` table with a ``stream_url``.
+Each camera becomes a ``CameraPipeline`` with its own FrameHub, detection worker
+and JPEG cache; whatever the worker factory closes over (gallery, detector, SOS
+dispatcher) is shared by all of them. When the variable is empty the server has a
+single camera named after itself, opened from ``CAMERA_SOURCE_<NAME>`` on first
+use as before.
+"""
+
+import os
+import re
+import threading
+import time
+
+from frame_hub import FrameHub, JpegCache
+from frame_sources import open_source
+
+# How often the supervisor restarts capture threads that gave up (and re-reads the cameras table)
+CAMERA_SUPERVISE_SECONDS = float(os.environ.get('CAMERA_SUPERVISE_SECONDS', 15))
+
+
+def parse_cameras(value, default_id):
+    """(id, source spec, display name, location) of every camera in a FACE_CAMERAS-style value"""
+    value = (value or '').strip()
+    if not value:
+        # Single-camera mode: CAMERA_SOURCE_<DEFAULT_ID> / CAMERA_SOURCE (default: probe local cameras)
+        return [(default_id, None, default_id, None)]
+    if value.lower() == 'db':
+        import db
+        return [(str(row['id']), row['stream_url'], row.get('name') or str(row['id']), row.get('location'))
+                for row in db.list_cameras()]
+    configs = []
+    for idx, entry in enumerate(e.strip() for e in value.split(',')):
+        if not entry:
+            continue
+        camera_id, sep, spec = entry.partition('=')
+        camera_id = camera_id.strip()
+        if not sep or not re.fullmatch(r'[\w.-]+', camera_id):
+            # A bare source (an '=' inside a URL query does not name it); db:<id> keeps the table id
+            spec = entry
+            camera_id = entry[3:].strip() if entry.lower().startswith('db:') else f"cam{idx + 1}"
+        configs.append((camera_id, spec.strip(), camera_id, None))
+    return configs
+
+
+class CameraPipeline:
+    """Capture thread, detection worker and stream cache of one camera"""
+
+    def __init__(self, camera_id, spec, name, location, worker_factory, render, log_prefix, device_kwargs=None):
+        self.id = camera_id
+        self.spec = spec  # None: CAMERA_SOURCE_<ID> / CAMERA_SOURCE
+        self.name = name
+        self.location = location
+        self.worker_factory = worker_factory
+        self.render = render
+        self.log_prefix = log_prefix
+        self.device_kwargs = device_kwargs or {}
+        self.lock = threading.Lock()
+        self.source = None
+        self.hub = None
+        self.worker = None
+        self.jpeg_cache = JpegCache(camera=camera_id)
+
+    @property
+    def running(self):
+        hub = self.hub
+        return hub is not None and hub.is_alive()
+
+    def get_hub(self):
+        """Start (once) the capture thread and its detection worker; None if the source cannot be opened"""
+        with self.lock:
+            if self.hub is not None and self.hub.is_alive():
+                return self.hub
+            # First use, or the capture thread gave up on the source (and released it): open it again
+            self.hub = None
+            self.source = open_source(self.id, log_prefix=self.log_prefix, spec=self.spec, **self.device_kwargs)
+            if self.source is None:
+                return None
+            self.hub = FrameHub(self.source, name=self.id, log_prefix=self.log_prefix).start()
+            self.worker = self.worker_factory(self.hub, self).start()
+            return self.hub
+
+    def stop(self):
+        """Stop the capture thread (which releases the source); the detection worker ends with it"""
+        with self.lock:
+            if self.hub is not None:
+                self.hub.stop()
+            elif self.source is not None:
+                try:
+                    self.source.release()
+                except Exception:
+                    pass
+            self.hub = None
+            self.source = None
+
+    def status(self):
+        source = self.source
+        return {
+            "id": self.id,
+            "name": self.name,
+            "location": self.location,
+            "source": source.describe() if source is not None else None,
+            "running": self.running,
+        }
+
+    def annotated_jpeg(self, captured):
+        """JPEG of a captured frame with the worker's latest result drawn on it, encoded once per (frame, result)"""
+        result_seq, result = self.worker.results.latest()
+        return self.jpeg_cache.get((captured.seq, result_seq), lambda: self.render(captured, result))
+
+    def generate_frames(self):
+        """Generate MJPEG parts annotated with the worker's latest result"""
+        hub = self.get_hub()
+        if hub is None:
+            return
+        scheduler = self.worker.scheduler
+
+        for captured in hub.frames():
+            start = time.perf_counter()
+            frame_bytes = self.annotated_jpeg(captured)
+
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+
+            # Stream at the camera's current rate (active FPS with a subject in view, ADAPTIVE_IDLE_FPS otherwise)
+            scheduler.pace(start)
+
+        print(f"{self.log_prefix} Failed to read frame")
+
+
+class CameraRegistry:
+    """The cameras one server covers, keyed by id, with a supervisor that keeps them running"""
+
+    def __init__(self, config, default_id, log_prefix, worker_factory, render, **device_kwargs):
+        self.config = (config or '').strip()
+        self.default_id = default_id
+        self.log_prefix = log_prefix
+        self.worker_factory = worker_factory
+        self.render = render
+        self.device_kwargs = device_kwargs
+        self.lock = threading.Lock()
+        self.cameras = {}  # camera id -> CameraPipeline; replaced as a whole, so readers never see a partial dict
+        self.supervisor = None
+
+    @property
+    def multi(self):
+        return bool(self.config)
+
+    def _camera_prefix(self, camera_id):
+        # "[Facial Recognition]" for the single default camera, "[Facial Recognition gate]" otherwise
+        if camera_id == self.default_id:
+            return self.log_prefix
+        return f"{self.log_prefix[:-1]} {camera_id}]"
+
+    def load(self):
+        """Create / update the pipelines from the configuration; cameras no longer configured are stopped"""
+        try:
+            configs = parse_cameras(self.config, self.default_id)
+        except Exception as e:
+            print(f"{self.log_prefix} Failed to load cameras ({self.config}): {e}")
+            return self.cameras
+        removed = []
+        with self.lock:
+            updated = {}
+            for camera_id, spec, name, location in configs:
+                current = self.cameras.get(camera_id)
+                if current is not None and current.spec == spec:
+                    current.name = name
+                    current.location = location
+                    updated[camera_id] = current
+                    continue
+                if current is not None:
+                    removed.append(current)
+                updated[camera_id] = CameraPipeline(camera_id, spec, name, location, self.worker_factory,
+                                                    self.render, self._camera_prefix(camera_id), self.device_kwargs)
+            removed.extend(p for camera_id, p in self.cameras.items() if camera_id not in updated)
+            self.cameras = updated
+        for pipeline in removed:
+            print(f"{self.log_prefix} Camera {pipeline.id} removed or changed, stopping it")
+            pipeline.stop()
+        return self.cameras
+
+    def get(self, camera_id=None):
+        """Pipeline of ``camera_id`` (default: the first configured camera); None if there is no such camera"""
+        current = self.cameras or self.load()
+        if camera_id is None:
+            return next(iter(current.values()), None)
+        return current.get(str(camera_id))
+
+    def pipelines(self):
+        return list(self.cameras.values())
+
+    def _supervise(self):
+        while True:
+            if self.config.lower() == 'db':
+                self.load()
+            for pipeline in self.pipelines():
+                if not pipeline.running:
+                    try:
+                        pipeline.get_hub()
+                    except Exception as e:
+                        print(f"{pipeline.log_prefix} Failed to start camera: {e}")
+            time.sleep(CAMERA_SUPERVISE_SECONDS)
+
+    def start_supervisor(self):
+        """Start every camera now and keep them running: restart capture threads that gave up, follow the table"""
+        if self.supervisor is None:
+            self.load()
+            print(f"{self.log_prefix} Serving {len(self.cameras)} camera(s): {', '.join(self.cameras)}")
+            self.supervisor = threading.Thread(target=self._supervise, name="camera-supervisor", daemon=True)
+            self.supervisor.start()
+        return self.supervisor
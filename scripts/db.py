@@ -0,0 +1,199 @@
+"""Pooled MySQL access for the vision servers.
+
+``.env`` is loaded once at import and connections come from one module-level
+``mysql.connector`` pool instead of a fresh TCP connection (and handshake) per
+request. Settings come from ``DB_HOST`` / ``DB_USER`` / ``DB_PASS`` / ``DB_NAME``
+and fall back to the ``MYSQL_*`` variables used by docker-compose.
+
+The connector is optional: every helper raises if it is missing or the database
+is unreachable, and callers keep their existing best-effort ``try/except``.
+"""
+
+import base64
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+import metrics
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+# Responder validation and the insert in one statement: an unknown responder_id becomes NULL
+# (the FK would reject it) without a separate SELECT round trip.
+INSERT_REGISTERED_FACE = (
+    "INSERT INTO registered_faces (name, responder_id, directory, images_count, face_encoding) "
+    "SELECT %s, (SELECT id FROM responders WHERE id = %s), %s, %s, %s"
+)
+SELECT_FACE_ENCODINGS = (
+    "SELECT id, name, face_encoding FROM registered_faces "
+    "WHERE face_encoding IS NOT NULL AND face_encoding <> '' AND (is_active IS NULL OR is_active)"
+)
+SELECT_CAMERA = "SELECT id, name, location, stream_url, status FROM cameras WHERE id = %s"
+LIST_CAMERAS = (
+    "SELECT id, name, location, stream_url, status FROM cameras "
+    "WHERE stream_url IS NOT NULL AND stream_url <> '' ORDER BY id"
+)
+LIST_REGISTERED_FACES = (
+    "SELECT id, name, responder_id, directory, images_count, created_at "
+    "FROM registered_faces ORDER BY created_at DESC"
+)
+
+# face_encoding column format: base64 of little-endian float32 rows, 128 values per image
+ENCODING_DIM = 128
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def db_config():
+    return {
+        "host": os.environ.get('DB_HOST') or os.environ.get('MYSQL_HOST', '127.0.0.1'),
+        "port": int(os.environ.get('DB_PORT') or os.environ.get('MYSQL_PORT', 3306)),
+        "user": os.environ.get('DB_USER') or os.environ.get('MYSQL_USER', 'root'),
+        "password": os.environ.get('DB_PASS') or os.environ.get('MYSQL_PASSWORD', ''),
+        "database": os.environ.get('DB_NAME') or os.environ.get('MYSQL_DATABASE', 'bantaybuhay'),
+    }
+
+
+def get_pool():
+    """Create (once) the shared connection pool (DB_POOL_SIZE connections, default 5)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from mysql.connector import pooling
+            config = db_config()
+            print(f"[Database] Opening connection pool to {config['host']}/{config['database']} as {config['user']}")
+            _pool = pooling.MySQLConnectionPool(
+                pool_name="bantaybuhay",
+                pool_size=int(os.environ.get('DB_POOL_SIZE', 5)),
+                pool_reset_session=False,
+                **config
+            )
+        return _pool
+
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection (a direct one if the pool is exhausted); closing returns it to the pool"""
+    import mysql.connector
+    try:
+        conn = get_pool().get_connection()
+    except mysql.connector.errors.PoolError:
+        print("[Database] Connection pool exhausted; opening a direct connection")
+        conn = mysql.connector.connect(**db_config())
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def encodings_to_text(encodings):
+    """Pack face encodings (one per image) into the face_encoding column format"""
+    matrix = np.asarray(encodings, dtype='<f4').reshape(-1, ENCODING_DIM)
+    return base64.b64encode(matrix.tobytes()).decode('ascii')
+
+
+def encodings_from_text(text):
+    """Unpack a face_encoding column value into an (n, 128) float32 matrix"""
+    data = base64.b64decode(text)
+    return np.frombuffer(data, dtype='<f4').reshape(-1, ENCODING_DIM).astype(np.float32)
+
+
+def insert_registered_face(name, responder_id, directory, images_count, encodings=None):
+    """Insert a registered_faces row (with its packed encodings, if any) in one round trip; returns the new id"""
+    face_encoding = encodings_to_text(encodings) if encodings is not None and len(encodings) else None
+    with metrics.stage_timer('db_insert'), connection() as conn:
+        cur = conn.cursor(prepared=True)
+        try:
+            cur.execute(INSERT_REGISTERED_FACE, (name, responder_id, directory, images_count, face_encoding))
+            conn.commit()
+            return cur.lastrowid
+        finally:
+            cur.close()
+
+
+def list_registered_faces():
+    with connection() as conn:
+        cur = conn.cursor(dictionary=True)
+        try:
+            cur.execute(LIST_REGISTERED_FACES)
+            return cur.fetchall()
+        finally:
+            cur.close()
+
+
+def get_camera(camera_id):
+    """Row of the cameras table as a dict (None if there is no such camera)"""
+    with connection() as conn:
+        cur = conn.cursor(dictionary=True)
+        try:
+            cur.execute(SELECT_CAMERA, (camera_id,))
+            return cur.fetchone()
+        finally:
+            cur.close()
+
+
+def list_cameras():
+    """Rows of the cameras table that have a stream_url, as dicts ordered by id"""
+    with connection() as conn:
+        cur = conn.cursor(dictionary=True)
+        try:
+            cur.execute(LIST_CAMERAS)
+            return cur.fetchall()
+        finally:
+            cur.close()
+
+
+def registered_faces_status():
+    """Return (table_exists, row_count) for registered_faces"""
+    with connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("SHOW TABLES LIKE 'registered_faces'")
+            table_exists = cur.fetchone() is not None
+            rows_count = None
+            if table_exists:
+                cur.execute("SELECT COUNT(*) FROM registered_faces")
+                rows_count = cur.fetchone()[0]
+            return table_exists, rows_count
+        finally:
+            cur.close()
+
+
+def face_gallery_rows(names=None):
+    """Load (names, paths, matrix) of every stored encoding (optionally only for ``names``) in one query.
+
+    ``paths`` are ``db:<row id>/<image index>`` so rows stay distinguishable in the gallery.
+    """
+    sql = SELECT_FACE_ENCODINGS
+    params = ()
+    if names:
+        names = sorted(names)
+        sql += " AND name IN (" + ", ".join(["%s"] * len(names)) + ")"
+        params = tuple(names)
+    with connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(sql + " ORDER BY name, id", params)
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+
+    out_names, paths, blocks = [], [], []
+    for row_id, name, text in rows:
+        try:
+            matrix = encodings_from_text(text)
+        except Exception as e:
+            print(f"[Database] Skipping unreadable face_encoding in registered_faces row {row_id}: {e}")
+            continue
+        out_names.extend([name] * len(matrix))
+        paths.extend(f"db:{row_id}/{i}" for i in range(len(matrix)))
+        blocks.append(matrix)
+    matrix = np.concatenate(blocks) if blocks else np.zeros((0, ENCODING_DIM), dtype=np.float32)
+    return out_names, paths, matrix
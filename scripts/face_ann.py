@@ -0,0 +1,122 @@
+"""Approximate nearest-neighbour search for 128-d face encodings (pure NumPy).
+
+``IVFIndex`` is an inverted-file index: a small k-means coarse quantizer splits
+the gallery into ``nlist`` cells and a query only computes exact distances
+against the rows of its ``nprobe`` closest cells. With thousands of identities
+this touches a few percent of the gallery per face instead of all of it.
+
+Training the quantizer is the expensive part; ``rebucket`` reuses trained
+centroids for a changed gallery and only reassigns its rows.
+"""
+
+import numpy as np
+
+
+def _sq_dists(queries, points, point_sq_norms=None):
+    """Squared euclidean distances (queries x points) via one matrix product"""
+    if point_sq_norms is None:
+        point_sq_norms = np.einsum('ij,ij->i', points, points)
+    q_sq = np.einsum('ij,ij->i', queries, queries)
+    sq = q_sq[:, None] + point_sq_norms[None, :] - 2.0 * (queries @ points.T)
+    np.maximum(sq, 0.0, out=sq)
+    return sq
+
+
+class IVFIndex:
+    """Inverted-file index with a k-means coarse quantizer"""
+
+    def __init__(self, nlist=0, nprobe=8, iterations=10, seed=0, dim=128):
+        self.dim = dim
+        self.nlist = nlist  # 0 = sqrt(N)
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids = None
+        self.centroid_sq_norms = None
+        self.list_offsets = None  # list i owns rows list_offsets[i]:list_offsets[i + 1] of the sorted arrays
+        self.sorted_rows = None  # original gallery row of every sorted position
+        self.sorted_matrix = None
+        self.sorted_sq_norms = None
+        self.size = 0
+        self.trained_size = 0  # gallery size the centroids were trained on
+
+    def build(self, matrix):
+        """Train the coarse quantizer on ``matrix`` and bucket every row"""
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32).reshape(-1, self.dim)
+        n = matrix.shape[0]
+        self.size = n
+        self.trained_size = n
+        if n == 0:
+            self.centroids = None
+            return self
+        nlist = self.nlist or int(round(np.sqrt(n)))
+        nlist = max(1, min(nlist, n))
+
+        rng = np.random.default_rng(self.seed)
+        centroids = matrix[rng.choice(n, nlist, replace=False)].copy()
+        assign = np.zeros(n, dtype=np.intp)
+        for _ in range(self.iterations):
+            assign = np.argmin(_sq_dists(matrix, centroids), axis=1)
+            counts = np.bincount(assign, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, matrix)
+            nonempty = counts > 0
+            centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+        self.centroids = centroids
+        self.centroid_sq_norms = np.einsum('ij,ij->i', centroids, centroids)
+        self._bucket(matrix)
+        return self
+
+    def rebucket(self, matrix):
+        """New index over ``matrix`` that reuses these trained centroids (no k-means)"""
+        index = IVFIndex(nlist=self.nlist, nprobe=self.nprobe, iterations=self.iterations, seed=self.seed,
+                         dim=self.dim)
+        index.centroids = self.centroids
+        index.centroid_sq_norms = self.centroid_sq_norms
+        index.trained_size = self.trained_size
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32).reshape(-1, self.dim)
+        index.size = matrix.shape[0]
+        if index.size:
+            index._bucket(matrix)
+        return index
+
+    def _bucket(self, matrix):
+        """Assign every row to its closest centroid and lay the rows out list by list"""
+        nlist = self.centroids.shape[0]
+        assign = np.argmin(_sq_dists(matrix, self.centroids, self.centroid_sq_norms), axis=1)
+        order = np.argsort(assign, kind='stable')
+        counts = np.bincount(assign, minlength=nlist)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.intp)
+        self.sorted_rows = order.astype(np.intp)
+        self.sorted_matrix = np.ascontiguousarray(matrix[order])
+        self.sorted_sq_norms = np.einsum('ij,ij->i', self.sorted_matrix, self.sorted_matrix)
+
+    def search(self, queries, nprobe=None):
+        """Return (best_rows, best_distances) for each query; rows index the built matrix"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        nq = queries.shape[0]
+        best_rows = np.full(nq, -1, dtype=np.intp)
+        best_dists = np.full(nq, np.inf, dtype=np.float32)
+        if self.size == 0 or nq == 0:
+            return best_rows, best_dists
+
+        nlist = self.centroids.shape[0]
+        nprobe = max(1, min(nprobe or self.nprobe, nlist))
+        coarse = _sq_dists(queries, self.centroids, self.centroid_sq_norms)
+        if nprobe < nlist:
+            probes = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            probes = np.broadcast_to(np.arange(nlist), (nq, nlist))
+
+        starts = self.list_offsets[:-1]
+        ends = self.list_offsets[1:]
+        for q in range(nq):
+            cells = probes[q]
+            positions = np.concatenate([np.arange(starts[c], ends[c]) for c in cells])
+            if positions.size == 0:
+                continue
+            sq = _sq_dists(queries[q:q + 1], self.sorted_matrix[positions], self.sorted_sq_norms[positions])[0]
+            k = int(np.argmin(sq))
+            best_rows[q] = self.sorted_rows[positions[k]]
+            best_dists[q] = np.sqrt(sq[k])
+        return best_rows, best_dists
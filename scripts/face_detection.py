@@ -0,0 +1,197 @@
+"""Face detection + encoding backends shared by the facial and registration servers.
+
+``InlineDetector`` runs dlib HOG detection and the ResNet embedding in the calling
+thread (the original behaviour). ``FaceDetectionPool`` runs the same jobs in N
+worker processes, each of which loads the dlib models once, so detection is no
+longer limited to one core by the GIL. Frames are handed to the workers through
+``multiprocessing.shared_memory`` instead of being pickled, and ``map()`` /
+in-order consumption of ``submit()`` futures keeps results in frame order.
+
+Pick a backend with ``make_detector(workers)``: 0 means inline.
+
+Detection can run on a downscaled copy of the frame (``scale`` < 1, see
+``detect_scale_for``); boxes are mapped back to full resolution and the
+embeddings are still computed on the full-resolution crops.
+"""
+
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+import metrics
+
+
+def detect_scale_for(camera_id=None):
+    """Detection scale for a camera: FACE_DETECT_SCALE_<CAMERA_ID>, else FACE_DETECT_SCALE, else 1.0"""
+    value = None
+    if camera_id is not None:
+        value = os.environ.get(f"FACE_DETECT_SCALE_{str(camera_id).upper()}")
+    if value is None:
+        value = os.environ.get('FACE_DETECT_SCALE', 1.0)
+    return min(1.0, max(0.05, float(value)))
+
+
+def scale_locations(locations, scale, shape):
+    """Map (top, right, bottom, left) boxes found at ``scale`` back to a full-resolution frame"""
+    height, width = shape[:2]
+    mapped = []
+    for top, right, bottom, left in locations:
+        mapped.append((
+            max(0, int(round(top / scale))),
+            min(width, int(round(right / scale))),
+            min(height, int(round(bottom / scale))),
+            max(0, int(round(left / scale))),
+        ))
+    return mapped
+
+
+def locate(rgb, scale=1.0, model='hog'):
+    """Face locations at full resolution, detected on a copy downscaled by ``scale``"""
+    import face_recognition
+    if scale >= 1.0:
+        locations = face_recognition.face_locations(rgb, model=model)
+        return [tuple(int(v) for v in loc) for loc in locations]
+    small = np.ascontiguousarray(cv2.resize(rgb, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA))
+    return scale_locations(face_recognition.face_locations(small, model=model), scale, rgb.shape)
+
+
+def detect_and_encode(rgb, encode=True, model='hog', scale=1.0, locations=None, timings=None):
+    """Return (locations, encodings) for an RGB uint8 frame; encodings is [] when encode=False.
+
+    Pass ``locations`` to skip detection and only embed those boxes (used for tracked faces).
+    Stage durations in seconds are stored in ``timings`` ('detect' / 'encode') when given.
+    """
+    import face_recognition
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    if locations is None:
+        locations = locate(rgb, scale=scale, model=model)
+        timings['detect'] = time.perf_counter() - start
+    else:
+        locations = [tuple(int(v) for v in loc) for loc in locations]
+    if not encode or not locations:
+        return locations, []
+    start = time.perf_counter()
+    encodings = face_recognition.face_encodings(rgb, locations)
+    timings['encode'] = time.perf_counter() - start
+    return locations, [np.asarray(e, dtype=np.float64) for e in encodings]
+
+
+def _record(timings, camera):
+    for stage, seconds in timings.items():
+        metrics.observe_stage(stage, seconds, camera=camera)
+
+
+def _init_worker():
+    """Load the dlib models once per worker process"""
+    import face_recognition  # noqa: F401  (model loading happens at import)
+    print(f"[Face Detection] Worker {os.getpid()} ready")
+
+
+def _shared_memory_job(shm_name, shape, dtype, encode, scale, locations=None):
+    """Returns (locations, encodings, timings); the timings are recorded by the parent process"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        rgb = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        try:
+            timings = {}
+            locations, encodings = detect_and_encode(rgb, encode=encode, scale=scale, locations=locations, timings=timings)
+            return locations, encodings, timings
+        finally:
+            # The view must be gone before the mapping can be closed
+            del rgb
+    finally:
+        shm.close()
+
+
+class InlineDetector:
+    """Run detection in the calling thread"""
+
+    workers = 1
+
+    def submit(self, rgb, encode=True, scale=1.0, locations=None, camera=None):
+        future = Future()
+        try:
+            future.set_result(self.detect(rgb, encode=encode, scale=scale, locations=locations, camera=camera))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def detect(self, rgb, encode=True, scale=1.0, locations=None, camera=None):
+        timings = {}
+        try:
+            return detect_and_encode(rgb, encode=encode, scale=scale, locations=locations, timings=timings)
+        finally:
+            _record(timings, camera)
+
+    def map(self, frames, encode=True, scale=1.0, camera=None):
+        return [self.detect(rgb, encode=encode, scale=scale, camera=camera) for rgb in frames]
+
+    def shutdown(self):
+        pass
+
+
+class FaceDetectionPool:
+    """Process pool for detection/encoding with frames passed through shared memory"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+    def submit(self, rgb, encode=True, scale=1.0, locations=None, camera=None):
+        """Copy the frame into a shared memory block and queue it; returns a Future of (locations, encodings)"""
+        rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+        shm = shared_memory.SharedMemory(create=True, size=max(rgb.nbytes, 1))
+        try:
+            np.ndarray(rgb.shape, dtype=rgb.dtype, buffer=shm.buf)[...] = rgb
+            future = self.executor.submit(_shared_memory_job, shm.name, rgb.shape, rgb.dtype.str, encode, scale, locations)
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+
+        def _release(_):
+            shm.close()
+            shm.unlink()
+
+        future.add_done_callback(_release)
+
+        # Strip the worker's stage timings off the result and record them in this process
+        result = Future()
+
+        def _unpack(done):
+            try:
+                locations, encodings, timings = done.result()
+            except BaseException as e:
+                result.set_exception(e)
+                return
+            _record(timings, camera)
+            result.set_result((locations, encodings))
+
+        future.add_done_callback(_unpack)
+        return result
+
+    def detect(self, rgb, encode=True, scale=1.0, locations=None, camera=None):
+        return self.submit(rgb, encode=encode, scale=scale, locations=locations, camera=camera).result()
+
+    def map(self, frames, encode=True, scale=1.0, camera=None):
+        """Detect on many frames in parallel; results are returned in input order"""
+        futures = [self.submit(rgb, encode=encode, scale=scale, camera=camera) for rgb in frames]
+        return [f.result() for f in futures]
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def make_detector(workers=None):
+    """Inline detector for workers == 0, otherwise a process pool (FACE_WORKERS by default)"""
+    if workers is None:
+        workers = int(os.environ.get('FACE_WORKERS', 0))
+    if workers <= 0:
+        return InlineDetector()
+    print(f"[Face Detection] Starting {workers} detection worker process(es)")
+    return FaceDetectionPool(workers)
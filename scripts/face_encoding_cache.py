@@ -0,0 +1,184 @@
+"""On-disk cache of face encodings for the registered_faces/ directory.
+
+Encodings are stored as a float32 (N, 128) ``.npy`` matrix next to a small JSON
+index that maps every image (relative path, person name, mtime, size) to its row
+in the matrix. On startup the matrix is read in one load and only new or changed
+images are re-encoded.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from image_io import IMAGE_EXTENSIONS
+
+ENCODING_DIM = 128
+CACHE_VERSION = 1
+
+
+class FaceEncodingCache:
+    """Encoding store keyed by image path, mtime and size"""
+
+    def __init__(self, faces_dir, cache_path=None, log_prefix="[Face Cache]"):
+        self.faces_dir = faces_dir
+        base = cache_path or os.path.join(faces_dir, '.encodings')
+        self.matrix_path = base + '.npy'
+        self.index_path = base + '.json'
+        self.log_prefix = log_prefix
+        # rel_path -> {"name", "mtime", "size", "row"}; row is None for images without a face
+        self.entries = {}
+        self.matrix = np.zeros((0, ENCODING_DIM), dtype=np.float32)
+        self.loaded = False
+
+    def load(self):
+        """Read the cached matrix and index (empty cache on any error)"""
+        self.loaded = True
+        if not (os.path.exists(self.index_path) and os.path.exists(self.matrix_path)):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            # Read into memory rather than memory-mapping: save() replaces this file, which fails on
+            # Windows while a mapping is open (and the matrix is only 512 bytes per image)
+            matrix = np.load(self.matrix_path)
+            if index.get('version') != CACHE_VERSION or matrix.ndim != 2 or matrix.shape[1] != ENCODING_DIM:
+                raise ValueError("cache format mismatch")
+            entries = index.get('entries', {})
+            for entry in entries.values():
+                row = entry.get('row')
+                if row is not None and not (0 <= row < matrix.shape[0]):
+                    raise ValueError(f"row {row} out of range")
+            self.entries = entries
+            self.matrix = matrix
+            print(f"{self.log_prefix} Loaded {matrix.shape[0]} cached encodings from {self.matrix_path}")
+        except Exception as e:
+            print(f"{self.log_prefix} Ignoring unreadable cache {self.matrix_path}: {e}")
+            self.entries = {}
+            self.matrix = np.zeros((0, ENCODING_DIM), dtype=np.float32)
+
+    def scan(self, persons=None):
+        """List (rel_path, person_name, abs_path, stat) for every image under a person directory"""
+        found = []
+        person_names = sorted(persons) if persons is not None else sorted(os.listdir(self.faces_dir))
+        for person_name in person_names:
+            person_dir = os.path.join(self.faces_dir, person_name)
+            if not os.path.isdir(person_dir):
+                continue
+            for filename in sorted(os.listdir(person_dir)):
+                if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                image_path = os.path.join(person_dir, filename)
+                try:
+                    st = os.stat(image_path)
+                except OSError:
+                    continue
+                found.append((f"{person_name}/{filename}", person_name, image_path, st))
+        return found
+
+    def sync(self, encode_fn, persons=None):
+        """Bring the cache in line with the directory, encoding only new or changed images.
+
+        ``encode_fn(image_path)`` returns a 128-d encoding or None when no face is found.
+        When ``persons`` is given only those person directories are rescanned and every
+        other entry is kept as-is. Returns (names, rel_paths, matrix) for every image
+        that has an encoding.
+        """
+        if not self.loaded:
+            self.load()
+
+        new_entries = {}
+        kept_rows = []
+        new_vectors = []
+        changed = False
+        scanned = self.scan(persons)
+        if persons is not None:
+            persons = set(persons)
+            for rel_path, cached in self.entries.items():
+                if cached.get('name') in persons:
+                    continue
+                entry = dict(cached)
+                if entry.get('row') is not None:
+                    kept_rows.append(entry['row'])
+                    entry['row'] = ('kept', len(kept_rows) - 1)
+                new_entries[rel_path] = entry
+
+        for rel_path, person_name, image_path, st in scanned:
+            cached = self.entries.get(rel_path)
+            if cached and cached.get('mtime') == st.st_mtime_ns and cached.get('size') == st.st_size:
+                entry = dict(cached)
+                if entry.get('row') is not None:
+                    kept_rows.append(entry['row'])
+                    entry['row'] = ('kept', len(kept_rows) - 1)
+                new_entries[rel_path] = entry
+                continue
+
+            changed = True
+            try:
+                encoding = encode_fn(image_path)
+            except Exception as e:
+                # Leave it out of the index so it is retried on the next sync
+                print(f"{self.log_prefix} Error encoding {image_path}: {e}")
+                continue
+            entry = {"name": person_name, "mtime": st.st_mtime_ns, "size": st.st_size, "row": None}
+            if encoding is not None:
+                new_vectors.append(np.asarray(encoding, dtype=np.float32))
+                entry['row'] = ('new', len(new_vectors) - 1)
+                print(f"{self.log_prefix} Encoded face: {rel_path}")
+            new_entries[rel_path] = entry
+
+        if len(new_entries) != len(self.entries) or set(new_entries) != set(self.entries):
+            changed = True
+
+        if changed:
+            parts = []
+            if kept_rows:
+                parts.append(np.asarray(self.matrix[np.asarray(kept_rows)], dtype=np.float32))
+            if new_vectors:
+                parts.append(np.vstack(new_vectors))
+            matrix = np.vstack(parts) if parts else np.zeros((0, ENCODING_DIM), dtype=np.float32)
+            offset = len(kept_rows)
+            for entry in new_entries.values():
+                if entry.get('row') is not None:
+                    kind, pos = entry['row']
+                    entry['row'] = pos if kind == 'kept' else offset + pos
+            # Drop the old memory map before the file underneath it is replaced
+            self.matrix = matrix
+            self.entries = new_entries
+            self.save()
+        else:
+            for entry in new_entries.values():
+                if entry.get('row') is not None:
+                    entry['row'] = kept_rows[entry['row'][1]]
+            self.entries = new_entries
+
+        return self.gallery(persons)
+
+    def gallery(self, persons=None):
+        """Return (names, rel_paths, matrix) ordered by matrix row, optionally for some persons only"""
+        rows = sorted((entry['row'], rel_path, entry['name'])
+                      for rel_path, entry in self.entries.items()
+                      if entry.get('row') is not None and (persons is None or entry['name'] in persons))
+        names = [name for _, _, name in rows]
+        paths = [rel_path for _, rel_path, _ in rows]
+        if not rows:
+            matrix = np.zeros((0, ENCODING_DIM), dtype=np.float32)
+        elif [row for row, _, _ in rows] != list(range(self.matrix.shape[0])):
+            matrix = np.asarray(self.matrix[np.asarray([row for row, _, _ in rows])], dtype=np.float32)
+        else:
+            matrix = self.matrix
+        return names, paths, matrix
+
+    def save(self):
+        """Atomically write the matrix and index (best-effort)"""
+        try:
+            tmp_matrix = self.matrix_path + '.tmp.npy'
+            tmp_index = self.index_path + '.tmp'
+            np.save(tmp_matrix, np.ascontiguousarray(self.matrix, dtype=np.float32))
+            with open(tmp_index, 'w', encoding='utf-8') as f:
+                json.dump({"version": CACHE_VERSION, "dim": ENCODING_DIM, "entries": self.entries}, f)
+            os.replace(tmp_matrix, self.matrix_path)
+            os.replace(tmp_index, self.index_path)
+            print(f"{self.log_prefix} Saved {self.matrix.shape[0]} encodings to {self.matrix_path}")
+        except Exception as e:
+            print(f"{self.log_prefix} Failed to save encoding cache: {e}")
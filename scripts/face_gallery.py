@@ -0,0 +1,222 @@
+"""In-memory gallery of known face encodings with batched matching.
+
+The gallery keeps every encoding in one contiguous float32 (capacity, 128)
+matrix together with precomputed squared norms, so all faces of a frame are
+matched against all registered images with a single matrix product. Rows are
+kept grouped by person, which lets per-person aggregates (min/mean distance
+over that person's images) be computed with ``reduceat``.
+
+With ``mode='ivf'`` large galleries are searched through an approximate
+``IVFIndex``. When the gallery changes its rows are re-bucketed against the
+existing centroids; k-means is retrained only once the size has drifted by more
+than ``retrain_drift`` from the size the centroids were trained on.
+"""
+
+import threading
+
+import numpy as np
+
+from face_ann import IVFIndex
+
+ENCODING_DIM = 128
+DEFAULT_TOLERANCE = 0.6
+
+
+class GallerySnapshot:
+    """Immutable view of the gallery used by one matching call"""
+
+    def __init__(self, matrix, sq_norms, names, paths, persons, person_starts, person_counts, version,
+                 row_person=None, ann=None):
+        self.matrix = matrix
+        self.sq_norms = sq_norms
+        self.names = names
+        self.paths = paths
+        self.persons = persons
+        self.person_starts = person_starts
+        self.person_counts = person_counts
+        self.version = version
+        self.row_person = row_person
+        self.ann = ann
+
+    def __len__(self):
+        return len(self.names)
+
+
+class FaceGallery:
+    """Thread-safe, preallocated encoding matrix with batched distance queries"""
+
+    def __init__(self, dim=ENCODING_DIM, capacity=256, mode='exact', ann_min_size=1000, nlist=0, nprobe=8,
+                 retrain_drift=0.25):
+        self.dim = dim
+        self.mode = mode  # 'exact' or 'ivf'
+        self.ann_min_size = ann_min_size  # below this size exact search is already cheap
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.retrain_drift = retrain_drift
+        self.lock = threading.Lock()
+        self._buffer = np.zeros((capacity, dim), dtype=np.float32)
+        self._sq_norms = np.zeros(capacity, dtype=np.float32)
+        self._names = []
+        self._paths = []
+        self._snapshot = None
+        self.version = 0
+        self._publish()
+
+    def __len__(self):
+        return len(self._names)
+
+    @property
+    def person_count(self):
+        return len(self._snapshot.persons)
+
+    def _publish(self):
+        """Rebuild the read-only snapshot after a mutation (caller holds the lock or is __init__)"""
+        size = len(self._names)
+        persons, person_starts, person_counts = [], [], []
+        for i, name in enumerate(self._names):
+            if not persons or persons[-1] != name:
+                persons.append(name)
+                person_starts.append(i)
+                person_counts.append(0)
+            person_counts[-1] += 1
+        self.version += 1
+        row_person = np.repeat(np.arange(len(persons), dtype=np.intp), np.asarray(person_counts, dtype=np.intp))
+        ann = None
+        if self.mode == 'ivf' and size >= self.ann_min_size:
+            previous = self._snapshot.ann if self._snapshot is not None else None
+            if previous is not None and previous.centroids is not None and \
+                    abs(size - previous.trained_size) <= self.retrain_drift * previous.trained_size:
+                # Registrations and reloads only reassign rows to the trained cells (milliseconds)
+                ann = previous.rebucket(self._buffer[:size])
+            else:
+                ann = IVFIndex(nlist=self.nlist, nprobe=self.nprobe, dim=self.dim).build(self._buffer[:size])
+        self._snapshot = GallerySnapshot(
+            self._buffer[:size], self._sq_norms[:size], list(self._names), list(self._paths),
+            persons, np.asarray(person_starts, dtype=np.intp), np.asarray(person_counts, dtype=np.float32),
+            self.version, row_person=row_person, ann=ann,
+        )
+
+    def _fill(self, names, paths, matrix):
+        """Write rows grouped by person into a fresh buffer with headroom for appends"""
+        matrix = np.asarray(matrix, dtype=np.float32).reshape(-1, self.dim)
+        order = sorted(range(len(names)), key=lambda i: names[i])
+        capacity = max(self._buffer.shape[0], 1)
+        while capacity < len(order):
+            capacity *= 2
+        # Always allocate a new buffer: snapshots handed out earlier keep pointing at the old one
+        buffer = np.zeros((capacity, self.dim), dtype=np.float32)
+        if order:
+            buffer[:len(order)] = matrix[order]
+        sq_norms = np.zeros(capacity, dtype=np.float32)
+        sq_norms[:len(order)] = np.einsum('ij,ij->i', buffer[:len(order)], buffer[:len(order)])
+        self._buffer = buffer
+        self._sq_norms = sq_norms
+        self._names = [names[i] for i in order]
+        self._paths = [paths[i] for i in order]
+
+    def replace_all(self, names, paths, matrix):
+        """Replace the whole gallery"""
+        with self.lock:
+            self._fill(list(names), list(paths), matrix)
+            self._publish()
+
+    def replace_persons(self, person_names, names, paths, matrix):
+        """Drop every row of ``person_names`` and add the given rows in their place"""
+        person_names = set(person_names)
+        matrix = np.asarray(matrix, dtype=np.float32).reshape(-1, self.dim)
+        with self.lock:
+            keep = [i for i, n in enumerate(self._names) if n not in person_names]
+            size = len(self._names)
+            if len(keep) == size and size + len(names) <= self._buffer.shape[0] and \
+                    set(self._snapshot.persons).isdisjoint(names):
+                # Pure append of new people: write into the preallocated tail in place.
+                # Published snapshots only see rows [:size], so this is safe for readers.
+                self._fill_tail(list(names), list(paths), matrix)
+            else:
+                all_names = [self._names[i] for i in keep] + list(names)
+                all_paths = [self._paths[i] for i in keep] + list(paths)
+                all_rows = np.vstack([self._buffer[keep], matrix]) if len(matrix) else self._buffer[keep]
+                self._fill(all_names, all_paths, all_rows)
+            self._publish()
+
+    def _fill_tail(self, names, paths, matrix):
+        order = sorted(range(len(names)), key=lambda i: names[i])
+        start = len(self._names)
+        end = start + len(order)
+        if order:
+            self._buffer[start:end] = matrix[order]
+            self._sq_norms[start:end] = np.einsum('ij,ij->i', self._buffer[start:end], self._buffer[start:end])
+        self._names.extend(names[i] for i in order)
+        self._paths.extend(paths[i] for i in order)
+
+    def snapshot(self):
+        return self._snapshot
+
+    def distances(self, encodings, snapshot=None):
+        """Euclidean distances, shape (faces, gallery rows), from one matrix product"""
+        snap = snapshot or self._snapshot
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if len(snap) == 0 or queries.shape[0] == 0:
+            return np.zeros((queries.shape[0], len(snap)), dtype=np.float32)
+        q_norms = np.einsum('ij,ij->i', queries, queries)
+        sq = q_norms[:, None] + snap.sq_norms[None, :] - 2.0 * (queries @ snap.matrix.T)
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    def match(self, encodings, tolerance=DEFAULT_TOLERANCE):
+        """Match every encoding against every identity in one batched operation.
+
+        Returns one dict per encoding with the best gallery row, its distance, and the
+        min/mean distance over the best person's images.
+        """
+        snap = self._snapshot
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if queries.shape[0] == 0:
+            return []
+        if len(snap) == 0:
+            return [{"name": "Unknown", "registered": False, "distance": None, "confidence": 0.0,
+                     "index": None, "person": None, "person_min": None, "person_mean": None} for _ in range(queries.shape[0])]
+
+        if snap.ann is not None:
+            best_rows, _ = snap.ann.search(queries)
+            missing = best_rows < 0
+            if missing.any():
+                # Every probed cell was empty; fall back to an exact scan for those faces
+                best_rows[missing] = np.argmin(self.distances(queries[missing], snap), axis=1)
+            best_persons = snap.row_person[best_rows]
+            # Exact aggregates over just the best person's images
+            person_min = np.zeros((queries.shape[0], 1), dtype=np.float32)
+            person_mean = np.zeros_like(person_min)
+            for f, p in enumerate(best_persons):
+                start = snap.person_starts[p]
+                rows = slice(start, start + int(snap.person_counts[p]))
+                d = np.linalg.norm(snap.matrix[rows] - queries[f], axis=1)
+                person_min[f, 0] = d.min()
+                person_mean[f, 0] = d.mean()
+            person_cols = np.zeros(queries.shape[0], dtype=np.intp)
+            best_dists = person_min[:, 0]
+        else:
+            dists = self.distances(queries, snap)
+            person_min = np.minimum.reduceat(dists, snap.person_starts, axis=1)
+            person_mean = np.add.reduceat(dists, snap.person_starts, axis=1) / snap.person_counts[None, :]
+            best_rows = np.argmin(dists, axis=1)
+            best_persons = snap.row_person[best_rows]
+            person_cols = best_persons
+            best_dists = dists[np.arange(queries.shape[0]), best_rows]
+
+        results = []
+        for f in range(queries.shape[0]):
+            row = int(best_rows[f])
+            distance = float(best_dists[f])
+            registered = distance <= tolerance
+            results.append({
+                "name": snap.names[row] if registered else "Unknown",
+                "registered": registered,
+                "distance": distance,
+                "confidence": float(max(0.0, 1.0 - distance)),
+                "index": row,
+                "person": snap.persons[int(best_persons[f])],
+                "person_min": float(person_min[f, person_cols[f]]),
+                "person_mean": float(person_mean[f, person_cols[f]]),
+            })
+        return results
@@ -4,21 +4,36 @@ from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import json
 import time
-import base64
 import numpy as np
-import face_recognition
 import requests
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from frame_sources import open_source
+from frame_hub import FrameHub, JpegCache
+from face_detection import detect_scale_for, make_detector
+import db
+import metrics
+from image_io import IMAGE_EXTENSIONS, decode_payload, request_fields, request_image, request_image_payloads
 
 app = Flask(__name__)
 CORS(app)
+metrics.install(app)
 
 # Configuration
 FACES_DIR = os.path.join(os.path.dirname(__file__), '..', 'registered_faces')
 os.makedirs(FACES_DIR, exist_ok=True)
+FACIAL_SERVER_URL = os.environ.get('FACIAL_SERVER_URL', 'http://localhost:5000')
 
 # Global state
 camera = None
+frame_hub = None
+hub_lock = threading.Lock()
+jpeg_cache = JpegCache(camera="registration")
+detector = None  # inline or process-pool backend, see get_detector()
+detector_lock = threading.Lock()
+# Registration image decoding, JPEG writes and debug artifacts
+io_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('REGISTRATION_IO_WORKERS', 4)), thread_name_prefix="registration-io")
 
 
 def sanitize_name(name: str) -> str:
@@ -28,58 +43,132 @@ def sanitize_name(name: str) -> str:
         safe = f"person_{int(time.time())}"
     return safe
 
+def get_detector():
+    """Create (once) the detection backend: inline, or FACE_WORKERS worker processes"""
+    global detector
+    with detector_lock:
+        if detector is None:
+            detector = make_detector()
+        return detector
+
+def locate_faces(frame, scale=1.0):
+    """Face locations in a BGR frame (detection only, no encodings)"""
+    rgb_frame = np.ascontiguousarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    face_locations, _ = get_detector().detect(rgb_frame, encode=False, scale=scale)
+    return face_locations
+
+def encode_faces(frame, scale=1.0):
+    """Face locations and encodings in a BGR frame"""
+    rgb_frame = np.ascontiguousarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    return get_detector().detect(rgb_frame, encode=True, scale=scale)
+
+def notify_facial_reload(safe_name, encodings=None):
+    """Ask the facial recognition server to encode just this person's directory (best-effort).
+
+    ``encodings`` maps saved image paths to encodings already computed here; the facial
+    server uses them instead of encoding those images again.
+    """
+    payload = {"name": safe_name}
+    if encodings:
+        faces_root = os.path.abspath(FACES_DIR)
+        payload["encodings"] = {
+            os.path.relpath(os.path.abspath(path), faces_root).replace(os.sep, '/'): [float(v) for v in encoding]
+            for path, encoding in encodings.items()
+        }
+    try:
+        resp = requests.post(FACIAL_SERVER_URL + '/api/facial/reload_person', json=payload, timeout=30)
+        if resp.status_code == 404:
+            # Older facial server without incremental reload; fall back to a full rescan
+            resp = requests.get(FACIAL_SERVER_URL + '/api/facial/reload', timeout=2)
+        print(f"[Face Registration] Requested facial server to reload {safe_name}: status={resp.status_code}")
+    except Exception as e:
+        print(f"[Face Registration] Failed to notify facial server to reload: {e}")
+
+def decode_or_error(image_data):
+    """Decoded frame, or the exception that stopped it (so a thread pool map keeps every index)"""
+    try:
+        with metrics.stage_timer('decode'):
+            return decode_payload(image_data)
+    except Exception as e:
+        return e
+
+def write_image(path, frame, label="image"):
+    """cv2.imwrite with the usual logging; returns True when the file was written"""
+    try:
+        with metrics.stage_timer('jpeg_write'):
+            ok = cv2.imwrite(path, frame)
+        if not ok:
+            raise IOError("cv2.imwrite returned False")
+        print(f"[Face Registration] Saved {label}: {path}")
+        return True
+    except Exception as e:
+        print(f"[Face Registration] Failed to save {label} {path}: {e}")
+        return False
+
+def notify_after_writes(safe_name, writes, encodings):
+    """Wait for the background JPEG writes, then ask the facial server to reload the person"""
+    written = {}
+    for (path, encoding), future in zip(encodings.items(), writes):
+        if future.result():
+            written[path] = encoding
+    notify_facial_reload(safe_name, written)
+
 def init_camera():
-    """Initialize camera"""
+    """Open the configured frame source (CAMERA_SOURCE_REGISTRATION / CAMERA_SOURCE; default: probe local cameras)"""
     global camera
     if camera is not None:
         return camera
+    camera = open_source("registration", log_prefix="[Face Registration]")
+    return camera
+
+def get_frame_hub():
+    """Start (once) the shared capture thread that the stream and capture endpoint read from"""
+    global camera, frame_hub
+    with hub_lock:
+        if frame_hub is not None and frame_hub.is_alive():
+            return frame_hub
+        if frame_hub is not None:
+            # Capture thread gave up on the device (and released it); probe again
+            camera = None
+            frame_hub = None
+        cap = init_camera()
+        if cap is None:
+            return None
+        frame_hub = FrameHub(cap, name="registration", log_prefix="[Face Registration]").start()
+        return frame_hub
+
+def annotate_faces(image):
+    """Return a copy of a captured frame with detected faces boxed"""
+    # The captured frame is shared with other clients; draw on a private copy
+    frame = image.copy()
     
-    for i in range(3):
-        cap = cv2.VideoCapture(i)
-        if cap.isOpened():
-            ret, _ = cap.read()
-            if ret:
-                print(f"[Face Registration] Camera initialized on index {i}")
-                camera = cap
-                return camera
-            cap.release()
+    # Detect faces (the live preview may detect on a downscaled copy; registration images do not)
+    face_locations = locate_faces(frame, scale=detect_scale_for("registration"))
     
-    print("[Face Registration] ERROR: No camera found!")
-    return None
+    # Draw rectangles around faces
+    for (top, right, bottom, left) in face_locations:
+        cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+        cv2.putText(frame, "Face Detected", (left, top - 10),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    return frame
 
 def generate_frames():
     """Generate video frames with face detection"""
-    cap = init_camera()
-    if cap is None:
+    hub = get_frame_hub()
+    if hub is None:
         return
     
-    while True:
-        success, frame = cap.read()
-        if not success:
-            print("[Face Registration] Failed to read frame")
-            break
-        
-        # Convert to RGB for face_recognition
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Detect faces
-        face_locations = face_recognition.face_locations(rgb_frame)
-        
-        # Draw rectangles around faces
-        for (top, right, bottom, left) in face_locations:
-            cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-            cv2.putText(frame, "Face Detected", (left, top - 10),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-        
-        # Encode frame
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
+    for captured in hub.frames():
+        # Detection, drawing and encoding run once per captured frame, shared by every viewer
+        frame_bytes = jpeg_cache.get(captured.seq, lambda: annotate_faces(captured.image))
         
         yield (b'--frame\r\n'
                b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
         
         time.sleep(0.033)  # ~30 FPS
 
+    print("[Face Registration] Failed to read frame")
+
 @app.route('/api/registration/stream')
 def video_feed():
     """Video streaming route"""
@@ -89,39 +178,31 @@ def video_feed():
 @app.route('/api/registration/capture', methods=['POST'])
 def capture_face():
     """Capture and save face (single-image legacy endpoint)"""
-    data = request.json
+    data = request_fields(request)
     name = data.get('name')
     responder_id = data.get('responder_id')
-    image_data = data.get('image_data')
     
     if not name:
         return jsonify({"success": False, "error": "Name is required"}), 400
     
-    cap = init_camera()
-    if cap is None:
-        return jsonify({"success": False, "error": "Camera not available"}), 500
-    
-    # If client supplied an image (base64 data URL), use it instead of server camera
-    if image_data:
-        try:
-            header, encoded = image_data.split(",", 1)
-            img_bytes = base64.b64decode(encoded)
-            nparr = np.frombuffer(img_bytes, np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            if frame is None:
-                return jsonify({"success": False, "error": "Invalid image data"}), 400
-        except Exception as e:
-            print(f"[Face Registration] Error decoding image data: {e}")
-            return jsonify({"success": False, "error": "Invalid image data"}), 400
-    else:
+    # If client supplied an image (raw body, multipart file or base64 data URL), use it instead of server camera
+    try:
+        frame = request_image(request, 'image_data')
+    except Exception as e:
+        print(f"[Face Registration] Error decoding image data: {e}")
+        return jsonify({"success": False, "error": "Invalid image data"}), 400
+    if frame is None:
         # Capture frame from server camera
-        ret, frame = cap.read()
-        if not ret:
+        hub = get_frame_hub()
+        if hub is None:
+            return jsonify({"success": False, "error": "Camera not available"}), 500
+        captured = hub.latest()
+        if captured is None:
             return jsonify({"success": False, "error": "Failed to capture frame"}), 500
+        frame = captured.image
 
-    # Detect faces
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    face_locations = face_recognition.face_locations(rgb_frame)
+    # Detect faces at full resolution: only the live preview may detect on a downscaled copy
+    face_locations, face_encodings = encode_faces(frame, scale=1.0)
     print(f"[Face Registration] Detected {len(face_locations)} face(s)")
     
     if not face_locations:
@@ -142,38 +223,12 @@ def capture_face():
     # Do not save the captured image to disk; create directory and record registration in DB
     db_result = None
     try:
-        from dotenv import load_dotenv
-        load_dotenv()
-        import mysql.connector
-
-        DB_HOST = os.environ.get('DB_HOST', '127.0.0.1')
-        DB_USER = os.environ.get('DB_USER', 'root')
-        DB_PASS = os.environ.get('DB_PASS', '')
-        DB_NAME = os.environ.get('DB_NAME', 'bantaybuhay')
-
-        print(f"[Face Registration] Attempting DB insert to {DB_HOST}/{DB_NAME} as {DB_USER}")
-        conn = mysql.connector.connect(host=DB_HOST, user=DB_USER, password=DB_PASS, database=DB_NAME)
-        cur = conn.cursor()
-        # Validate responder_id exists; if not, insert as NULL to avoid FK errors
-        valid_responder = None
-        try:
-            if responder_id is not None:
-                cur.execute("SELECT id FROM responders WHERE id = %s", (responder_id,))
-                if cur.fetchone():
-                    valid_responder = responder_id
-                else:
-                    print(f"[Face Registration] responder_id {responder_id} not found; inserting NULL")
-        except Exception as _e:
-            print(f"[Face Registration] Could not validate responder_id: {_e}")
-
-        insert_sql = "INSERT INTO registered_faces (name, responder_id, directory, images_count) VALUES (%s, %s, %s, %s)"
-        cur.execute(insert_sql, (safe_name, valid_responder, person_dir, 1))
-        conn.commit()
-        db_id = cur.lastrowid
-        cur.close()
-        conn.close()
+        # Keep the encoding in the DB so recognition nodes never need the image itself
+        db_id = db.insert_registered_face(safe_name, responder_id, person_dir, 1, encodings=face_encodings[:1])
         db_result = {"id": db_id}
         print(f"[Face Registration] Registered entry in DB with id {db_id}")
+        # Same as register_faces: the running facial server picks the new encoding up without a restart
+        threading.Thread(target=notify_facial_reload, args=(safe_name,), daemon=True).start()
     except Exception as e:
         traceback.print_exc()
         db_error = str(e)
@@ -190,10 +245,11 @@ def capture_face():
 def register_faces():
     """Register multiple face images (expects 4 images)"""
     try:
-        data = request.json or {}
+        data = request_fields(request)
         name = data.get('name')
         responder_id = data.get('responder_id')
-        images = data.get('images', [])
+        # multipart file parts named "images" (decoded from the upload stream) or JSON data URLs
+        images = request_image_payloads(request, 'images')
 
         print(f"[Face Registration] register_faces called for name={name} images={len(images)} responder_id={responder_id}")
 
@@ -203,6 +259,8 @@ def register_faces():
                 if isinstance(img, str):
                     prefix = img[:80]
                     print(f"[Face Registration] image[{idx}] len={len(img)} prefix={prefix[:60]}...")
+                elif isinstance(img, np.ndarray):
+                    print(f"[Face Registration] image[{idx}] binary upload {img.size} bytes")
                 else:
                     print(f"[Face Registration] image[{idx}] is not a string (type={type(img)})")
         except Exception as _e:
@@ -221,99 +279,63 @@ def register_faces():
         except Exception as e:
             print(f"[Face Registration] Failed to create person directory {person_dir}: {e}")
 
-        # Validate images and decode them into frames; will save to disk after validation
-        valid_count = 0
+        # Decode every image in parallel, then validate them all at once on the detector backend
+        # (in parallel worker processes with FACE_WORKERS); saving to disk happens after validation
+        decoded = list(io_executor.map(decode_or_error, images))
         frames = []
-        for idx, image_data in enumerate(images):
-            try:
-                header, encoded = image_data.split(",", 1)
-                print(f"[Face Registration] Decoding image index {idx}: header={header}")
-                
-                # Show how big the encoded payload is after decoding
-                img_bytes = base64.b64decode(encoded)
-                print(f"[Face Registration] Decoded image index {idx}: {len(img_bytes)} bytes")
-                nparr = np.frombuffer(img_bytes, np.uint8)
-                frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                if frame is None:
-                    # Save the raw data for debugging
-                    debug_fn = os.path.join(person_dir, f"invalid_image_{int(time.time())}_{idx}.b64.txt")
-                    try:
+        for idx, (image_data, frame) in enumerate(zip(images, decoded)):
+            if isinstance(frame, Exception):
+                print(f"[Face Registration] Failed to decode image index {idx}: {frame}")
+                # Save the raw data for debugging
+                debug_fn = os.path.join(person_dir, f"invalid_image_{int(time.time())}_{idx}")
+                try:
+                    if isinstance(image_data, str):
+                        debug_fn += ".b64.txt"
                         with open(debug_fn, 'w', encoding='utf-8') as f:
-                            f.write((image_data or '')[:10000])
-                        print(f"[Face Registration] Wrote invalid image payload to {debug_fn}")
-                    except Exception as _w:
-                        print(f"[Face Registration] Failed to write invalid image payload: {_w}")
-                    return jsonify({"success": False, "error": f"Invalid image at index {idx}"}), 400
-
-                # Verify face present in the image
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                face_locations = face_recognition.face_locations(rgb_frame)
-                if not face_locations:
-                    # Save debug frame showing no face to disk for inspection
-                    dbg_path = os.path.join(person_dir, f"no_face_{int(time.time())}_{idx}.jpg")
-                    try:
-                        cv2.imwrite(dbg_path, frame)
-                        print(f"[Face Registration] Saved no-face debug image to {dbg_path}")
-                    except Exception as _e:
-                        print(f"[Face Registration] Failed to save no-face debug image: {_e}")
-                    return jsonify({"success": False, "error": f"No face detected in image index {idx}"}), 400
-
-                frames.append(frame)
-                valid_count += 1
+                            f.write(image_data[:10000])
+                    else:
+                        debug_fn += ".bin"
+                        with open(debug_fn, 'wb') as f:
+                            f.write(np.asarray(image_data)[:10000].tobytes())
+                    print(f"[Face Registration] Wrote invalid image payload to {debug_fn}")
+                except Exception as _w:
+                    print(f"[Face Registration] Failed to write invalid image payload: {_w}")
+                return jsonify({"success": False, "error": f"Invalid image at index {idx}"}), 400
+            frames.append(frame)
+
+        detector = get_detector()
+        futures = [detector.submit(np.ascontiguousarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))) for frame in frames]
+        encodings = []  # first face of each image, stored in registered_faces.face_encoding
+        for idx, (frame, future) in enumerate(zip(frames, futures)):
+            try:
+                face_locations, face_encodings = future.result()
             except Exception as e:
                 print(f"[Face Registration] Failed to process image index {idx}: {e}")
                 return jsonify({"success": False, "error": f"Failed to process image index {idx}: {e}"}), 400
+            # Verify face present in the image
+            if not face_locations:
+                # Save debug frame showing no face to disk for inspection
+                dbg_path = os.path.join(person_dir, f"no_face_{int(time.time())}_{idx}.jpg")
+                io_executor.submit(write_image, dbg_path, frame, "no-face debug image")
+                return jsonify({"success": False, "error": f"No face detected in image index {idx}"}), 400
+            encodings.append(face_encodings[0])
+        valid_count = len(frames)
 
         # Create directory for person (ensure a folder exists)
         os.makedirs(person_dir, exist_ok=True)
 
-        saved_files = []
-        # Save validated frames to disk
-        try:
-            for idx, frame in enumerate(frames):
-                timestamp = int(time.time())
-                filename = f"{safe_name}_{timestamp}_{idx}.jpg"
-                filepath = os.path.join(person_dir, filename)
-                cv2.imwrite(filepath, frame)
-                saved_files.append(filepath)
-                print(f"[Face Registration] Saved face: {filepath}")
-        except Exception as e:
-            print(f"[Face Registration] Failed to save images: {e}")
-            return jsonify({"success": False, "error": f"Failed to save images: {e}"}), 500
+        # Save validated frames in the background; the response does not wait for the JPEG writes
+        timestamp = int(time.time())
+        saved_files = [os.path.join(person_dir, f"{safe_name}_{timestamp}_{idx}.jpg") for idx in range(valid_count)]
+        writes = [io_executor.submit(write_image, filepath, frame, "face")
+                  for filepath, frame in zip(saved_files, frames)]
 
         db_result = None
         db_error = None
         # Attempt to register into MySQL (XAMPP) and record directory path
         try:
-            from dotenv import load_dotenv
-            load_dotenv()
-            import mysql.connector
-
-            DB_HOST = os.environ.get('DB_HOST', '127.0.0.1')
-            DB_USER = os.environ.get('DB_USER', 'root')
-            DB_PASS = os.environ.get('DB_PASS', '')
-            DB_NAME = os.environ.get('DB_NAME', 'bantaybuhay')
-
-            conn = mysql.connector.connect(host=DB_HOST, user=DB_USER, password=DB_PASS, database=DB_NAME)
-            cur = conn.cursor()
-            # Validate responder_id exists; if not, insert as NULL to avoid FK errors
-            valid_responder = None
-            try:
-                if responder_id is not None:
-                    cur.execute("SELECT id FROM responders WHERE id = %s", (responder_id,))
-                    if cur.fetchone():
-                        valid_responder = responder_id
-                    else:
-                        print(f"[Face Registration] responder_id {responder_id} not found; inserting NULL")
-            except Exception as _e:
-                print(f"[Face Registration] Could not validate responder_id: {_e}")
-
-            insert_sql = "INSERT INTO registered_faces (name, responder_id, directory, images_count) VALUES (%s, %s, %s, %s)"
-            cur.execute(insert_sql, (safe_name, valid_responder, person_dir, valid_count))
-            conn.commit()
-            db_id = cur.lastrowid
-            cur.close()
-            conn.close()
+            # Unknown responder_id values are stored as NULL to avoid FK errors
+            db_id = db.insert_registered_face(safe_name, responder_id, person_dir, valid_count, encodings=encodings)
             db_result = {"id": db_id}
             print(f"[Face Registration] Registered entry in DB with id {db_id}")
         except Exception as e:
@@ -321,12 +343,13 @@ def register_faces():
             db_error = str(e)
             print(f"[Face Registration] DB registration failed or connector missing: {e}")
 
-        # Tell the facial recognition server to reload known faces (best-effort)
-        try:
-            requests.get('http://localhost:5000/api/facial/reload', timeout=2)
-            print(f"[Face Registration] Requested facial server to reload known faces")
-        except Exception as e:
-            print(f"[Face Registration] Failed to notify facial server to reload: {e}")
+        # Tell the facial recognition server to reload this person's images once they are on disk,
+        # handing over the encodings computed above so it does not have to encode them again
+        threading.Thread(
+            target=notify_after_writes,
+            args=(safe_name, writes, dict(zip(saved_files, encodings))),
+            daemon=True
+        ).start()
 
         result = {"success": True, "message": f"Registered {valid_count} images for {safe_name}", "directory": person_dir, "files": saved_files}
         if db_result:
@@ -344,22 +367,7 @@ def list_registered():
     """List all registered faces. Prefer database-backed list if available."""
     # Try DB first (if connector available)
     try:
-        from dotenv import load_dotenv
-        load_dotenv()
-        import mysql.connector
-
-        DB_HOST = os.environ.get('DB_HOST', '127.0.0.1')
-        DB_USER = os.environ.get('DB_USER', 'root')
-        DB_PASS = os.environ.get('DB_PASS', '')
-        DB_NAME = os.environ.get('DB_NAME', 'bantaybuhay')
-
-        conn = mysql.connector.connect(host=DB_HOST, user=DB_USER, password=DB_PASS, database=DB_NAME)
-        cur = conn.cursor(dictionary=True)
-        cur.execute("SELECT id, name, responder_id, directory, images_count, created_at FROM registered_faces ORDER BY created_at DESC")
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
-        return jsonify(rows)
+        return jsonify(db.list_registered_faces())
     except Exception as e:
         print(f"[Face Registration] DB list failed or connector missing: {e}")
 
@@ -368,7 +376,7 @@ def list_registered():
     for person_name in os.listdir(FACES_DIR):
         person_dir = os.path.join(FACES_DIR, person_name)
         if os.path.isdir(person_dir):
-            images = [f for f in os.listdir(person_dir) if f.endswith(('.jpg', '.jpeg', '.png'))]
+            images = [f for f in os.listdir(person_dir) if f.endswith(IMAGE_EXTENSIONS)]
             registered.append({
                 "name": person_name,
                 "images_count": len(images),
@@ -409,27 +417,9 @@ def registration_debug():
 def registration_db_status():
     """Check DB connectivity and registered_faces table status"""
     try:
-        from dotenv import load_dotenv
-        load_dotenv()
-        import mysql.connector
-
-        DB_HOST = os.environ.get('DB_HOST', '127.0.0.1')
-        DB_USER = os.environ.get('DB_USER', 'root')
-        DB_PASS = os.environ.get('DB_PASS', '')
-        DB_NAME = os.environ.get('DB_NAME', 'bantaybuhay')
-
-        print(f"[Face Registration] DB status check on {DB_HOST}/{DB_NAME} as {DB_USER}")
-        conn = mysql.connector.connect(host=DB_HOST, user=DB_USER, password=DB_PASS, database=DB_NAME)
-        cur = conn.cursor()
-        # Check if table exists and count rows
-        cur.execute("SHOW TABLES LIKE 'registered_faces'")
-        table_exists = cur.fetchone() is not None
-        rows_count = None
-        if table_exists:
-            cur.execute("SELECT COUNT(*) FROM registered_faces")
-            rows_count = cur.fetchone()[0]
-        cur.close()
-        conn.close()
+        config = db.db_config()
+        print(f"[Face Registration] DB status check on {config['host']}/{config['database']} as {config['user']}")
+        table_exists, rows_count = db.registered_faces_status()
         return jsonify({"success": True, "connected": True, "table_exists": table_exists, "rows": rows_count})
     except Exception as e:
         traceback.print_exc()
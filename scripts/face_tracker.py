@@ -0,0 +1,197 @@
+"""Lightweight face tracking between full detections.
+
+``FaceTracker`` keeps one ``Track`` per face. Detections are associated with
+existing tracks by IoU, so a responder standing in front of the camera keeps
+the same track id and identity across frames. Between detections every track
+is advanced with a cheap OpenCV correlation tracker (when one is available),
+and a track is only re-embedded when it is new or its match confidence is low.
+"""
+
+import itertools
+import os
+import time
+from collections import deque
+
+import cv2
+
+
+def box_iou(a, b):
+    """IoU of two (top, right, bottom, left) boxes"""
+    top, right, bottom, left = max(a[0], b[0]), min(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    area_a = max(0, a[1] - a[3]) * max(0, a[2] - a[0])
+    area_b = max(0, b[1] - b[3]) * max(0, b[2] - b[0])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _create_cv_tracker(kind):
+    """Create an OpenCV single-object tracker, or None if this build has none of the requested kind"""
+    candidates = {
+        'mosse': [('legacy', 'TrackerMOSSE_create')],
+        'kcf': [('legacy', 'TrackerKCF_create'), (None, 'TrackerKCF_create')],
+        'mil': [(None, 'TrackerMIL_create')],
+    }
+    order = ['mosse', 'kcf', 'mil'] if kind == 'auto' else [kind]
+    for name in order:
+        for module_name, factory in candidates.get(name, []):
+            module = getattr(cv2, module_name, None) if module_name else cv2
+            if module is not None and hasattr(module, factory):
+                try:
+                    return getattr(module, factory)()
+                except Exception:
+                    continue
+    return None
+
+
+class Track:
+    """One tracked face with its identity and bbox history"""
+
+    def __init__(self, track_id, bbox, now, history_size):
+        self.id = track_id
+        self.bbox = bbox
+        self.name = "Unknown"
+        self.registered = False
+        self.confidence = 0.0
+        self.match = None
+        self.embedded_at = None
+        self.created_at = now
+        self.last_seen = now
+        self.misses = 0
+        self.cv_tracker = None
+        self.history = deque(maxlen=history_size)
+        self.history.append((now, bbox))
+
+    def move_to(self, bbox, now):
+        self.bbox = bbox
+        self.last_seen = now
+        self.history.append((now, bbox))
+
+    def set_identity(self, match, now):
+        self.match = match
+        self.name = match["name"]
+        self.registered = match["registered"]
+        self.confidence = match["confidence"]
+        self.embedded_at = now
+
+
+class FaceTracker:
+    """IoU association + optional correlation tracking with identity kept per track"""
+
+    def __init__(self, iou_threshold=0.3, max_misses=3, history_size=30,
+                 reembed_below=None, reembed_after=None, tracker_kind=None):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.history_size = history_size
+        # Re-embed a track whose confidence is below this or whose identity is older than reembed_after seconds
+        self.reembed_below = float(reembed_below if reembed_below is not None else os.environ.get('FACE_REEMBED_BELOW', 0.45))
+        self.reembed_after = float(reembed_after if reembed_after is not None else os.environ.get('FACE_REEMBED_SECONDS', 10))
+        self.tracker_kind = (tracker_kind or os.environ.get('FACE_TRACKER', 'auto')).lower()
+        self.tracks = []
+        self.lost = False
+        self._ids = itertools.count(1)
+
+    def _start_cv_tracker(self, track, frame):
+        if self.tracker_kind == 'none':
+            return
+        tracker = _create_cv_tracker(self.tracker_kind)
+        if tracker is None:
+            return
+        top, right, bottom, left = track.bbox
+        try:
+            tracker.init(frame, (int(left), int(top), int(right - left), int(bottom - top)))
+            track.cv_tracker = tracker
+        except Exception:
+            track.cv_tracker = None
+
+    def advance(self, frame, now=None):
+        """Move every track with its correlation tracker (non-detection frames)"""
+        now = now or time.time()
+        height, width = frame.shape[:2]
+        for track in self.tracks:
+            if track.cv_tracker is None:
+                continue
+            try:
+                ok, (x, y, w, h) = track.cv_tracker.update(frame)
+            except Exception:
+                ok = False
+            if not ok or w <= 0 or h <= 0:
+                # Lost: the next frame runs a full detection
+                track.cv_tracker = None
+                self.lost = True
+                continue
+            x, y, w, h = int(x), int(y), int(w), int(h)
+            track.move_to((max(0, y), min(width, x + w), min(height, y + h), max(0, x)), now)
+
+    def associate(self, locations, frame, now=None):
+        """Match detections to tracks by IoU; returns the tracks in detection order"""
+        now = now or time.time()
+        pairs = []
+        for d, loc in enumerate(locations):
+            for t, track in enumerate(self.tracks):
+                overlap = box_iou(loc, track.bbox)
+                if overlap >= self.iou_threshold:
+                    pairs.append((overlap, d, t))
+        pairs.sort(reverse=True)
+
+        assigned = {}
+        used_tracks = set()
+        for _, d, t in pairs:
+            if d in assigned or t in used_tracks:
+                continue
+            assigned[d] = self.tracks[t]
+            used_tracks.add(t)
+
+        result = []
+        for d, loc in enumerate(locations):
+            track = assigned.get(d)
+            if track is None:
+                track = Track(next(self._ids), loc, now, self.history_size)
+                self.tracks.append(track)
+            else:
+                track.move_to(loc, now)
+                track.misses = 0
+            self._start_cv_tracker(track, frame)
+            result.append(track)
+
+        seen = {id(t) for t in result}
+        for track in self.tracks:
+            if id(track) not in seen:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        self.lost = False
+        return result
+
+    def needs_embedding(self, track, now=None):
+        now = now or time.time()
+        return (track.embedded_at is None
+                or track.confidence < self.reembed_below
+                or now - track.embedded_at > self.reembed_after)
+
+    def faces(self, history=True):
+        """Current tracks as detection dicts (bbox + identity + optional bbox history)"""
+        out = []
+        for track in self.tracks:
+            if track.misses:
+                continue
+            top, right, bottom, left = track.bbox
+            face = {
+                "track_id": track.id,
+                "name": track.name,
+                "registered": track.registered,
+                "confidence": track.confidence,
+                "bbox": {"x": int(left), "y": int(top), "width": int(right - left), "height": int(bottom - top)},
+                "first_seen": track.created_at,
+                "last_embedded": track.embedded_at,
+            }
+            if track.match:
+                face["distance"] = track.match.get("distance")
+                face["person_min_distance"] = track.match.get("person_min")
+                face["person_mean_distance"] = track.match.get("person_mean")
+            if history:
+                face["history"] = [
+                    {"t": t, "bbox": {"x": int(b[3]), "y": int(b[0]), "width": int(b[1] - b[3]), "height": int(b[2] - b[0])}}
+                    for t, b in track.history
+                ]
+            out.append(face)
+        return out
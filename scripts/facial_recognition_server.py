@@ -5,210 +5,426 @@ from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import json
 import time
-import base64
+import threading
 import face_recognition
+import db
+from face_encoding_cache import FaceEncodingCache
+from face_gallery import FaceGallery
+from camera_pipelines import CameraRegistry
+from frame_hub import ResultSlot
+from face_detection import detect_scale_for, make_detector
+from face_tracker import FaceTracker
+from adaptive_scheduler import AdaptiveScheduler
+from motion_gate import MotionGate
+import metrics
+from image_io import BatchTooLargeError, decode_payload, request_fields, request_frames, request_image
+from collections import deque
 
 app = Flask(__name__)
 CORS(app)
+metrics.install(app)
 
 # Configuration
 FACES_DIR = os.path.join(os.path.dirname(__file__), '..', 'registered_faces')
 os.makedirs(FACES_DIR, exist_ok=True)
+MATCH_TOLERANCE = float(os.environ.get('FACE_MATCH_TOLERANCE', 0.6))
+# 'exact' brute-force matching or 'ivf' approximate search for large galleries
+FACE_MATCH_MODE = os.environ.get('FACE_MATCH_MODE', 'exact').lower()
+# Encoding cache (<path>.npy matrix + <path>.json index); defaults to registered_faces/.encodings
+FACE_ENCODING_CACHE = os.environ.get('FACE_ENCODING_CACHE') or None
+# 'files' encodes registered_faces/ images (through the cache); 'db' loads registered_faces.face_encoding
+FACE_GALLERY_SOURCE = os.environ.get('FACE_GALLERY_SOURCE', 'files').lower()
+# Largest number of frames accepted by one /detect_batch request
+DETECT_BATCH_MAX_FRAMES = int(os.environ.get('DETECT_BATCH_MAX_FRAMES', 32))
+# Stream / detection rate while faces are in view (ADAPTIVE_ACTIVE_FPS overrides)
+STREAM_FPS = 30
+# Default per-frame detection budget (ADAPTIVE_BUDGET_MS[_FACIAL] overrides)
+FACE_BUDGET_MS = 250
+# Cameras served by this process: comma-separated `id=source` entries (source as in CAMERA_SOURCE), or `db` for
+# every row of the cameras table with a stream_url. Empty: a single camera "facial" (CAMERA_SOURCE_FACIAL).
+# See camera_pipelines.py; CAMERA_SUPERVISE_SECONDS sets how often dead cameras are restarted
+FACE_CAMERAS = os.environ.get('FACE_CAMERAS', '').strip()
+DEFAULT_CAMERA = "facial"
 
 # Global state
-camera = None
-known_face_encodings = []
-known_face_names = []
-latest_detections = {"faces": [], "timestamp": time.time()}
-no_face_counter = 0
+detector = None  # inline or process-pool backend, see get_detector()
+detector_lock = threading.Lock()
+gallery = FaceGallery(
+    mode=FACE_MATCH_MODE,
+    ann_min_size=int(os.environ.get('FACE_ANN_MIN_SIZE', 1000)),
+    nlist=int(os.environ.get('FACE_IVF_NLIST', 0)),
+    nprobe=int(os.environ.get('FACE_IVF_NPROBE', 8)),
+    retrain_drift=float(os.environ.get('FACE_IVF_RETRAIN_DRIFT', 0.25)),
+)
+cache_lock = threading.Lock()  # serializes cache syncs (matching keeps using the published gallery)
+# Encodings handed over with /reload_person (absolute image path -> encoding), used once by the next sync
+provided_encodings = {}
+provided_lock = threading.Lock()
+face_cache = FaceEncodingCache(FACES_DIR, FACE_ENCODING_CACHE, log_prefix="[Facial Recognition]")
+
+def encode_image_file(image_path):
+    """Return the first face encoding found in an image file, or None"""
+    with provided_lock:
+        provided = provided_encodings.pop(os.path.abspath(image_path), None)
+    if provided is not None:
+        # Already encoded by the registration server when the image was validated
+        return provided
+    image = face_recognition.load_image_file(image_path)
+    encodings = face_recognition.face_encodings(image)
+    return encodings[0] if encodings else None
+
+def gallery_rows(persons=None):
+    """(names, paths, matrix) from the configured source; the DB falls back to the image files"""
+    if FACE_GALLERY_SOURCE == 'db':
+        try:
+            return db.face_gallery_rows(persons)
+        except Exception as e:
+            print(f"[Facial Recognition] Loading encodings from the database failed, using image files: {e}")
+    return face_cache.sync(encode_image_file, persons=persons)
 
 def load_known_faces():
-    """Load all registered faces from directory"""
-    global known_face_encodings, known_face_names
-    known_face_encodings = []
-    known_face_names = []
-    
-    for person_name in os.listdir(FACES_DIR):
-        person_dir = os.path.join(FACES_DIR, person_name)
-        if os.path.isdir(person_dir):
-            for filename in os.listdir(person_dir):
-                if filename.endswith(('.jpg', '.jpeg', '.png')):
-                    image_path = os.path.join(person_dir, filename)
-                    try:
-                        image = face_recognition.load_image_file(image_path)
-                        encodings = face_recognition.face_encodings(image)
-                        if encodings:
-                            known_face_encodings.append(encodings[0])
-                            known_face_names.append(person_name)
-                            print(f"[Facial Recognition] Loaded face: {person_name}")
-                    except Exception as e:
-                        print(f"[Facial Recognition] Error loading {image_path}: {e}")
-
-def init_camera():
-    """Initialize camera with fallback to multiple indices"""
-    global camera
-    if camera is not None:
-        return camera
-    # Try multiple indices and backends and verify the frame isn't all-black
-    max_indices = 6
-    backends = [getattr(cv2, 'CAP_DSHOW', 0), getattr(cv2, 'CAP_MSMF', 0), 0]
-    tried = []
-    for i in range(max_indices):
-        for backend in backends:
+    """Load all registered faces (one DB query, or re-encoding only images missing from the on-disk cache)"""
+    with cache_lock:
+        names, paths, matrix = gallery_rows()
+        gallery.replace_all(names, paths, matrix)
+    for person_name in sorted(set(names)):
+        print(f"[Facial Recognition] Loaded face: {person_name} ({names.count(person_name)} image(s))")
+
+def reload_persons(person_names):
+    """Re-load only the given people and splice them into the in-memory gallery"""
+    person_names = set(person_names)
+    with cache_lock:
+        names, paths, matrix = gallery_rows(person_names)
+        gallery.replace_persons(person_names, names, paths, matrix)
+    print(f"[Facial Recognition] Reloaded {len(names)} image(s) for {sorted(person_names)}")
+    return len(names)
+
+
+class ReloadCoalescer:
+    """Merge person reload requests that arrive while a reload is already running.
+
+    The first caller becomes the runner and keeps draining the pending set; later
+    callers just add their names and wait for the batch that includes them. A
+    failed batch is reported to every caller whose names were in it.
+    """
+
+    def __init__(self, reload_fn):
+        self.reload_fn = reload_fn
+        self.cond = threading.Condition()
+        self.pending = set()
+        self.running = False
+        self.next_batch = 1
+        self.done_batch = 0
+        self.errors = {}  # batch id -> exception raised by reload_fn (recent batches only)
+
+    def _result(self, batch_id):
+        """True if the batch succeeded; raises its error otherwise (caller holds the lock)"""
+        error = self.errors.get(batch_id)
+        if error is not None:
+            raise RuntimeError(f"Incremental reload failed: {error}") from error
+        return True
+
+    def request(self, person_names, timeout=120):
+        """Reload ``person_names`` together with concurrent requests; False on timeout, raises if it failed"""
+        with self.cond:
+            self.pending.update(person_names)
+            my_batch = self.next_batch
+            if self.running:
+                self.cond.wait_for(lambda: self.done_batch >= my_batch, timeout=timeout)
+                if self.done_batch < my_batch:
+                    return False
+                return self._result(my_batch)
+            self.running = True
+
+        try:
+            while True:
+                with self.cond:
+                    if not self.pending:
+                        # Hand back under the same lock that saw pending empty, so a request arriving
+                        # after this point becomes the next runner instead of waiting on this one
+                        self.running = False
+                        self.cond.notify_all()
+                        return self._result(my_batch)
+                    batch = self.pending
+                    self.pending = set()
+                    batch_id = self.next_batch
+                    self.next_batch += 1
+                error = None
+                try:
+                    self.reload_fn(batch)
+                except Exception as e:
+                    print(f"[Facial Recognition] Incremental reload failed for {sorted(batch)}: {e}")
+                    error = e
+                with self.cond:
+                    if error is not None:
+                        self.errors[batch_id] = error
+                    # Waiters of older batches have long returned (or timed out)
+                    for old in [b for b in self.errors if b <= batch_id - 64]:
+                        del self.errors[old]
+                    self.done_batch = batch_id
+                    self.cond.notify_all()
+        finally:
+            with self.cond:
+                if self.running:
+                    # Left the loop through an exception; let the next request take over
+                    self.running = False
+                    self.cond.notify_all()
+
+
+reload_coalescer = ReloadCoalescer(reload_persons)
+metrics.set_gauge('vision_gallery_encodings', lambda: len(gallery))
+metrics.set_gauge('vision_gallery_people', lambda: gallery.person_count)
+
+def get_detector():
+    """Create (once) the detection backend: inline, or FACE_WORKERS worker processes"""
+    global detector
+    with detector_lock:
+        if detector is None:
+            detector = make_detector()
+        return detector
+
+def to_rgb(frame):
+    """Convert a BGR frame to the contiguous RGB layout face_recognition expects"""
+    return np.ascontiguousarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+def match_faces(face_locations, face_encodings, matches=None):
+    """Match encodings against the gallery (unless ``matches`` are given) and build the per-face result dicts"""
+    faces = []
+    if matches is None:
+        matches = gallery.match(face_encodings, tolerance=MATCH_TOLERANCE)
+    for (top, right, bottom, left), match in zip(face_locations, matches):
+        faces.append({
+            "name": match["name"],
+            "registered": match["registered"],
+            "confidence": match["confidence"],
+            "distance": match["distance"],
+            "person_min_distance": match["person_min"],
+            "person_mean_distance": match["person_mean"],
+            "bbox": {"x": int(left), "y": int(top), "width": int(right - left), "height": int(bottom - top)}
+        })
+    return faces
+
+def analyze_frame(frame, scale=1.0):
+    """Detect (optionally on a downscaled copy), encode and match every face in a BGR frame"""
+    face_locations, face_encodings = get_detector().detect(to_rgb(frame), scale=scale)
+    return match_faces(face_locations, face_encodings)
+
+def draw_faces(frame, faces):
+    """Draw the box and name label of every face onto frame (in place)"""
+    for face in faces:
+        bbox = face["bbox"]
+        left, top = bbox["x"], bbox["y"]
+        right, bottom = left + bbox["width"], top + bbox["height"]
+        color = (0, 255, 0) if face["registered"] else (0, 0, 255)  # Green for registered, red for unknown
+
+        # Draw rectangle
+        cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+
+        # Draw label
+        cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
+        cv2.putText(frame, face["name"], (left + 6, bottom - 6),
+                   cv2.FONT_HERSHEY_DUPLEX, 0.6, (255, 255, 255), 1)
+
+
+class FaceDetectionWorker:
+    """Runs detection, encoding and matching once per captured frame for one camera.
+
+    Results are published to ``self.results`` as (captured_frame, faces); stream
+    generators only overlay the latest result, so the detection cost does not grow
+    with the number of viewers.
+    """
+
+    def __init__(self, hub, log_prefix="[Facial Recognition]"):
+        self.hub = hub
+        self.log_prefix = log_prefix
+        self.results = ResultSlot()
+        self.latest = {"faces": [], "timestamp": time.time()}
+        self.no_face_counter = 0
+        # HOG runs on a copy downscaled by this factor (FACE_DETECT_SCALE[_<CAMERA>])
+        self.detect_scale = detect_scale_for(hub.name)
+        # Full detection every N frames; in between faces are followed by the tracker (1 = detect every frame)
+        self.detect_every = max(1, int(os.environ.get('FACE_DETECT_EVERY', 1)))
+        self.tracker = FaceTracker() if self.detect_every > 1 else None
+        # Adjusts detection scale, detect-every-N and pacing to FACE_BUDGET_MS and to whether faces are in view
+        self.scheduler = AdaptiveScheduler(hub.name, budget_ms=FACE_BUDGET_MS, active_fps=STREAM_FPS,
+                                           base_every=self.detect_every, log_prefix=log_prefix)
+        # Skips detection on static scenes with nobody in view (keep-alive every MOTION_KEEPALIVE_SECONDS)
+        self.motion = MotionGate(hub.name)
+        self.faces_in_view = False
+        self.thread = threading.Thread(target=self._run, name=f"detect-{hub.name}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        detector = get_detector()
+        if self.tracker is not None:
+            self._run_tracking(detector)
+            return
+        # With a process pool, keep one frame per worker in flight and publish in frame order
+        in_flight = deque()
+        camera = self.hub.name
+        scheduler = self.scheduler
+        for captured in self.hub.frames():
+            start = time.perf_counter()
+            if scheduler.should_process() and self.motion.should_run(captured.image, self.faces_in_view):
+                try:
+                    with metrics.stage_timer('convert', camera=camera):
+                        rgb = to_rgb(captured.image)
+                    future = detector.submit(rgb, scale=self.detect_scale * scheduler.scale, camera=camera)
+                    in_flight.append((captured, future, start))
+                except Exception as e:
+                    print(f"{self.log_prefix} Failed to submit frame for detection: {e}")
+                if len(in_flight) >= detector.workers:
+                    self._finish(*in_flight.popleft())
+            scheduler.pace(start)
+        while in_flight:
+            self._finish(*in_flight.popleft())
+        print(f"{self.log_prefix} Detection worker stopped (capture ended)")
+
+    def _run_tracking(self, detector):
+        """Detect every ``detect_every`` frames (or when a track is lost) and track in between"""
+        scheduler = self.scheduler
+        since_detect = scheduler.every
+        camera = self.hub.name
+        for captured in self.hub.frames():
+            start = time.perf_counter()
+            now = captured.timestamp
             try:
-                cap = cv2.VideoCapture(i, backend)
-            except Exception:
-                cap = cv2.VideoCapture(i)
-
-            tried.append((i, backend))
-            print(f"[Facial Recognition] Trying camera index {i} backend {backend}")
-            if cap.isOpened():
-                # Read a few frames to allow camera auto-adjust and check brightness
-                stats = None
-                for attempt in range(3):
-                    ret, frame = cap.read()
-                    if not ret or frame is None:
-                        continue
-                    try:
-                        import numpy as _np
-                        mean_val = float(_np.mean(frame))
-                        min_val = int(_np.min(frame))
-                        max_val = int(_np.max(frame))
-                        stats = (mean_val, min_val, max_val)
-                        print(f"[Facial Recognition] Probe idx={i} backend={backend} attempt={attempt} stats mean={mean_val:.3f} min={min_val} max={max_val}")
-                        # Consider non-black if average brightness exceeds threshold
-                        if mean_val > 3.0 and max_val > 10:
-                            print(f"[Facial Recognition] Camera initialized on index {i} backend {backend} (mean={mean_val:.2f})")
-                            camera = cap
-                            return camera
-                        else:
-                            print(f"[Facial Recognition] Camera at index {i} produced too-dark frame (mean={mean_val:.3f})")
-                    except Exception as e:
-                        print(f"[Facial Recognition] Frame check error: {e}")
-                cap.release()
-                if stats is not None:
-                    print(f"[Facial Recognition] Final probe stats for idx={i} backend={backend}: mean={stats[0]:.3f} min={stats[1]} max={stats[2]}")
-
-    print(f"[Facial Recognition] ERROR: No usable camera found! Tried: {tried}")
-    return None
-
-def generate_frames():
-    """Generate video frames with face detection"""
-    global latest_detections
-    
-    cap = init_camera()
-    if cap is None:
-        return
-    
-    while True:
-        success, frame = cap.read()
-        if not success:
-            print("[Facial Recognition] Failed to read frame")
-            break
-        
-        # Convert to RGB for face_recognition and make contiguous
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        rgb_frame = np.ascontiguousarray(rgb_frame)
-
-        # Detect faces
+                due = since_detect >= scheduler.every or self.tracker.lost
+                if due and self.motion.should_run(captured.image, bool(self.tracker.tracks)):
+                    with metrics.stage_timer('convert', camera=camera):
+                        rgb = to_rgb(captured.image)
+                    locations, _ = detector.detect(rgb, encode=False, scale=self.detect_scale * scheduler.scale,
+                                                   camera=camera)
+                    tracks = self.tracker.associate(locations, captured.image, now)
+                    # Only new tracks and tracks with a weak or stale identity are re-embedded
+                    stale = [t for t in tracks if self.tracker.needs_embedding(t, now)]
+                    if stale:
+                        _, encodings = detector.detect(rgb, locations=[t.bbox for t in stale], camera=camera)
+                        with metrics.stage_timer('match', camera=camera):
+                            matches = gallery.match(encodings, tolerance=MATCH_TOLERANCE)
+                        for track, match in zip(stale, matches):
+                            track.set_identity(match, now)
+                    scheduler.record(time.perf_counter() - start, subject_present=bool(tracks))
+                    since_detect = 1
+                else:
+                    with metrics.stage_timer('track', camera=camera):
+                        self.tracker.advance(captured.image, now)
+                    since_detect += 1
+                faces = self.tracker.faces()
+            except Exception as e:
+                print(f"{self.log_prefix} face_recognition error: {e}")
+                faces = []
+            self._publish(captured, faces)
+            scheduler.pace(start)
+        print(f"{self.log_prefix} Detection worker stopped (capture ended)")
+
+    def _finish(self, captured, future, submitted):
         try:
-            face_locations = face_recognition.face_locations(rgb_frame)
-            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+            face_locations, face_encodings = future.result()
+            with metrics.stage_timer('match', camera=self.hub.name):
+                faces = match_faces(face_locations, face_encodings)
         except Exception as e:
-            print(f"[Facial Recognition] face_recognition error: {e}")
-            face_locations = []
-            face_encodings = []
+            print(f"{self.log_prefix} face_recognition error: {e}")
+            faces = []
+        self.scheduler.record(time.perf_counter() - submitted, subject_present=bool(faces))
+        self.faces_in_view = bool(faces)
+        self._publish(captured, faces)
 
-        print(f"[Facial Recognition] Detected {len(face_locations)} face(s)")
+    def _publish(self, captured, faces):
+        print(f"{self.log_prefix} Detected {len(faces)} face(s)")
 
         # Save a debug image every ~30 frames when no face detected to help diagnostics
-        global no_face_counter
-        if len(face_locations) == 0:
-            no_face_counter += 1
-            if no_face_counter % 30 == 0:
-                dbg_path = os.path.join(FACES_DIR, f"debug_no_face_{int(time.time())}.jpg")
+        if not faces:
+            self.no_face_counter += 1
+            if self.no_face_counter % 30 == 0:
+                dbg_path = os.path.join(FACES_DIR, f"debug_no_face_{self.hub.name}_{int(time.time())}.jpg")
                 try:
-                    cv2.imwrite(dbg_path, frame)
-                    print(f"[Facial Recognition] Saved debug image to {dbg_path}")
+                    cv2.imwrite(dbg_path, captured.image)
+                    print(f"{self.log_prefix} Saved debug image to {dbg_path}")
                 except Exception as e:
-                    print(f"[Facial Recognition] Failed to save debug image: {e}")
+                    print(f"{self.log_prefix} Failed to save debug image: {e}")
         else:
-            no_face_counter = 0
-        
+            self.no_face_counter = 0
+
+        self.results.publish((captured, faces))
         detections = []
-        
-        # Process each detected face
-        for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-            name = "Unknown"
-            color = (0, 0, 255)  # Red for unknown
-            registered = False
-            
-            # Check if face matches any known face
-            if known_face_encodings:
-                matches = face_recognition.compare_faces(known_face_encodings, face_encoding, tolerance=0.6)
-                face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-                
-                if len(face_distances) > 0:
-                    best_match_index = np.argmin(face_distances)
-                    if matches[best_match_index]:
-                        name = known_face_names[best_match_index]
-                        color = (0, 255, 0)  # Green for registered
-                        registered = True
-            
-            # Draw rectangle
-            cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-            
-            # Draw label
-            label = name
-            cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
-            cv2.putText(frame, label, (left + 6, bottom - 6), 
-                       cv2.FONT_HERSHEY_DUPLEX, 0.6, (255, 255, 255), 1)
-            
-            detections.append({
-                "name": name,
-                "registered": registered,
-                "bbox": {"x": left, "y": top, "width": right - left, "height": bottom - top}
-            })
-        
-        # Update latest detections
-        latest_detections = {
+        for f in faces:
+            detection = {"name": f["name"], "registered": f["registered"], "confidence": f["confidence"],
+                         "bbox": f["bbox"]}
+            if "track_id" in f:
+                detection["track_id"] = f["track_id"]
+                detection["history"] = f["history"]
+            detections.append(detection)
+        self.latest = {
+            "camera": self.hub.name,
             "faces": detections,
-            "timestamp": time.time()
+            "timestamp": time.time(),
+            "frame_seq": captured.seq,
+            "tracking": self.tracker is not None,
+            "scheduler": self.scheduler.snapshot(),
+            "motion": self.motion.snapshot()
         }
-        
-        # Encode frame
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        
-        time.sleep(0.033)  # ~30 FPS
 
-@app.route('/api/facial/stream')
-def video_feed():
-    """Video streaming route"""
-    cap = init_camera()
-    if cap is None:
-        return jsonify({"error": "Camera not available"}), 503
 
-    return Response(generate_frames(),
+def face_worker(hub, pipeline):
+    return FaceDetectionWorker(hub, log_prefix=pipeline.log_prefix)
+
+def render_faces(captured, result):
+    """Copy of a captured frame with the boxes of a (captured, faces) worker result drawn on it"""
+    # The captured frame is shared with other clients; draw on a private copy
+    frame = captured.image.copy()
+    draw_faces(frame, result[1] if result else [])
+    return frame
+
+# One pipeline per camera (FACE_CAMERAS); all share the gallery and the detection backend
+camera_registry = CameraRegistry(FACE_CAMERAS, DEFAULT_CAMERA, "[Facial Recognition]", face_worker, render_faces)
+
+def camera_detections(pipeline):
+    worker = pipeline.worker
+    return worker.latest if worker is not None else {"camera": pipeline.id, "faces": [], "timestamp": time.time()}
+
+def camera_hub(camera_id=None):
+    """(pipeline, hub, error response) for a route; the camera is started on first use"""
+    pipeline = camera_registry.get(camera_id)
+    if pipeline is None:
+        if camera_id is not None:
+            return None, None, (jsonify({"error": f"Unknown camera: {camera_id}"}), 404)
+        return None, None, (jsonify({"error": "Camera not available"}), 503)
+    hub = pipeline.get_hub()
+    if hub is None:
+        return pipeline, None, (jsonify({"error": "Camera not available"}), 503)
+    return pipeline, hub, None
+
+@app.route('/api/facial/stream')
+@app.route('/api/facial/stream/<camera_id>')
+def video_feed(camera_id=None):
+    """Video streaming route (default: the first configured camera)"""
+    pipeline, hub, error = camera_hub(camera_id)
+    if error:
+        return error
+
+    return Response(pipeline.generate_frames(),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
 
 @app.route('/api/facial/test_frame')
 def test_frame():
-    """Return basic stats about a single frame for debugging"""
-    cap = init_camera()
-    if cap is None:
-        return jsonify({"error": "Camera not available"}), 503
+    """Return basic stats about a single frame for debugging (?camera=<id>, default: the first camera)"""
+    pipeline, hub, error = camera_hub(request.args.get('camera'))
+    if error:
+        return error
 
-    ret, frame = cap.read()
-    if not ret or frame is None:
+    captured = hub.latest()
+    if captured is None:
         return jsonify({"error": "Failed to read frame"}), 500
+    frame = captured.image
 
     import numpy as _np
     stats = {
+        "camera": pipeline.id,
         "shape": frame.shape,
         "min": int(_np.min(frame)),
         "max": int(_np.max(frame)),
@@ -216,7 +432,7 @@ def test_frame():
     }
 
     # Save debug frame
-    dbg_path = os.path.join(FACES_DIR, f"test_frame_{int(time.time())}.jpg")
+    dbg_path = os.path.join(FACES_DIR, f"test_frame_{pipeline.id}_{int(time.time())}.jpg")
     try:
         cv2.imwrite(dbg_path, frame)
         stats["saved_path"] = dbg_path
@@ -227,43 +443,69 @@ def test_frame():
 
 
 @app.route('/api/facial/frame.jpg')
-def frame_jpeg():
+@app.route('/api/facial/frame/<camera_id>.jpg')
+def frame_jpeg(camera_id=None):
     """Return a single JPEG frame (for quick browser checks)"""
-    cap = init_camera()
-    if cap is None:
-        return jsonify({"error": "Camera not available"}), 503
+    pipeline, hub, error = camera_hub(camera_id)
+    if error:
+        return error
 
-    ret, frame = cap.read()
-    if not ret or frame is None:
+    captured = hub.latest()
+    if captured is None:
         return jsonify({"error": "Failed to read frame"}), 500
 
-    ret, buffer = cv2.imencode('.jpg', frame)
-    if not ret:
-        return jsonify({"error": "Failed to encode frame"}), 500
+    # Same cached bytes the MJPEG stream serves for this frame
+    try:
+        frame_bytes = pipeline.annotated_jpeg(captured)
+    except Exception as e:
+        return jsonify({"error": f"Failed to encode frame: {e}"}), 500
 
-    return Response(buffer.tobytes(), mimetype='image/jpeg')
+    return Response(frame_bytes, mimetype='image/jpeg')
 
 @app.route('/api/facial/detections')
 def get_detections():
-    """Get latest face detections"""
-    return jsonify(latest_detections)
+    """Get latest face detections of the first camera, plus every camera's under `cameras`"""
+    pipeline = camera_registry.get()
+    result = dict(camera_detections(pipeline)) if pipeline is not None else {"faces": [], "timestamp": time.time()}
+    result["cameras"] = {p.id: camera_detections(p) for p in camera_registry.pipelines()}
+    return jsonify(result)
+
+
+@app.route('/api/facial/detections/<camera_id>')
+def get_camera_detections(camera_id):
+    """Get latest face detections of one camera"""
+    pipeline = camera_registry.get(camera_id)
+    if pipeline is None:
+        return jsonify({"error": f"Unknown camera: {camera_id}"}), 404
+    return jsonify(camera_detections(pipeline))
+
+
+@app.route('/api/facial/cameras')
+def get_cameras():
+    """List the cameras this server covers and whether their capture threads are running (?reload=1 re-reads them)"""
+    if request.args.get('reload') or not camera_registry.cameras:
+        camera_registry.load()
+    cameras = []
+    for pipeline in camera_registry.pipelines():
+        latest = camera_detections(pipeline)
+        cameras.append(dict(pipeline.status(), faces=len(latest["faces"]), timestamp=latest["timestamp"]))
+    return jsonify({"cameras": cameras})
 
 
 @app.route('/api/facial/reinit_camera', methods=['POST'])
 def reinit_camera():
-    """Force reinitialize the camera (useful for debugging or if device was locked)"""
-    global camera
+    """Force reinitialize a camera, {"camera_id": ...} or the first one (useful if the device was locked)"""
+    camera_id = (request.get_json(silent=True) or {}).get('camera_id')
     try:
-        if camera is not None:
-            try:
-                camera.release()
-            except Exception:
-                pass
-            camera = None
-        cap = init_camera()
-        if cap is None:
+        pipeline = camera_registry.get(camera_id)
+        if pipeline is None:
+            return jsonify({"success": False, "error": f"Unknown camera: {camera_id}"}), 404
+        # Stopping the capture thread releases the device
+        pipeline.stop()
+        hub = pipeline.get_hub()
+        if hub is None:
             return jsonify({"success": False, "error": "No usable camera found"}), 503
-        return jsonify({"success": True, "message": "Camera reinitialized"})
+        return jsonify({"success": True, "camera_id": pipeline.id, "message": "Camera reinitialized"})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -271,65 +513,154 @@ def reinit_camera():
 @app.route('/api/facial/detect_frame', methods=['POST'])
 def detect_frame():
 
-    """Accept a base64 image from client and return face detections for that frame"""
-    data = request.json or {}
-    image_data = data.get('image_data')
-    if not image_data:
-        return jsonify({"error": "image_data is required"}), 400
-
+    """Accept an image (raw image/jpeg body, multipart upload or base64 data URL) and return face detections"""
+    data = request_fields(request)
     try:
-        header, encoded = image_data.split(',', 1)
-        img_bytes = base64.b64decode(encoded)
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        if frame is None:
-            raise ValueError("Could not decode image")
+        frame = request_image(request, 'image_data')
     except Exception as e:
         return jsonify({"error": f"Invalid image_data: {e}"}), 400
+    if frame is None:
+        return jsonify({"error": "image_data is required"}), 400
 
-    # Convert for face_recognition
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    rgb_frame = np.ascontiguousarray(rgb_frame)
+    try:
+        scale = float(data.get('detect_scale') or detect_scale_for())
+        scale = min(1.0, max(0.05, scale))
+    except (TypeError, ValueError):
+        return jsonify({"error": "detect_scale must be a number"}), 400
 
     try:
-        face_locations = face_recognition.face_locations(rgb_frame)
-        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+        faces = analyze_frame(frame, scale=scale)
     except Exception as e:
         return jsonify({"error": f"face_recognition error: {e}"}), 500
 
-    faces = []
-    for (top, right, bottom, left), enc in zip(face_locations, face_encodings):
-        name = "Unknown"
-        registered = False
-        confidence = 0.0
-
-        if known_face_encodings:
-            matches = face_recognition.compare_faces(known_face_encodings, enc, tolerance=0.6)
-            distances = face_recognition.face_distance(known_face_encodings, enc)
-            if len(distances) > 0:
-                best_idx = int(np.argmin(distances))
-                confidence = float(max(0.0, 1.0 - float(distances[best_idx])))
-                if matches[best_idx]:
-                    name = known_face_names[best_idx]
-                    registered = True
-
-        faces.append({
-            "name": name,
-            "is_registered": registered,
-            "confidence": confidence,
-            "bbox": {"x": int(left), "y": int(top), "width": int(right - left), "height": int(bottom - top)}
-        })
+    for face in faces:
+        face["is_registered"] = face.pop("registered")
 
     return jsonify({"faces": faces})
 
+@app.route('/api/facial/detect_batch', methods=['POST'])
+def detect_batch():
+    """Detect faces in many frames at once; results come back in input order with per-frame errors"""
+    try:
+        # Size and count are checked before any frame is read into memory
+        frames = request_frames(request, max_frames=DETECT_BATCH_MAX_FRAMES)
+    except BatchTooLargeError as e:
+        return jsonify({"error": str(e)}), 413
+    except Exception as e:
+        return jsonify({"error": f"Invalid frames: {e}"}), 400
+    if not frames:
+        return jsonify({"error": "frames is required"}), 400
+
+    data = request_fields(request)
+    try:
+        scale = float(data.get('detect_scale') or detect_scale_for())
+        scale = min(1.0, max(0.05, scale))
+    except (TypeError, ValueError):
+        return jsonify({"error": "detect_scale must be a number"}), 400
+
+    results = []
+    for idx, item in enumerate(frames):
+        results.append({"index": idx, "timestamp": item["timestamp"], "camera_id": item["camera_id"]})
+
+    # Decode everything first, then hand all frames to the detector together (parallel with FACE_WORKERS)
+    detector = get_detector()
+    pending = []
+    for result, item in zip(results, frames):
+        try:
+            frame = decode_payload(item["payload"])
+            pending.append((result, detector.submit(to_rgb(frame), scale=scale)))
+        except Exception as e:
+            result["error"] = f"Invalid image_data: {e}"
+
+    detected = []
+    for result, future in pending:
+        try:
+            detected.append((result,) + tuple(future.result()))
+        except Exception as e:
+            result["error"] = f"face_recognition error: {e}"
+
+    # One gallery match for every face of every frame
+    all_encodings = [enc for _, _, encodings in detected for enc in encodings]
+    try:
+        matches = gallery.match(all_encodings, tolerance=MATCH_TOLERANCE) if all_encodings else []
+    except Exception as e:
+        for result, _, _ in detected:
+            result["error"] = f"face matching error: {e}"
+        detected = []
+    offset = 0
+    for result, locations, encodings in detected:
+        faces = match_faces(locations, encodings, matches[offset:offset + len(encodings)])
+        offset += len(encodings)
+        for face in faces:
+            face["is_registered"] = face.pop("registered")
+        result["faces"] = faces
+
+    return jsonify({"results": results,
+                    "failed": sum(1 for r in results if "error" in r)})
+
 @app.route('/api/facial/reload')
 def reload_faces():
     """Reload registered faces"""
     load_known_faces()
     return jsonify({
         "success": True,
-        "loaded_faces": len(known_face_names),
-        "unique_people": len(set(known_face_names))
+        "loaded_faces": len(gallery),
+        "unique_people": gallery.person_count
+    })
+
+@app.route('/api/facial/reload_person', methods=['POST'])
+def reload_person():
+    """Incrementally reload one or more person directories (only new/changed images are encoded)"""
+    data = request.json or {}
+    person_names = set()
+    if data.get('name'):
+        person_names.add(data['name'])
+    person_names.update(data.get('names') or [])
+    # Files are given relative to (or inside) registered_faces/; reload their person directories
+    faces_root = os.path.abspath(FACES_DIR)
+    for file_path in data.get('files') or []:
+        abs_path = os.path.abspath(os.path.join(faces_root, file_path))
+        person_dir = os.path.dirname(abs_path)
+        if os.path.dirname(person_dir) == faces_root:
+            person_names.add(os.path.basename(person_dir))
+
+    # Encodings the registration server already computed, keyed by path relative to registered_faces/
+    handed_over = {}
+    for file_path, encoding in (data.get('encodings') or {}).items():
+        abs_path = os.path.abspath(os.path.join(faces_root, file_path))
+        if os.path.dirname(os.path.dirname(abs_path)) != faces_root:
+            continue
+        try:
+            vector = np.asarray(encoding, dtype=np.float64).reshape(128)
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": f"Invalid encoding for {file_path}"}), 400
+        handed_over[abs_path] = vector
+        person_names.add(os.path.basename(os.path.dirname(abs_path)))
+
+    if not person_names:
+        return jsonify({"success": False, "error": "name, names or files is required"}), 400
+    for person_name in person_names:
+        if not isinstance(person_name, str) or os.path.basename(person_name) != person_name or person_name in ('.', '..'):
+            return jsonify({"success": False, "error": f"Invalid person name: {person_name}"}), 400
+
+    if handed_over:
+        with provided_lock:
+            provided_encodings.update(handed_over)
+    try:
+        completed = reload_coalescer.request(person_names)
+    except Exception as e:
+        return jsonify({"success": False, "persons": sorted(person_names), "error": str(e)}), 500
+    finally:
+        if handed_over:
+            # Drop any the sync did not need (e.g. FACE_GALLERY_SOURCE=db)
+            with provided_lock:
+                for abs_path in handed_over:
+                    provided_encodings.pop(abs_path, None)
+    return jsonify({
+        "success": completed,
+        "persons": sorted(person_names),
+        "loaded_faces": len(gallery),
+        "unique_people": gallery.person_count
     })
 
 @app.route('/health')
@@ -340,5 +671,8 @@ def health():
 if __name__ == '__main__':
     print("[BantayBuhay] Facial Recognition Server Starting...")
     load_known_faces()
-    print(f"[Facial Recognition] Loaded {len(known_face_names)} registered faces")
+    print(f"[Facial Recognition] Loaded {len(gallery)} registered faces")
+    if camera_registry.multi:
+        # Multi-camera mode: capture and detect on every camera from startup, not on the first viewer
+        camera_registry.start_supervisor()
     app.run(host='0.0.0.0', port=5000, threaded=True, debug=False)
@@ -0,0 +1,213 @@
+"""Shared camera capture for the vision servers.
+
+A ``FrameHub`` owns the capture of one camera (a ``cv2.VideoCapture`` or one of
+the ``frame_sources`` sources) and is the only code
+that calls ``read()`` on it. A background thread publishes every frame, tagged
+with an increasing sequence number, into a small ring buffer. Stream generators,
+snapshot endpoints and detection loops all read from the hub, so any number of
+browser tabs can watch the same camera without racing for frames.
+
+``ResultSlot`` is the matching publish/wait primitive for per-camera workers
+that turn frames into detection results, and ``JpegCache`` makes sure each
+annotated frame is JPEG-encoded exactly once no matter how many clients ask.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+import cv2
+
+import metrics
+
+Frame = namedtuple('Frame', ['seq', 'timestamp', 'image'])
+
+# Consecutive failed reads before the hub gives up on the device
+MAX_READ_FAILURES = 30
+
+
+class FrameHub:
+    """Background capture thread with frame fan-out to any number of readers"""
+
+    def __init__(self, capture, name="camera", buffer_size=4, log_prefix="[Camera]"):
+        self.capture = capture
+        self.name = name
+        self.log_prefix = log_prefix
+        self.buffer = deque(maxlen=buffer_size)
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"capture-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def is_alive(self):
+        return self.running and self.thread is not None and self.thread.is_alive()
+
+    def _run(self):
+        failures = 0
+        while self.running:
+            start = time.perf_counter()
+            try:
+                ok, image = self.capture.read()
+            except Exception as e:
+                print(f"{self.log_prefix} Capture error on {self.name}: {e}")
+                ok, image = False, None
+            metrics.observe_stage('capture', time.perf_counter() - start, camera=self.name)
+            if not ok or image is None:
+                failures += 1
+                # Frame sources reconnect by themselves and close once they give up
+                reconnecting = getattr(self.capture, 'reconnects', False) and self.capture.isOpened()
+                if failures >= MAX_READ_FAILURES and not reconnecting:
+                    print(f"{self.log_prefix} Failed to read frame from {self.name} {failures} times; stopping capture")
+                    break
+                time.sleep(0.01)
+                continue
+            failures = 0
+            metrics.inc('vision_frames_captured_total', camera=self.name)
+            with self.cond:
+                self.seq += 1
+                self.buffer.append(Frame(self.seq, time.time(), image))
+                self.cond.notify_all()
+
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        try:
+            self.capture.release()
+        except Exception:
+            pass
+
+    def latest(self, timeout=2.0):
+        """Most recent frame, waiting up to ``timeout`` for the first one (None if unavailable)"""
+        return self.wait_next(0, timeout)
+
+    def wait_next(self, after_seq, timeout=2.0):
+        """Block until a frame newer than ``after_seq`` is published and return the newest one"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > after_seq or not self.running, timeout=timeout)
+            if self.seq > after_seq and self.buffer:
+                return self.buffer[-1]
+            return None
+
+    def frames(self, timeout=2.0):
+        """Yield each new frame (skipping any the consumer was too slow to see) until capture stops"""
+        last_seq = 0
+        while True:
+            frame = self.wait_next(last_seq, timeout)
+            if frame is None:
+                if self.running:
+                    continue
+                return
+            last_seq = frame.seq
+            yield frame
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+
+
+class ResultSlot:
+    """Latest-value slot a worker publishes into and any number of readers wait on"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.value = None
+
+    def publish(self, value):
+        with self.cond:
+            self.seq += 1
+            self.value = value
+            self.cond.notify_all()
+
+    def get(self):
+        return self.value
+
+    def latest(self):
+        """Return (seq, value) of the most recent publish"""
+        with self.cond:
+            return self.seq, self.value
+
+    def wait_next(self, after_seq, timeout=2.0):
+        """Block until a value newer than ``after_seq`` exists; returns (seq, value) or None"""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > after_seq, timeout=timeout):
+                return None
+            return self.seq, self.value
+
+
+class JpegCache:
+    """Encode-once JPEG cache keyed by frame sequence number.
+
+    ``get(key, render)`` returns the JPEG bytes for ``key``; ``render()`` (which
+    produces the annotated BGR frame) and the encode only run for the first caller,
+    concurrent callers for the same key wait for that result.
+    """
+
+    def __init__(self, quality=None, width=None, max_entries=8, camera=None):
+        self.quality = int(quality if quality is not None else os.environ.get('STREAM_JPEG_QUALITY', 95))
+        self.width = int(width if width is not None else os.environ.get('STREAM_WIDTH', 0))  # 0 = native
+        self.max_entries = max_entries
+        self.camera = camera  # metrics label
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.inflight = {}
+
+    def encode(self, frame):
+        """Resize to the configured output width (if smaller) and JPEG-encode"""
+        start = time.perf_counter()
+        if self.width and frame.shape[1] > self.width:
+            h, w = frame.shape[:2]
+            frame = cv2.resize(frame, (self.width, int(h * self.width / w)), interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise ValueError("JPEG encode failed")
+        data = buffer.tobytes()
+        metrics.observe_stage('jpeg_encode', time.perf_counter() - start, camera=self.camera)
+        return data
+
+    def _render(self, render):
+        start = time.perf_counter()
+        frame = render()
+        metrics.observe_stage('draw', time.perf_counter() - start, camera=self.camera)
+        return frame
+
+    def get(self, key, render):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            event = self.inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self.inflight[key] = threading.Event()
+
+        if not owner:
+            event.wait(timeout=5.0)
+            with self.lock:
+                data = self.entries.get(key)
+            if data is not None:
+                return data
+            # The owner failed; encode for ourselves
+            return self.encode(self._render(render))
+
+        try:
+            data = self.encode(self._render(render))
+            with self.lock:
+                self.entries[key] = data
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            return data
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+            event.set()
@@ -0,0 +1,446 @@
+"""Frame sources the capture hub can read from.
+
+Every source exposes the small part of the ``cv2.VideoCapture`` interface that
+``FrameHub`` uses (``read()``, ``isOpened()``, ``release()``), so a hub does not
+care where frames come from:
+
+* ``DeviceSource`` - a local camera, either a fixed index or the first index that
+  returns a non-black frame (the old ``init_camera()`` probe);
+* ``VideoFileSource`` - a recorded clip, paced to its own FPS and looped, so the
+  servers can be load-tested without a camera;
+* ``StreamSource`` - an RTSP / HTTP(S) stream URL (for example ``cameras.stream_url``);
+* ``SyntheticSource`` - generated moving frames, for smoke tests on headless hosts.
+
+Sources reconnect on their own: after a few failed reads the capture is reopened
+with exponential backoff, and the source only closes (ending the hub) once
+``CAMERA_RECONNECT_SECONDS`` pass without a frame. With ``CAMERA_READ_AHEAD`` > 0
+a reader thread decodes up to that many frames in advance (live sources keep the
+newest frames, files never skip).
+
+``open_source(name)`` picks the source from ``CAMERA_SOURCE_<NAME>`` or
+``CAMERA_SOURCE``:
+
+    auto (default)       probe local devices
+    0, device:1          local device index
+    file:clip.mp4        video file (a bare existing path works too)
+    rtsp://..., http://  network stream
+    synthetic[:640x480@15]
+    db:<camera id>       the ``stream_url`` of that row in the ``cameras`` table
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import metrics
+
+# Consecutive failed reads before a source tries to reopen its capture
+FAILURES_BEFORE_RECONNECT = 5
+
+
+def device_backends():
+    """Capture backends worth trying on this platform, best first"""
+    if sys.platform == 'win32':
+        backends = [getattr(cv2, 'CAP_DSHOW', 0), getattr(cv2, 'CAP_MSMF', 0), 0]
+    elif sys.platform.startswith('linux'):
+        backends = [getattr(cv2, 'CAP_V4L2', 0), 0]
+    else:
+        backends = [0]
+    return list(dict.fromkeys(backends))
+
+
+def is_usable_frame(frame, min_mean=3.0, min_max=10):
+    """True when a probe frame is not (almost) black"""
+    return frame is not None and frame.size > 0 and float(np.mean(frame)) > min_mean and int(np.max(frame)) > min_max
+
+
+class FrameSource:
+    """Base class: reconnecting, optionally read-ahead ``read()`` on top of ``_open()`` / ``_read()``"""
+
+    kind = "source"
+    reconnects = True  # FrameHub leaves failure handling to the source
+    live = True  # live sources drop old frames when the read-ahead buffer is full
+
+    def __init__(self, name="camera", log_prefix="[Camera]", read_ahead=None, reconnect_seconds=None):
+        self.name = name
+        self.log_prefix = log_prefix
+        self.read_ahead = int(read_ahead if read_ahead is not None else os.environ.get('CAMERA_READ_AHEAD', 0))
+        self.reconnect_seconds = float(reconnect_seconds if reconnect_seconds is not None
+                                       else os.environ.get('CAMERA_RECONNECT_SECONDS', 30))
+        self.closed = False
+        self.failures = 0
+        self.failing_since = None
+        self.reconnect_attempt = 0
+        self.next_reconnect = 0.0
+        self.buffer = None
+        self.reader = None
+        self.lock = threading.Lock()
+
+    def describe(self):
+        return self.kind
+
+    # Subclasses implement these three
+    def _open(self):
+        """Open the underlying capture; return True on success"""
+        raise NotImplementedError
+
+    def _read(self):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def open(self):
+        """Open the source (and start the read-ahead thread); returns self, or None if it cannot be opened"""
+        if not self._open():
+            print(f"{self.log_prefix} Could not open {self.describe()}")
+            self._close()
+            return None
+        print(f"{self.log_prefix} Reading frames from {self.describe()}")
+        if self.read_ahead > 0:
+            self.buffer = queue.Queue(maxsize=self.read_ahead)
+            self.reader = threading.Thread(target=self._read_ahead, name=f"read-ahead-{self.name}", daemon=True)
+            self.reader.start()
+        return self
+
+    def isOpened(self):
+        return not self.closed
+
+    def read(self):
+        if self.buffer is None:
+            return self._read_reconnecting()
+        while True:
+            try:
+                return self.buffer.get(timeout=1.0)
+            except queue.Empty:
+                if self.closed:
+                    return False, None
+
+    def _read_ahead(self):
+        while not self.closed:
+            item = self._read_reconnecting()
+            if self.live:
+                # Keep the newest frames: make room instead of blocking the decoder
+                while True:
+                    try:
+                        self.buffer.put_nowait(item)
+                        break
+                    except queue.Full:
+                        try:
+                            self.buffer.get_nowait()
+                        except queue.Empty:
+                            pass
+            else:
+                while not self.closed:
+                    try:
+                        self.buffer.put(item, timeout=1.0)
+                        break
+                    except queue.Full:
+                        pass
+            if not item[0] and self.closed:
+                break
+
+    def _read_reconnecting(self):
+        """One read; reopens the capture with backoff after repeated failures"""
+        if self.closed:
+            return False, None
+        with self.lock:
+            try:
+                ok, frame = self._read()
+            except Exception as e:
+                print(f"{self.log_prefix} Read error on {self.describe()}: {e}")
+                ok, frame = False, None
+            if ok and frame is not None:
+                self.failures = 0
+                self.failing_since = None
+                self.reconnect_attempt = 0
+                return True, frame
+
+            now = time.time()
+            self.failures += 1
+            if self.failing_since is None:
+                self.failing_since = now
+            if now - self.failing_since > self.reconnect_seconds:
+                print(f"{self.log_prefix} No frames from {self.describe()} for {self.reconnect_seconds:.0f}s; giving up")
+                self._shutdown()
+                return False, None
+            if self.failures >= FAILURES_BEFORE_RECONNECT and now >= self.next_reconnect:
+                self._reconnect(now)
+        time.sleep(0.01)
+        return False, None
+
+    def _reconnect(self, now):
+        self.reconnect_attempt += 1
+        delay = min(10.0, 0.5 * (2 ** (self.reconnect_attempt - 1)))
+        self.next_reconnect = now + delay
+        print(f"{self.log_prefix} Reconnecting {self.describe()} (attempt {self.reconnect_attempt})")
+        metrics.inc('vision_source_reconnects_total', camera=self.name)
+        self._close()
+        try:
+            if self._open():
+                self.failures = 0
+                return
+        except Exception as e:
+            print(f"{self.log_prefix} Reconnect failed: {e}")
+        self._close()
+
+    def _shutdown(self):
+        self.closed = True
+        self._close()
+
+    def release(self):
+        self.closed = True
+        if self.reader is not None and self.reader is not threading.current_thread():
+            self.reader.join(timeout=2.0)
+        with self.lock:
+            self._close()
+
+
+class CaptureSource(FrameSource):
+    """Source backed by a ``cv2.VideoCapture``"""
+
+    def __init__(self, target, backend=None, **kwargs):
+        super().__init__(**kwargs)
+        self.target = target
+        self.backend = backend
+        self.capture = None
+
+    def describe(self):
+        return f"{self.kind} {self.target}"
+
+    def _open(self):
+        self.capture = cv2.VideoCapture(self.target, self.backend) if self.backend is not None \
+            else cv2.VideoCapture(self.target)
+        return self.capture.isOpened()
+
+    def _read(self):
+        if self.capture is None:
+            return False, None
+        return self.capture.read()
+
+    def _close(self):
+        if self.capture is not None:
+            try:
+                self.capture.release()
+            except Exception:
+                pass
+            self.capture = None
+
+
+class DeviceSource(CaptureSource):
+    """Local camera by index; ``index=None`` probes ``CAMERA_MAX_INDEX`` indices for a non-black device"""
+
+    kind = "device"
+
+    def __init__(self, index=None, width=None, height=None, **kwargs):
+        super().__init__(index, **kwargs)
+        self.width = width
+        self.height = height
+
+    def describe(self):
+        return f"{self.kind} {'(auto)' if self.target is None else self.target}"
+
+    def _open(self):
+        if self.target is None:
+            self.target, self.backend = self._probe()
+            if self.target is None:
+                return False
+        if not super()._open():
+            return False
+        if self.width and self.height:
+            try:
+                self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+                self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+            except Exception:
+                pass
+        return True
+
+    def _probe(self):
+        tried = []
+        for index in range(int(os.environ.get('CAMERA_MAX_INDEX', 6))):
+            for backend in device_backends():
+                tried.append((index, backend))
+                try:
+                    cap = cv2.VideoCapture(index, backend)
+                except Exception:
+                    cap = cv2.VideoCapture(index)
+                if not cap.isOpened():
+                    cap.release()
+                    continue
+                # Read a few frames to let the camera auto-adjust and skip devices that only return black
+                usable = False
+                for _ in range(3):
+                    ok, frame = cap.read()
+                    if ok and is_usable_frame(frame):
+                        usable = True
+                        break
+                cap.release()
+                if usable:
+                    print(f"{self.log_prefix} Camera found on index {index} backend {backend}")
+                    return index, backend
+                print(f"{self.log_prefix} Camera at index {index} backend {backend} returned no usable frame")
+        print(f"{self.log_prefix} ERROR: No usable camera found! Tried: {tried}")
+        return None, None
+
+
+class VideoFileSource(CaptureSource):
+    """Recorded clip, paced to its FPS (``CAMERA_FILE_REALTIME``) and looped (``CAMERA_FILE_LOOP``)"""
+
+    kind = "file"
+    live = False
+
+    def __init__(self, path, loop=None, realtime=None, **kwargs):
+        super().__init__(path, **kwargs)
+        self.loop = (os.environ.get('CAMERA_FILE_LOOP', '1') != '0') if loop is None else loop
+        self.realtime = (os.environ.get('CAMERA_FILE_REALTIME', '1') != '0') if realtime is None else realtime
+        self.frame_interval = 0.0
+        self.next_frame_at = 0.0
+
+    def _open(self):
+        if not os.path.isfile(self.target) or not super()._open():
+            return False
+        fps = self.capture.get(cv2.CAP_PROP_FPS) or 0
+        self.frame_interval = 1.0 / fps if self.realtime and 0 < fps < 240 else 0.0
+        self.next_frame_at = time.perf_counter()
+        return True
+
+    def _read(self):
+        ok, frame = super()._read()
+        if not ok and self.loop and self.capture is not None:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.capture.read()
+        elif not ok:
+            # End of a non-looping clip is final, not something to reconnect from
+            self.closed = True
+        if ok and self.frame_interval:
+            delay = self.next_frame_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_frame_at = max(self.next_frame_at + self.frame_interval, time.perf_counter() - self.frame_interval)
+        return ok, frame
+
+
+class StreamSource(CaptureSource):
+    """RTSP / HTTP(S) network stream"""
+
+    kind = "stream"
+
+    def __init__(self, url, **kwargs):
+        super().__init__(url, backend=getattr(cv2, 'CAP_FFMPEG', None), **kwargs)
+
+    def describe(self):
+        # Do not print credentials embedded in the URL
+        scheme, sep, rest = self.target.partition('://')
+        return f"{self.kind} {scheme}{sep}{rest.rsplit('@', 1)[-1]}"
+
+    def _open(self):
+        if self.target.startswith('rtsp') and 'OPENCV_FFMPEG_CAPTURE_OPTIONS' not in os.environ:
+            # TCP avoids smeared frames from dropped UDP packets
+            os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = 'rtsp_transport;tcp'
+        if not super()._open():
+            return False
+        try:
+            self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # keep latency low; read-ahead does the buffering
+        except Exception:
+            pass
+        return True
+
+
+class SyntheticSource(FrameSource):
+    """Generated frames (moving gradient plus frame counter) at a fixed size and FPS"""
+
+    kind = "synthetic"
+
+    def __init__(self, width=640, height=480, fps=15.0, **kwargs):
+        super().__init__(**kwargs)
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.index = 0
+        self.next_frame_at = 0.0
+        ramp = np.linspace(0, 255, width, dtype=np.float32)
+        self.base = np.repeat(ramp[None, :], height, axis=0)
+
+    def describe(self):
+        return f"{self.kind} {self.width}x{self.height}@{self.fps:g}"
+
+    def _open(self):
+        self.next_frame_at = time.perf_counter()
+        return True
+
+    def _read(self):
+        if self.fps > 0:
+            delay = self.next_frame_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_frame_at = max(self.next_frame_at + 1.0 / self.fps, time.perf_counter() - 1.0 / self.fps)
+        shift = (self.index * 4) % self.width
+        frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        frame[:, :, 0] = np.roll(self.base, shift, axis=1).astype(np.uint8)
+        frame[:, :, 1] = 96
+        frame[:, :, 2] = 255 - frame[:, :, 0]
+        cv2.putText(frame, f"{self.name} #{self.index}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        self.index += 1
+        return True, frame
+
+
+def parse_synthetic(spec):
+    """'synthetic[:WxH[@FPS]]' -> (width, height, fps)"""
+    width, height, fps = 640, 480, 15.0
+    _, _, params = spec.partition(':')
+    if params:
+        size, _, rate = params.partition('@')
+        if size:
+            width, height = (int(v) for v in size.lower().split('x'))
+        if rate:
+            fps = float(rate)
+    return width, height, fps
+
+
+def source_spec(name):
+    """Configured source spec for a camera: CAMERA_SOURCE_<NAME>, else CAMERA_SOURCE, else 'auto'"""
+    return (os.environ.get(f"CAMERA_SOURCE_{str(name).upper()}") or os.environ.get('CAMERA_SOURCE') or 'auto').strip()
+
+
+def make_source(spec, name="camera", log_prefix="[Camera]", **device_kwargs):
+    """Build (without opening) the source described by ``spec``"""
+    common = {"name": name, "log_prefix": log_prefix}
+    spec = str(spec).strip()
+    lowered = spec.lower()
+    if lowered.startswith('db:'):
+        import db
+        camera_id = int(spec[3:])
+        row = db.get_camera(camera_id)
+        if not row or not row.get('stream_url'):
+            raise ValueError(f"Camera {camera_id} has no stream_url in the cameras table")
+        return make_source(row['stream_url'], name, log_prefix, **device_kwargs)
+    if lowered in ('', 'auto', 'device'):
+        return DeviceSource(None, **device_kwargs, **common)
+    if lowered.startswith('device:'):
+        return DeviceSource(int(spec[7:]), **device_kwargs, **common)
+    if spec.isdigit():
+        return DeviceSource(int(spec), **device_kwargs, **common)
+    if lowered.startswith('synthetic'):
+        width, height, fps = parse_synthetic(spec)
+        return SyntheticSource(width, height, fps, **common)
+    if lowered.startswith(('rtsp://', 'rtsps://', 'rtmp://', 'http://', 'https://')):
+        return StreamSource(spec, **common)
+    if lowered.startswith('file:'):
+        spec = spec[5:]
+    return VideoFileSource(spec, **common)
+
+
+def open_source(name, log_prefix="[Camera]", spec=None, **device_kwargs):
+    """Open the configured source for camera ``name``; None when it cannot be opened"""
+    spec = spec if spec is not None else source_spec(name)
+    try:
+        source = make_source(spec, name=name, log_prefix=log_prefix, **device_kwargs)
+    except Exception as e:
+        print(f"{log_prefix} Invalid camera source {spec!r}: {e}")
+        return None
+    return source.open()
@@ -0,0 +1,157 @@
+"""Hand gesture rules applied to MediaPipe Hands landmarks.
+
+Each hand is converted once into a (21, 3) float32 array of normalized
+``(x, y, z)`` landmarks; the hands of a frame are stacked into an (H, 21, 3)
+array. ``hand_features`` computes finger-extension, finger-curl and thumb-tuck
+features for all hands with a few NumPy operations, and a ``GestureClassifier``
+evaluates an ordered list of gesture rules over those features in one pass.
+The fixed cost of those NumPy calls only pays off with several hands, so frames
+with fewer than ``BATCH_MIN_HANDS`` hands (MediaPipe is run with at most two)
+are classified hand by hand from ``hand_features_scalar`` in plain Python.
+
+Kept out of the Flask server so offline tools (``benchmark_pipelines.py``,
+``bench_gesture_classifier.py``) can classify hands without starting a server.
+"""
+
+import numpy as np
+
+WRIST = 0
+THUMB_TIP = 4
+INDEX_TIP = 8
+FINGER_TIPS = np.array([8, 12, 16, 20])  # index, middle, ring, pinky
+FINGER_PIPS = np.array([6, 10, 14, 18])
+_FINGER_PAIRS = tuple(zip(FINGER_TIPS.tolist(), FINGER_PIPS.tolist()))
+# Thumb counts as tucked when its tip is closer to the wrist than this fraction of the index tip distance
+THUMB_TUCK_RATIO = 0.75
+# Hands per frame from which the NumPy batch path is faster than per-hand Python (bench_gesture_classifier.py)
+BATCH_MIN_HANDS = 6
+
+_TIPS_AND_PIPS = np.concatenate([FINGER_TIPS, FINGER_PIPS])
+NO_HANDS = np.zeros((0, 21, 3), dtype=np.float32)
+
+
+def landmarks_array(hand_landmarks):
+    """(21, 3) float32 array of one MediaPipe hand's normalized landmarks"""
+    return np.fromiter((v for lm in hand_landmarks.landmark for v in (lm.x, lm.y, lm.z)),
+                       dtype=np.float32, count=63).reshape(21, 3)
+
+
+def hands_array(results):
+    """(H, 21, 3) landmarks of every hand in a MediaPipe Hands result (H may be 0)"""
+    found = getattr(results, 'multi_hand_landmarks', None) if results is not None else None
+    if not found:
+        return NO_HANDS
+    # One pass over all landmark objects of the frame straight into a float32 buffer
+    values = (v for hand in found for lm in hand.landmark for v in (lm.x, lm.y, lm.z))
+    return np.fromiter(values, dtype=np.float32, count=63 * len(found)).reshape(len(found), 21, 3)
+
+
+def hand_features(hands):
+    """Per-hand features for an (H, 21, 3) array; every value has H rows"""
+    # Squared (x, y) distance of every landmark to its wrist; only comparisons are needed, so no sqrt
+    offsets = hands[:, :, :2] - hands[:, WRIST:WRIST + 1, :2]
+    sq_wrist = np.einsum('hij,hij->hi', offsets, offsets)
+    y = hands[:, _TIPS_AND_PIPS, 1]
+    sq = sq_wrist[:, _TIPS_AND_PIPS]
+    # Image y grows downwards: a finger is up when its tip is above its PIP joint
+    fingers_up = y[:, :4] < y[:, 4:]
+    # Folded fingers end closer to the wrist than their own PIP joint
+    fingers_curled = sq[:, :4] < sq[:, 4:]
+    thumb_tucked = sq_wrist[:, THUMB_TIP] < (THUMB_TUCK_RATIO ** 2) * sq_wrist[:, INDEX_TIP]
+    return {
+        "fingers_up": fingers_up,
+        "all_up": fingers_up.all(axis=1),
+        "all_curled": fingers_curled.all(axis=1),
+        "thumb_tucked": thumb_tucked,
+        "thumb_out": ~thumb_tucked,
+    }
+
+
+def hand_features_scalar(hand):
+    """The ``hand_features`` of one hand given as 21 ``(x, y, z)`` sequences, as plain Python values"""
+    wx, wy = hand[WRIST][0], hand[WRIST][1]
+
+    def sq_wrist(i):
+        x, y = hand[i][0] - wx, hand[i][1] - wy
+        return x * x + y * y
+
+    fingers_up = [hand[tip][1] < hand[pip][1] for tip, pip in _FINGER_PAIRS]
+    thumb_tucked = sq_wrist(THUMB_TIP) < (THUMB_TUCK_RATIO ** 2) * sq_wrist(INDEX_TIP)
+    return {
+        "fingers_up": fingers_up,
+        "all_up": all(fingers_up),
+        "all_curled": all(sq_wrist(tip) < sq_wrist(pip) for tip, pip in _FINGER_PAIRS),
+        "thumb_tucked": thumb_tucked,
+        "thumb_out": not thumb_tucked,
+    }
+
+
+def is_sos(features):
+    """Four fingers up, thumb tucked"""
+    return features["all_up"] & features["thumb_tucked"]
+
+
+def is_open_palm(features):
+    """Four fingers up, thumb out"""
+    return features["all_up"] & features["thumb_out"]
+
+
+def is_fist(features):
+    """Four fingers folded towards the wrist"""
+    return features["all_curled"]
+
+
+DEFAULT_RULES = (("sos", is_sos), ("open_palm", is_open_palm), ("fist", is_fist))
+
+
+class GestureClassifier:
+    """Ordered gesture rules; a hand gets the first rule that matches it.
+
+    A rule is called with either the (H,) arrays of ``hand_features`` or the
+    per-hand Python values of ``hand_features_scalar``, so rules combine
+    features with ``&`` / ``|`` (both polarities are provided instead of ``~``).
+    """
+
+    def __init__(self, rules=DEFAULT_RULES, batch_min_hands=BATCH_MIN_HANDS):
+        self.rules = list(rules)
+        self.batch_min_hands = batch_min_hands
+
+    @property
+    def names(self):
+        return [name for name, _ in self.rules]
+
+    def add(self, name, rule):
+        """Append a rule: ``rule(features)`` returns an (H,) bool array, or a bool for one hand's features"""
+        self.rules.append((name, rule))
+
+    def matches(self, hands):
+        """(H, G) bool matrix of which rules match which hand"""
+        if len(hands) == 0:
+            return np.zeros((0, len(self.rules)), dtype=bool)
+        features = hand_features(hands)
+        return np.column_stack([rule(features) for _, rule in self.rules])
+
+    def classify(self, hands):
+        """Gesture name (or None) for each hand of an (H, 21, 3) array"""
+        if len(hands) >= self.batch_min_hands:
+            matched = self.matches(hands)
+            first = matched.argmax(axis=1)
+            return [self.rules[i][0] if row[i] else None for i, row in zip(first.tolist(), matched)]
+        labels = []
+        for hand in hands.tolist():
+            features = hand_features_scalar(hand)
+            for name, rule in self.rules:
+                if rule(features):
+                    labels.append(name)
+                    break
+            else:
+                labels.append(None)
+        return labels
+
+
+CLASSIFIER = GestureClassifier()
+
+
+def is_sos_signal(hand_landmarks):
+    """Detect SOS signal: 4 fingers up, thumb tucked"""
+    return bool(is_sos(hand_features_scalar([(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark])))
@@ -4,12 +4,24 @@ import numpy as np
 from flask import Flask, Response, jsonify
 from flask_cors import CORS
 import time
-import requests
 import os
 from flask import request
+import threading
+from camera_pipelines import CameraRegistry
+from frame_hub import ResultSlot
+from hands_pool import PROCESS_WIDTH, HandsPool, static_hands_factory
+from sos_dispatch import SOSDispatcher
+from gesture_classifier import CLASSIFIER, hands_array
+from gesture_temporal import GestureTemporalState
+from adaptive_scheduler import AdaptiveScheduler
+from motion_gate import MotionGate
+import metrics
+from image_io import BatchTooLargeError, decode_payload, fit_width, request_frames, request_image
+from concurrent.futures import ThreadPoolExecutor
 
 app = Flask(__name__)
 CORS(app)
+metrics.install(app)
 
 # MediaPipe setup
 mp_hands = mp.solutions.hands
@@ -20,299 +32,312 @@ HAND_CONNECTION_COLOR = (0, 255, 0)  # green lines
 HAND_LANDMARK_COLOR = (0, 0, 255)    # red dots
 HAND_CONNECTION_THICKNESS = 2
 HAND_LANDMARK_RADIUS = 4
+HAND_SEGMENTS = np.array(sorted(mp_hands.HAND_CONNECTIONS), dtype=np.intp)  # (connections, 2) landmark indices
 
 # Performance tuning
-TARGET_FPS = 20  # desired frame rate to serve
-PROCESS_EVERY_N_FRAMES = 2  # process every Nth frame with MediaPipe (reduce CPU)
-PROCESS_WIDTH = 480  # width to resize frames for processing
+TARGET_FPS = 20  # frame rate to serve while hands are in view (ADAPTIVE_ACTIVE_FPS overrides)
+PROCESS_EVERY_N_FRAMES = 2  # starting point: process every Nth frame with MediaPipe (reduce CPU)
+GESTURE_BUDGET_MS = 60  # default per-frame processing budget (ADAPTIVE_BUDGET_MS[_GESTURE] overrides)
+# Cameras served by this process, same format as FACE_CAMERAS (see camera_pipelines.py).
+# Empty: a single camera "gesture" (CAMERA_SOURCE_GESTURE)
+GESTURE_CAMERAS = os.environ.get('GESTURE_CAMERAS', '').strip()
+DEFAULT_CAMERA = "gesture"
 # Global state
-camera = None
+# Pre-built static-image Hands graphs shared by /detect_frame requests (GESTURE_HANDS_POOL)
+hands_pool = HandsPool(static_hands_factory(max_num_hands=2, min_detection_confidence=0.5))
+# Runs the frames of a /detect_batch request across the pooled Hands instances
+batch_executor = ThreadPoolExecutor(max_workers=hands_pool.size, thread_name_prefix="hands-batch")
+DETECT_BATCH_MAX_FRAMES = int(os.environ.get('DETECT_BATCH_MAX_FRAMES', 32))
 latest_gesture = {"type": None, "confidence": 0, "timestamp": time.time()}
 sos_detected = False
-sos_count = 0
-last_sos_time = 0
-SOS_COOLDOWN = 30  # seconds between notifications
-SOS_REQUIRED_FRAMES = 5  # how many consecutive frames to require before firing
-
-def init_camera():
-    """Initialize camera"""
-    global camera
-    if camera is not None:
-        return camera
-    # Try multiple indices/backends and verify frames are non-black
-    max_indices = 6
-    backends = [getattr(cv2, 'CAP_DSHOW', 0), getattr(cv2, 'CAP_MSMF', 0), 0]
-    tried = []
-    for i in range(max_indices):
-        for backend in backends:
-            try:
-                cap = cv2.VideoCapture(i, backend)
-            except Exception:
-                cap = cv2.VideoCapture(i)
-
-            tried.append((i, backend))
-            print(f"[Gesture Recognition] Trying camera index {i} backend {backend}")
-            if cap.isOpened():
-                ret, frame = cap.read()
-                if ret and frame is not None:
-                    try:
-                        import numpy as _np
-                        if _np.any(frame != 0):
-                            # set a lower default resolution for faster processing
-                            try:
-                                cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                            except Exception:
-                                pass
-                            print(f"[Gesture Recognition] Camera initialized on index {i} backend {backend}")
-                            camera = cap
-                            return camera
-                        else:
-                            print(f"[Gesture Recognition] Camera at index {i} produced all-black frame")
-                    except Exception as e:
-                        print(f"[Gesture Recognition] Frame check error: {e}")
-                cap.release()
-
-    print(f"[Gesture Recognition] ERROR: No usable camera found! Tried: {tried}")
-    return None
-
-def is_sos_signal(hand_landmarks):
-    """Detect SOS signal: 4 fingers up, thumb tucked"""
-    landmarks = hand_landmarks.landmark
-    
-    # Check if fingers are up (except thumb)
-    finger_tips = [8, 12, 16, 20]  # Index, middle, ring, pinky
-    finger_pips = [6, 10, 14, 18]
-    
-    fingers_up = 0
-    for tip, pip in zip(finger_tips, finger_pips):
-        if landmarks[tip].y < landmarks[pip].y:
-            fingers_up += 1
-    
-    # Check if thumb is tucked (not extended).
-    # Heuristic: thumb tip is significantly closer to the wrist than index tip is when tucked.
-    thumb_tip = landmarks[4]
-    index_tip = landmarks[8]
-    wrist = landmarks[0]
-
-    def dist(a, b):
-        return ((a.x - b.x) ** 2 + (a.y - b.y) ** 2) ** 0.5
-
-    thumb_wrist = dist(thumb_tip, wrist)
-    index_wrist = dist(index_tip, wrist)
-    # If thumb is much closer to wrist than index (folded in), treat as tucked
-    thumb_tucked = thumb_wrist < (0.75 * index_wrist)
-
-    return fingers_up == 4 and thumb_tucked
-
-
-def trigger_sos_event(message: str = "SOS Emergency detected"):
-    """Centralized routine to record and notify about an SOS event with cooldown."""
-    global latest_gesture, sos_detected, last_sos_time
+last_sos_time = {}  # camera id (None for uploaded frames) -> time of its last notification
+SOS_COOLDOWN = 30  # seconds between notifications of one camera
+# Processed frames showing SOS within GESTURE_WINDOW_SECONDS required before firing
+SOS_REQUIRED_FRAMES = int(os.environ.get('SOS_REQUIRED_FRAMES', 5))
+# Delivers SOS incidents/notifications to the Next.js API in the background (SOS_API_URL)
+sos_dispatcher = SOSDispatcher(log_prefix="[Gesture Recognition]").start()
+metrics.set_gauge('vision_sos_queue_depth', lambda: sos_dispatcher.queue.qsize())
+
+def trigger_sos_event(message: str = "SOS Emergency detected", camera=None, location=None):
+    """Centralized routine to record and notify about an SOS event with cooldown (per camera)."""
+    global latest_gesture, sos_detected
     now = time.time()
-    if now - last_sos_time < SOS_COOLDOWN:
+    if now - last_sos_time.get(camera, 0) < SOS_COOLDOWN:
         print("[Gesture Recognition] SOS event suppressed by cooldown")
         return
 
-    last_sos_time = now
+    last_sos_time[camera] = now
     sos_detected = True
     latest_gesture = {
         "type": "sos",
         "confidence": 0.95,
         "timestamp": now,
         "message": message,
+        "camera": camera,
     }
 
     print("[Gesture Recognition] Triggering SOS event: ", message)
 
-    # Send alert to backend incidents API and notify responder (best-effort) -- reuse existing logic
+    # Send alert to backend incidents API and notify responder (best-effort); delivery happens on the
+    # dispatcher's thread so the stream and detect_frame never wait on the API
+    responder_id = int(os.environ.get('SOS_RESPOUNDER_ID', 2))
     incident_payload = {
         "incident_type": "sos",
-        "responder_id": int(os.environ.get('SOS_RESPOUNDER_ID', 2)),
+        "responder_id": responder_id,
         "severity": "critical",
         "status": "reported",
         "description": message,
-        "location": "unknown",
+        "location": location or "unknown",
     }
-    try:
-        resp = requests.post('http://localhost:3000/api/incidents', json=incident_payload, timeout=5)
-        print(f"[Gesture Recognition] Incident POST status: {resp.status_code}")
-    except Exception as e:
-        print(f"[Gesture Recognition] Failed to send incident: {e}")
-
-    try:
-        notify_payload = {
-            "responder_id": int(os.environ.get('SOS_RESPOUNDER_ID', 2)),
-            "message": message,
-            "source": "gesture_recognition",
-        }
-        resp2 = requests.post('http://localhost:3000/api/responders/notify', json=notify_payload, timeout=5)
-        print(f"[Gesture Recognition] Notified responder: status={resp2.status_code}")
-    except Exception as e:
-        print(f"[Gesture Recognition] Failed to notify responder: {e}")
-
-def generate_frames():
-    """Generate video frames with gesture detection"""
-    global latest_gesture, sos_detected, sos_count
-    
-    cap = init_camera()
-    if cap is None:
-        return
-    # Run an outer loop which creates a fresh Hands graph per stream session.
-    while True:
-        # Create a per-stream MediaPipe instance to avoid graph/timestamp reuse across requests
-        with mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=2,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        ) as hands:
-            frame_idx = 0
-            last_processed = None
-            last_annotated_frame = None
-            target_frame_time = 1.0 / TARGET_FPS
-            perf_counter_start = time.perf_counter()
-            perf_count = 0
-            while True:
-                start = time.perf_counter()
-                success, frame = cap.read()
-                if not success:
-                    print("[Gesture Recognition] Failed to read frame")
-                    return
-
+    notify_payload = {
+        "responder_id": responder_id,
+        "message": message,
+        "source": "gesture_recognition",
+    }
+    sos_dispatcher.enqueue('/api/incidents', incident_payload)
+    sos_dispatcher.enqueue('/api/responders/notify', notify_payload)
+
+def draw_hand(frame, points, show_indices=True):
+    """Draw one hand ((21, 2+) normalized landmark array) with green connections and red dots"""
+    # Convert normalized landmarks to pixel coordinates in one step
+    h, w, _ = frame.shape
+    pts = (np.asarray(points, dtype=np.float32)[:, :2] * (w, h)).astype(np.int32)
+
+    # Draw all connections with one call
+    cv2.polylines(frame, list(pts[HAND_SEGMENTS]), False, HAND_CONNECTION_COLOR, HAND_CONNECTION_THICKNESS)
+
+    # Draw landmarks as filled circles
+    for i, (x_px, y_px) in enumerate(pts.tolist()):
+        cv2.circle(frame, (x_px, y_px), HAND_LANDMARK_RADIUS, HAND_LANDMARK_COLOR, -1)
+        if show_indices:
+            # small index label (white)
+            cv2.putText(frame, str(i), (x_px + 4, y_px + 4), cv2.FONT_HERSHEY_PLAIN, 0.8, (255, 255, 255), 1)
+
+
+class GestureWorker:
+    """Runs MediaPipe Hands and the SOS logic once per captured frame for one camera.
+
+    Results are published to ``self.results``; stream generators only draw the
+    latest result onto the frame, so viewers share one Hands graph.
+    """
+
+    def __init__(self, hub, log_prefix="[Gesture Recognition]", location=None):
+        self.hub = hub
+        self.log_prefix = log_prefix
+        self.location = location
+        self.results = ResultSlot()
+        # SOS confirmation state of this camera only
+        self.temporal = GestureTemporalState(min_frames=SOS_REQUIRED_FRAMES)
+        # While a hand is in view only the MediaPipe input shrinks: skipping more frames would starve the SOS vote
+        self.scheduler = AdaptiveScheduler(hub.name, budget_ms=GESTURE_BUDGET_MS, active_fps=TARGET_FPS,
+                                           base_every=PROCESS_EVERY_N_FRAMES,
+                                           active_max_every=PROCESS_EVERY_N_FRAMES, log_prefix=log_prefix)
+        # Skips MediaPipe on static scenes with no hand in view (keep-alive every MOTION_KEEPALIVE_SECONDS)
+        self.motion = MotionGate(hub.name)
+        self.thread = threading.Thread(target=self._run, name=f"gesture-{hub.name}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while self.hub.is_alive():
+            # Recreated whenever MediaPipe raises, to avoid reusing a broken graph
+            with mp_hands.Hands(
+                static_image_mode=False,
+                max_num_hands=2,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            ) as hands:
+                if not self._process(hands):
+                    break
+        print(f"{self.log_prefix} Gesture worker stopped (capture ended)")
+
+    def _process(self, hands):
+        """Process frames until capture ends (False) or the graph must be recreated (True)"""
+        global latest_gesture, sos_detected
+        last_processed = None
+        perf_counter_start = time.perf_counter()
+        perf_count = 0
+        camera = self.hub.name
+        scheduler = self.scheduler
+        for captured in self.hub.frames():
+            start = time.perf_counter()
+
+            # Run MediaPipe only on the frames the scheduler picks and that changed (or still show a hand);
+            # the others reuse the last result
+            hands_in_view = bool(last_processed and last_processed[1])
+            if scheduler.should_process() and self.motion.should_run(captured.image, hands_in_view):
                 # Flip frame horizontally for mirror view
-                frame = cv2.flip(frame, 1)
+                frame = cv2.flip(captured.image, 1)
 
                 # Resize a smaller copy for faster processing if large
                 h, w, _ = frame.shape
                 proc_frame = frame
-                if w > PROCESS_WIDTH:
-                    new_h = int(PROCESS_WIDTH * (h / w))
-                    proc_frame = cv2.resize(frame, (PROCESS_WIDTH, new_h))
+                width = int(PROCESS_WIDTH * scheduler.scale)
+                if w > width:
+                    new_h = int(width * (h / w))
+                    proc_frame = cv2.resize(frame, (width, new_h))
 
                 # Convert to RGB and make contiguous (MediaPipe requirement)
                 rgb_proc = cv2.cvtColor(proc_frame, cv2.COLOR_BGR2RGB)
                 rgb_proc = np.ascontiguousarray(rgb_proc)
+                metrics.observe_stage('preprocess', time.perf_counter() - start, camera=camera)
 
-                results = None
-                # Process only every Nth frame to reduce CPU
-                if (frame_idx % PROCESS_EVERY_N_FRAMES) == 0:
-                    try:
+                try:
+                    with metrics.stage_timer('hands', camera=camera):
                         results = hands.process(rgb_proc)
-                        last_processed = results
-                    except ValueError as e:
-                        print(f"[Gesture Recognition] MediaPipe error: {e}")
-                        # Break inner loop to recreate the Hands instance
-                        break
-                else:
-                    results = last_processed
-                gesture_detected = False
-
-                if results and results.multi_hand_landmarks:
-                    for hand_landmarks in results.multi_hand_landmarks:
-                        # Custom drawing: green connections and red landmark dots (more visible)
-                        # Convert normalized landmarks to pixel coordinates
-                        h, w, _ = frame.shape
-                        pts = []
-                        for lm in hand_landmarks.landmark:
-                            x_px = int(lm.x * w)
-                            y_px = int(lm.y * h)
-                            pts.append((x_px, y_px))
-
-                        # Draw connections
-                        for (start_idx, end_idx) in mp_hands.HAND_CONNECTIONS:
-                            if start_idx < len(pts) and end_idx < len(pts):
-                                cv2.line(frame, pts[start_idx], pts[end_idx], HAND_CONNECTION_COLOR, HAND_CONNECTION_THICKNESS)
-
-                        # Draw landmarks as filled circles
-                        for i, (x_px, y_px) in enumerate(pts):
-                            cv2.circle(frame, (x_px, y_px), HAND_LANDMARK_RADIUS, HAND_LANDMARK_COLOR, -1)
-                            # small index label (white)
-                            cv2.putText(frame, str(i), (x_px + 4, y_px + 4), cv2.FONT_HERSHEY_PLAIN, 0.8, (255, 255, 255), 1)
-
-                        # Check for SOS signal
-                        if is_sos_signal(hand_landmarks):
-                            gesture_detected = True
-                            sos_count += 1
-
-                            # Trigger SOS if detected for a few consecutive frames and cooldown passed
-                            if sos_count >= SOS_REQUIRED_FRAMES and (time.time() - last_sos_time) >= SOS_COOLDOWN:
-                                trigger_sos_event("SOS Emergency detected")
-
-                            # Draw SOS indicator (visual feedback when seen in frame)
-                            cv2.rectangle(frame, (10, 10), (frame.shape[1] - 10, 60), (0, 0, 255), -1)
-                            cv2.putText(frame, "SOS Emergency detected", (20, 42),
-                                      cv2.FONT_HERSHEY_DUPLEX, 1, (255, 255, 255), 2)
-                            cv2.rectangle(frame, (10, 10), (frame.shape[1] - 10, frame.shape[0] - 10),
-                                        (0, 0, 255), 5)
-        
-        # Reset SOS count if gesture not detected
-        if not gesture_detected:
-            if sos_count > 0:
-                sos_count = max(0, sos_count - 2)
-            if sos_detected:
-                sos_detected = False
-                latest_gesture = {"type": None, "confidence": 0, "timestamp": time.time(), "message": None}
-        
-        # Draw status
-        status_color = (0, 0, 255) if sos_detected else (0, 255, 0)
-        status_text = "SOS ACTIVE" if sos_detected else "Monitoring..."
-        cv2.putText(frame, status_text, (10, frame.shape[0] - 20),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
-        
-        # Encode frame
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-
-        # Throttle to target FPS, accounting for processing time
-        elapsed = time.perf_counter() - start
-        to_sleep = max(0, target_frame_time - elapsed)
-        if to_sleep > 0:
-            time.sleep(to_sleep)
-
-        frame_idx += 1
-        perf_count += 1
-        if perf_count >= 120:
-            elapsed_total = time.perf_counter() - perf_counter_start
-            avg_fps = perf_count / elapsed_total if elapsed_total > 0 else 0
-            print(f"[Gesture Recognition] Avg FPS: {avg_fps:.1f}")
-            perf_count = 0
-            perf_counter_start = time.perf_counter()
+                except ValueError as e:
+                    print(f"{self.log_prefix} MediaPipe error: {e}")
+                    return True
+                # Landmarks become one (H, 21, 3) array for drawing; one or two hands are classified per hand
+                with metrics.stage_timer('classify', camera=camera):
+                    hand_points = hands_array(results)
+                    last_processed = (hand_points, CLASSIFIER.classify(hand_points))
+                scheduler.record(time.perf_counter() - start, subject_present=len(hand_points) > 0)
+                # Only processed frames vote; skipped frames reuse the result for drawing but are not counted again
+                event = self.temporal.update(captured.timestamp, 1.0 if "sos" in last_processed[1] else 0.0)
+                if event == 'activated':
+                    message = "SOS Emergency detected"
+                    if camera != DEFAULT_CAMERA:
+                        message += f" ({self.location or camera})"
+                    trigger_sos_event(message, camera=camera, location=self.location)
+                elif event == 'deactivated' and sos_detected and latest_gesture.get("camera") in (camera, None):
+                    # A camera only clears its own banner (or one raised from an uploaded frame)
+                    sos_detected = False
+                    latest_gesture = {"type": None, "confidence": 0, "timestamp": time.time(), "message": None}
+            hand_points, labels = last_processed or (None, [])
+
+            gesture_detected = False
+            hands_out = []
+            if labels:
+                for points, label in zip(hand_points, labels):
+                    is_sos = label == "sos"
+                    hands_out.append({
+                        "points": points,
+                        "gesture": label,
+                        "is_sos": is_sos,
+                    })
+                    if is_sos:
+                        gesture_detected = True
+
+            self.results.publish({
+                "frame_seq": captured.seq,
+                "hands": hands_out,
+                "sos_in_frame": gesture_detected,
+                "sos_active": self.temporal.active,
+            })
 
-@app.route('/api/gesture/stream')
-def video_feed():
-    """Video streaming route"""
-    cap = init_camera()
-    if cap is None:
-        return jsonify({"error": "Camera not available"}), 503
+            # Throttle to the scheduler's FPS (active or idle), accounting for processing time
+            scheduler.pace(start)
+
+            perf_count += 1
+            if perf_count >= 120:
+                elapsed_total = time.perf_counter() - perf_counter_start
+                avg_fps = perf_count / elapsed_total if elapsed_total > 0 else 0
+                print(f"{self.log_prefix} Avg FPS: {avg_fps:.1f}")
+                metrics.set_gauge('vision_worker_fps', avg_fps, camera=camera)
+                perf_count = 0
+                perf_counter_start = time.perf_counter()
+        return False
+
+
+def render_gestures(captured, result):
+    """Mirrored copy of a captured frame with a gesture worker result drawn on it"""
+    # Flip frame horizontally for mirror view (also gives us a private copy to draw on)
+    frame = cv2.flip(captured.image, 1)
+    sos_active = False
+    if result:
+        sos_active = result["sos_active"]
+        for hand in result["hands"]:
+            draw_hand(frame, hand["points"])
+        if result["sos_in_frame"]:
+            # Draw SOS indicator (visual feedback when seen in frame)
+            cv2.rectangle(frame, (10, 10), (frame.shape[1] - 10, 60), (0, 0, 255), -1)
+            cv2.putText(frame, "SOS Emergency detected", (20, 42),
+                      cv2.FONT_HERSHEY_DUPLEX, 1, (255, 255, 255), 2)
+            cv2.rectangle(frame, (10, 10), (frame.shape[1] - 10, frame.shape[0] - 10),
+                        (0, 0, 255), 5)
+
+    # Draw status
+    status_color = (0, 0, 255) if sos_active else (0, 255, 0)
+    status_text = "SOS ACTIVE" if sos_active else "Monitoring..."
+    cv2.putText(frame, status_text, (10, frame.shape[0] - 20),
+               cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
+    return frame
+
+def gesture_worker(hub, pipeline):
+    location = pipeline.location or (pipeline.name if camera_registry.multi else None)
+    return GestureWorker(hub, log_prefix=pipeline.log_prefix, location=location)
+
+# One pipeline per camera (GESTURE_CAMERAS), each with its own tracking Hands graph and SOS state;
+# the SOS dispatcher and the static Hands pool are shared
+camera_registry = CameraRegistry(GESTURE_CAMERAS, DEFAULT_CAMERA, "[Gesture Recognition]", gesture_worker,
+                                 render_gestures, width=640, height=480)
+
+def camera_hub(camera_id=None):
+    """(pipeline, hub, error response) for a route; the camera is started on first use"""
+    pipeline = camera_registry.get(camera_id)
+    if pipeline is None:
+        if camera_id is not None:
+            return None, None, (jsonify({"error": f"Unknown camera: {camera_id}"}), 404)
+        return None, None, (jsonify({"error": "Camera not available"}), 503)
+    hub = pipeline.get_hub()
+    if hub is None:
+        return pipeline, None, (jsonify({"error": "Camera not available"}), 503)
+    return pipeline, hub, None
+
+def camera_state(pipeline):
+    """Gestures in view and SOS confirmation state of one camera"""
+    worker = pipeline.worker
+    if worker is None:
+        return {"camera": pipeline.id, "gestures": [], "sos": None}
+    worker.temporal.expire()
+    _, result = worker.results.latest()
+    hands = result["hands"] if result else []
+    return {
+        "camera": pipeline.id,
+        "gestures": [{"type": hand["gesture"] or "hand", "is_sos": hand["is_sos"]} for hand in hands],
+        "sos": worker.temporal.snapshot(),
+        "scheduler": worker.scheduler.snapshot(),
+        "motion": worker.motion.snapshot(),
+    }
 
-    return Response(generate_frames(),
+@app.route('/api/gesture/stream')
+@app.route('/api/gesture/stream/<camera_id>')
+def video_feed(camera_id=None):
+    """Video streaming route (default: the first configured camera)"""
+    pipeline, hub, error = camera_hub(camera_id)
+    if error:
+        return error
+
+    return Response(pipeline.generate_frames(),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
 
 @app.route('/api/gesture/test_frame')
 def test_frame():
-    """Return basic stats about a single frame for debugging"""
-    cap = init_camera()
-    if cap is None:
-        return jsonify({"error": "Camera not available"}), 503
+    """Return basic stats about a single frame for debugging (?camera=<id>, default: the first camera)"""
+    pipeline, hub, error = camera_hub(request.args.get('camera'))
+    if error:
+        return error
 
-    ret, frame = cap.read()
-    if not ret or frame is None:
+    captured = hub.latest()
+    if captured is None:
         return jsonify({"error": "Failed to read frame"}), 500
+    frame = captured.image
 
     import numpy as _np
     stats = {
+        "camera": pipeline.id,
         "shape": frame.shape,
         "min": int(_np.min(frame)),
         "max": int(_np.max(frame)),
         "mean": float(_np.mean(frame))
     }
 
-    dbg_path = os.path.join(os.path.dirname(__file__), '..', 'registered_faces', f"gesture_test_frame_{int(time.time())}.jpg")
+    dbg_path = os.path.join(os.path.dirname(__file__), '..', 'registered_faces',
+                            f"gesture_test_frame_{pipeline.id}_{int(time.time())}.jpg")
     try:
         cv2.imwrite(dbg_path, frame)
         stats["saved_path"] = dbg_path
@@ -323,90 +348,124 @@ def test_frame():
 
 
 @app.route('/api/gesture/frame.jpg')
-def frame_jpeg():
+@app.route('/api/gesture/frame/<camera_id>.jpg')
+def frame_jpeg(camera_id=None):
     """Return a single JPEG frame (for quick browser checks)"""
-    cap = init_camera()
-    if cap is None:
-        return jsonify({"error": "Camera not available"}), 503
+    pipeline, hub, error = camera_hub(camera_id)
+    if error:
+        return error
 
-    ret, frame = cap.read()
-    if not ret or frame is None:
+    captured = hub.latest()
+    if captured is None:
         return jsonify({"error": "Failed to read frame"}), 500
 
-    ret, buffer = cv2.imencode('.jpg', frame)
-    if not ret:
-        return jsonify({"error": "Failed to encode frame"}), 500
+    # Same cached bytes the MJPEG stream serves for this frame
+    try:
+        frame_bytes = pipeline.annotated_jpeg(captured)
+    except Exception as e:
+        return jsonify({"error": f"Failed to encode frame: {e}"}), 500
 
-    return Response(buffer.tobytes(), mimetype='image/jpeg')
+    return Response(frame_bytes, mimetype='image/jpeg')
 
 @app.route('/api/gesture/detections')
 def get_detections():
-    """Get latest gesture detections"""
-    return jsonify(latest_gesture)
+    """Get latest gesture detections, plus the gestures and SOS confirmation state of every camera"""
+    resp = dict(latest_gesture)
+    resp["cameras"] = {p.id: camera_state(p) for p in camera_registry.pipelines() if p.worker is not None}
+    return jsonify(resp)
+
+
+@app.route('/api/gesture/detections/<camera_id>')
+def get_camera_detections(camera_id):
+    """Get the gestures and SOS confirmation state of one camera"""
+    pipeline = camera_registry.get(camera_id)
+    if pipeline is None:
+        return jsonify({"error": f"Unknown camera: {camera_id}"}), 404
+    return jsonify(camera_state(pipeline))
+
+
+@app.route('/api/gesture/cameras')
+def get_cameras():
+    """List the cameras this server covers and whether their capture threads are running (?reload=1 re-reads them)"""
+    if request.args.get('reload') or not camera_registry.cameras:
+        camera_registry.load()
+    cameras = []
+    for pipeline in camera_registry.pipelines():
+        worker = pipeline.worker
+        cameras.append(dict(pipeline.status(), sos_active=bool(worker is not None and worker.temporal.active)))
+    return jsonify({"cameras": cameras})
+
+
+@app.route('/api/gesture/reinit_camera', methods=['POST'])
+def reinit_camera():
+    """Force reinitialize a camera, {"camera_id": ...} or the first one (useful if the device was locked)"""
+    camera_id = (request.get_json(silent=True) or {}).get('camera_id')
+    try:
+        pipeline = camera_registry.get(camera_id)
+        if pipeline is None:
+            return jsonify({"success": False, "error": f"Unknown camera: {camera_id}"}), 404
+        # Stopping the capture thread releases the device
+        pipeline.stop()
+        hub = pipeline.get_hub()
+        if hub is None:
+            return jsonify({"success": False, "error": "No usable camera found"}), 503
+        return jsonify({"success": True, "camera_id": pipeline.id, "message": "Camera reinitialized"})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+def process_still(frame):
+    """Run one BGR image through a pooled static-image Hands instance"""
+    # Downscale for faster processing if needed
+    proc = fit_width(frame, PROCESS_WIDTH)
+    rgb_frame = cv2.cvtColor(proc, cv2.COLOR_BGR2RGB)
+    rgb_frame = np.ascontiguousarray(rgb_frame)
+    with metrics.stage_timer('hands'):
+        return hands_pool.process(rgb_frame)
+
+def gestures_from_hands(hand_points):
+    """Per-hand gesture dicts for an (H, 21, 3) landmark array"""
+    gestures = []
+    for label in CLASSIFIER.classify(hand_points):
+        gestures.append({
+            "type": label or "hand",
+            "is_sos": label == "sos",
+            "confidence": 0.95 if label else 0.5
+        })
+    return gestures
 
 
 @app.route('/api/gesture/detect_frame', methods=['POST'])
 def detect_frame():
-    """Accept a base64 image from client and return gesture detections for that frame"""
-    data = request.json or {}
-    image_data = data.get('image_data')
-    if not image_data:
-        return jsonify({"error": "image_data is required"}), 400
-
+    """Accept an image (raw image/jpeg body, multipart upload or base64 data URL) and return gesture detections"""
     try:
-        header, encoded = image_data.split(',', 1)
-        import base64 as _base64, numpy as _np
-        img_bytes = _base64.b64decode(encoded)
-        nparr = _np.frombuffer(img_bytes, _np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        if frame is None:
-            raise ValueError("Could not decode image")
+        frame = request_image(request, 'image_data')
     except Exception as e:
         return jsonify({"error": f"Invalid image_data: {e}"}), 400
+    if frame is None:
+        return jsonify({"error": "image_data is required"}), 400
 
-    # Process with a fresh MediaPipe Hands instance
+    # Process with a pooled MediaPipe Hands instance
     try:
-        # Downscale for faster processing if needed
-        h, w, _ = frame.shape
-        proc = frame
-        if w > PROCESS_WIDTH:
-            proc = cv2.resize(frame, (PROCESS_WIDTH, int(PROCESS_WIDTH * (h / w))))
-        rgb_frame = cv2.cvtColor(proc, cv2.COLOR_BGR2RGB)
-        rgb_frame = np.ascontiguousarray(rgb_frame)
-        with mp_hands.Hands(static_image_mode=True, max_num_hands=2, min_detection_confidence=0.5) as hands:
-            results = hands.process(rgb_frame)
+        results = process_still(frame)
     except Exception as e:
         return jsonify({"error": f"MediaPipe error: {e}"}), 500
 
     gestures = []
-    if results and results.multi_hand_landmarks:
-        print(f"[Gesture Recognition] detect_frame: found {len(results.multi_hand_landmarks)} hand(s)")
-        sos_in_frame = False
-        for hand_idx, hand_landmarks in enumerate(results.multi_hand_landmarks):
-            is_sos = is_sos_signal(hand_landmarks)
-            if is_sos:
-                sos_in_frame = True
-            gestures.append({
-                "type": "sos" if is_sos else "hand",
-                "is_sos": bool(is_sos),
-                "confidence": 0.95 if is_sos else 0.5
-            })
+    hand_points = hands_array(results)
+    if len(hand_points):
+        print(f"[Gesture Recognition] detect_frame: found {len(hand_points)} hand(s)")
+        gestures = gestures_from_hands(hand_points)
 
         # If an SOS was detected in this single-frame request, trigger (respecting cooldown)
-        if sos_in_frame:
+        if any(g["is_sos"] for g in gestures):
             trigger_sos_event("SOS Emergency detected")
 
         # Optionally, return an annotated copy of the frame for debugging
         try:
             # Draw landmarks onto the frame similar to live stream
-            h, w, _ = frame.shape
-            for hand_landmarks in results.multi_hand_landmarks:
-                pts = [(int(lm.x * w), int(lm.y * h)) for lm in hand_landmarks.landmark]
-                for (s, e) in mp_hands.HAND_CONNECTIONS:
-                    if s < len(pts) and e < len(pts):
-                        cv2.line(frame, pts[s], pts[e], HAND_CONNECTION_COLOR, HAND_CONNECTION_THICKNESS)
-                for i, (x_px, y_px) in enumerate(pts):
-                    cv2.circle(frame, (x_px, y_px), HAND_LANDMARK_RADIUS, HAND_LANDMARK_COLOR, -1)
+            for points in hand_points:
+                draw_hand(frame, points, show_indices=False)
 
             import base64
             _, buf = cv2.imencode('.jpg', frame)
@@ -424,6 +483,44 @@ def detect_frame():
         resp['message'] = latest_gesture.get('message')
     return jsonify(resp)
 
+@app.route('/api/gesture/detect_batch', methods=['POST'])
+def detect_batch():
+    """Detect hands in many frames at once; results come back in input order with per-frame errors"""
+    try:
+        # Size and count are checked before any frame is read into memory
+        frames = request_frames(request, max_frames=DETECT_BATCH_MAX_FRAMES)
+    except BatchTooLargeError as e:
+        return jsonify({"error": str(e)}), 413
+    except Exception as e:
+        return jsonify({"error": f"Invalid frames: {e}"}), 400
+    if not frames:
+        return jsonify({"error": "frames is required"}), 400
+
+    def run(item):
+        result = {"timestamp": item["timestamp"], "camera_id": item["camera_id"]}
+        try:
+            frame = decode_payload(item["payload"])
+        except Exception as e:
+            result["error"] = f"Invalid image_data: {e}"
+            return result
+        try:
+            result["gestures"] = gestures_from_hands(hands_array(process_still(frame)))
+        except Exception as e:
+            result["error"] = f"MediaPipe error: {e}"
+        return result
+
+    results = list(batch_executor.map(run, frames))
+    for idx, result in enumerate(results):
+        result["index"] = idx
+
+    if any(g["is_sos"] for r in results for g in r.get("gestures", [])):
+        trigger_sos_event("SOS Emergency detected")
+
+    resp = {"results": results, "failed": sum(1 for r in results if "error" in r)}
+    if latest_gesture.get('message'):
+        resp['message'] = latest_gesture.get('message')
+    return jsonify(resp)
+
 @app.route('/api/gesture/trigger_sos', methods=['POST'])
 def trigger_sos():
     """Manual trigger for SOS (useful for UI testing)."""
@@ -439,6 +536,18 @@ def health():
     """Health check endpoint"""
     return jsonify({"status": "healthy", "service": "gesture_recognition"})
 
+@app.route('/api/gesture/dispatch_stats')
+def dispatch_stats():
+    """SOS dispatch queue depth, delivery counters and latency"""
+    return jsonify(sos_dispatcher.metrics())
+
 if __name__ == '__main__':
     print("[BantayBuhay] Gesture Recognition Server Starting...")
+    try:
+        hands_pool.warm()
+    except Exception as e:
+        print(f"[Gesture Recognition] Could not pre-build MediaPipe Hands pool: {e}")
+    if camera_registry.multi:
+        # Multi-camera mode: capture and watch for SOS on every camera from startup, not on the first viewer
+        camera_registry.start_supervisor()
     app.run(host='0.0.0.0', port=5001, threaded=True, debug=False)
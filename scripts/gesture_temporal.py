@@ -0,0 +1,104 @@
+"""Per-camera temporal confirmation of gestures.
+
+A ``GestureTemporalState`` keeps a fixed-size ring buffer of ``(timestamp,
+score)`` pairs, one per *processed* frame (frames skipped by
+``PROCESS_EVERY_N_FRAMES`` are not counted again). A gesture becomes active when,
+over the last ``window_seconds``, enough processed frames were seen and the
+fraction showing the gesture reaches ``on_ratio``. "Enough" is ``min_frames``,
+lowered to what the observed processed-frame rate can deliver in one window
+(``on_ratio`` of the expected frames, at least 2), so an overloaded camera that
+only gets a few frames per second through MediaPipe still confirms. It only turns
+off again once that fraction falls to ``off_ratio`` or below (hysteresis), or
+when no processed frames arrive for a whole window. ``update()`` reports the
+transitions, so callers act once per episode instead of once per frame.
+"""
+
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+RATE_SAMPLES = 8  # recent processed-frame gaps used to estimate the processing rate
+
+
+class GestureTemporalState:
+    """Sliding-window vote with hysteresis over per-frame gesture scores"""
+
+    def __init__(self, window_seconds=None, on_ratio=None, off_ratio=None, min_frames=5, capacity=64):
+        self.window_seconds = float(window_seconds if window_seconds is not None
+                                    else os.environ.get('GESTURE_WINDOW_SECONDS', 1.0))
+        self.on_ratio = float(on_ratio if on_ratio is not None else os.environ.get('GESTURE_ON_RATIO', 0.6))
+        self.off_ratio = float(off_ratio if off_ratio is not None else os.environ.get('GESTURE_OFF_RATIO', 0.2))
+        self.min_frames = int(min_frames)
+        self.lock = threading.Lock()
+        self.times = np.full(capacity, -np.inf)
+        self.scores = np.zeros(capacity, dtype=np.float32)
+        self.head = 0
+        self.active = False
+        self.active_since = None
+        self.ratio = 0.0
+        self.frames_in_window = 0
+        self.required_frames = self.min_frames
+        self.last_update = None
+
+    def _window(self, now):
+        """(frames, ratio) over the window ending at ``now`` (caller holds the lock)"""
+        in_window = self.times >= now - self.window_seconds
+        frames = int(np.count_nonzero(in_window))
+        ratio = float(np.count_nonzero(self.scores[in_window] >= 0.5)) / frames if frames else 0.0
+        return frames, ratio
+
+    def _required(self):
+        """Frames needed in the window to activate, scaled to the observed rate (caller holds the lock)"""
+        recent = np.sort(self.times[np.isfinite(self.times)])[-(RATE_SAMPLES + 1):]
+        if len(recent) < 2:
+            return self.min_frames
+        interval = float(np.median(np.diff(recent)))
+        if interval <= 0:
+            return self.min_frames
+        expected = self.window_seconds / interval
+        return min(self.min_frames, max(2, math.ceil(expected * self.on_ratio)))
+
+    def update(self, timestamp, score):
+        """Record one processed frame; returns 'activated', 'deactivated' or None"""
+        with self.lock:
+            self.times[self.head] = timestamp
+            self.scores[self.head] = score
+            self.head = (self.head + 1) % len(self.times)
+            self.last_update = timestamp
+            self.frames_in_window, self.ratio = self._window(timestamp)
+            self.required_frames = self._required()
+            if not self.active and self.frames_in_window >= self.required_frames and self.ratio >= self.on_ratio:
+                self.active = True
+                self.active_since = timestamp
+                return 'activated'
+            if self.active and self.ratio <= self.off_ratio:
+                self.active = False
+                self.active_since = None
+                return 'deactivated'
+            return None
+
+    def expire(self, now=None):
+        """Turn off a gesture whose camera stopped delivering processed frames; returns 'deactivated' or None"""
+        now = time.time() if now is None else now
+        with self.lock:
+            if self.active and (self.last_update is None or now - self.last_update > self.window_seconds):
+                self.active = False
+                self.active_since = None
+                self.frames_in_window, self.ratio = self._window(now)
+                return 'deactivated'
+            return None
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "active": self.active,
+                "active_since": self.active_since,
+                "ratio": round(self.ratio, 3),
+                "frames_in_window": self.frames_in_window,
+                "required_frames": self.required_frames,
+                "window_seconds": self.window_seconds,
+                "last_update": self.last_update,
+            }
@@ -0,0 +1,124 @@
+"""Pool of long-lived MediaPipe Hands graphs for single-image requests.
+
+Building a ``mp.solutions.hands.Hands`` graph costs far more than running it on
+one frame, so request handlers check a pre-built instance out of a ``HandsPool``
+instead of constructing one per request. A graph is only used by one thread at a
+time; one that raised ``ValueError`` (MediaPipe's "graph is broken" error, e.g.
+after a timestamp mismatch) is closed and replaced instead of being returned.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PROCESS_WIDTH = 480  # frames are downscaled to this width before MediaPipe Hands
+
+
+def static_hands_factory(max_num_hands=2, min_detection_confidence=0.5):
+    """Factory for static-image Hands graphs (the settings /detect_frame always used)"""
+    import mediapipe as mp
+
+    def create():
+        return mp.solutions.hands.Hands(
+            static_image_mode=True,
+            max_num_hands=max_num_hands,
+            min_detection_confidence=min_detection_confidence
+        )
+    return create
+
+
+class HandsPool:
+    """Bounded pool of Hands instances, created lazily up to ``size`` and reused"""
+
+    def __init__(self, factory=None, size=None, log_prefix="[Gesture Recognition]"):
+        self.factory = factory or static_hands_factory()
+        self.size = max(1, int(size if size is not None else os.environ.get('GESTURE_HANDS_POOL', 4)))
+        self.log_prefix = log_prefix
+        # Waiters are woken both when an instance comes back and when a discarded one frees capacity
+        self.cond = threading.Condition()
+        self.idle = []  # used as a stack: the most recently used instance stays hot
+        self.created = 0
+        self.recycled = 0
+
+    def warm(self, count=None):
+        """Pre-build ``count`` instances (default: the full pool) so the first requests don't pay for it"""
+        count = self.size if count is None else min(count, self.size)
+        while True:
+            with self.cond:
+                if self.created >= count:
+                    return
+                self.created += 1
+            self._release(self._build())
+
+    def _build(self):
+        """Create an instance for a slot already counted in ``created``"""
+        try:
+            return self.factory()
+        except Exception:
+            with self.cond:
+                self.created -= 1
+                self.cond.notify()
+            raise
+
+    def _acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while True:
+                if self.idle:
+                    return self.idle.pop()
+                if self.created < self.size:
+                    self.created += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("No MediaPipe Hands instance available")
+                self.cond.wait(remaining)
+        return self._build()
+
+    def _release(self, hands):
+        with self.cond:
+            self.idle.append(hands)
+            self.cond.notify()
+
+    def _discard(self, hands):
+        with self.cond:
+            self.created -= 1
+            self.recycled += 1
+            # A waiter can now build the replacement instead of timing out
+            self.cond.notify()
+        try:
+            hands.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def checkout(self, timeout=10.0):
+        """Borrow an instance for one request; a graph that raises ValueError is recycled"""
+        hands = self._acquire(timeout)
+        try:
+            yield hands
+        except ValueError:
+            print(f"{self.log_prefix} Recycling broken MediaPipe Hands graph")
+            self._discard(hands)
+            raise
+        except BaseException:
+            self._release(hands)
+            raise
+        else:
+            self._release(hands)
+
+    def process(self, rgb, timeout=10.0):
+        """Run one RGB frame through a pooled instance"""
+        with self.checkout(timeout) as hands:
+            return hands.process(rgb)
+
+    def stats(self):
+        with self.cond:
+            return {"size": self.size, "created": self.created, "idle": len(self.idle), "recycled": self.recycled}
+
+    def close(self):
+        with self.cond:
+            idle, self.idle = self.idle, []
+        for hands in idle:
+            self._discard(hands)
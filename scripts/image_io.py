@@ -0,0 +1,169 @@
+"""Image upload decoding shared by the detect_frame and registration endpoints.
+
+Clients can send an image three ways:
+
+* a raw ``image/jpeg`` (or ``image/png`` / ``application/octet-stream``) request
+  body, with any other fields in the query string;
+* ``multipart/form-data`` with the image(s) as file parts;
+* the original JSON body with base64 data URLs (kept for compatibility).
+
+Binary uploads are read straight from the request stream into one preallocated
+buffer and handed to ``cv2.imdecode`` without the base64 round trip.
+"""
+
+import base64
+
+import cv2
+import numpy as np
+
+RAW_IMAGE_TYPES = ('image/jpeg', 'image/jpg', 'image/png', 'image/webp', 'application/octet-stream')
+
+# File extensions of the images stored under registered_faces/
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Refuse bodies larger than this (bytes); registration frames are well below it
+MAX_IMAGE_BYTES = 16 * 1024 * 1024
+
+
+class ImageDecodeError(ValueError):
+    """Raised when an uploaded image cannot be read or decoded"""
+
+
+class BatchTooLargeError(ValueError):
+    """Raised when a batch request carries more frames than the endpoint accepts"""
+
+
+def fit_width(frame, width):
+    """``frame`` downscaled to ``width`` pixels wide (aspect kept), or unchanged if it is not wider"""
+    h, w = frame.shape[:2]
+    if w > width:
+        return cv2.resize(frame, (width, int(width * (h / w))))
+    return frame
+
+
+def read_stream(stream, length=None, max_bytes=MAX_IMAGE_BYTES):
+    """Read a binary stream into a uint8 array, using one preallocated buffer when the length is known"""
+    if length:
+        if length > max_bytes:
+            raise ImageDecodeError(f"Image is larger than {max_bytes} bytes")
+        buf = bytearray(length)
+        view = memoryview(buf)
+        filled = 0
+        while filled < length:
+            n = stream.readinto(view[filled:]) if hasattr(stream, 'readinto') else None
+            if n is None:
+                chunk = stream.read(length - filled)
+                n = len(chunk)
+                view[filled:filled + n] = chunk
+            if not n:
+                break
+            filled += n
+        return np.frombuffer(buf, np.uint8, count=filled)
+    data = stream.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise ImageDecodeError(f"Image is larger than {max_bytes} bytes")
+    return np.frombuffer(data, np.uint8)
+
+
+def decode_payload(payload):
+    """Decode a payload (uint8 array, bytes or data-URL / base64 string) into a BGR frame"""
+    if isinstance(payload, str):
+        encoded = payload.split(',', 1)[1] if ',' in payload else payload
+        try:
+            payload = base64.b64decode(encoded)
+        except Exception as e:
+            raise ImageDecodeError(f"Invalid base64 image: {e}")
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        payload = np.frombuffer(payload, np.uint8)
+    if payload is None or payload.size == 0:
+        raise ImageDecodeError("Empty image")
+    frame = cv2.imdecode(payload, cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ImageDecodeError("Could not decode image")
+    return frame
+
+
+def is_raw_image(req):
+    return (req.mimetype or '').lower() in RAW_IMAGE_TYPES
+
+
+def request_fields(req):
+    """Non-image fields of a request: JSON body, form fields or (for raw bodies) the query string"""
+    if is_raw_image(req):
+        return req.args.to_dict()
+    if req.mimetype == 'multipart/form-data' or req.mimetype == 'application/x-www-form-urlencoded':
+        fields = req.args.to_dict()
+        fields.update(req.form.to_dict())
+        return fields
+    return req.get_json(silent=True) or {}
+
+
+def request_image_payloads(req, field):
+    """Undecoded image payloads of a request, in upload order.
+
+    Raw bodies give one payload; multipart gives every file part named ``field``
+    (or every file part if none uses that name); JSON gives the data URL(s) in ``field``.
+    """
+    if is_raw_image(req):
+        return [read_stream(req.stream, req.content_length)]
+    if req.mimetype == 'multipart/form-data':
+        files = req.files.getlist(field) or [f for key in req.files for f in req.files.getlist(key)]
+        payloads = [read_stream(f.stream, f.content_length or None) for f in files]
+        # Data URLs posted as ordinary form fields are accepted too
+        payloads.extend(v for v in req.form.getlist(field) if v)
+        return payloads
+    value = (req.get_json(silent=True) or {}).get(field)
+    if not value:
+        return []
+    return list(value) if isinstance(value, list) else [value]
+
+
+def request_image(req, field='image_data'):
+    """Decode the single image of a request; returns None when the request carries no image"""
+    payloads = request_image_payloads(req, field)
+    if not payloads:
+        return None
+    return decode_payload(payloads[0])
+
+
+def request_frames(req, field='frames', max_frames=None):
+    """Frames of a batch request as dicts with ``payload``, ``timestamp`` and ``camera_id``.
+
+    JSON bodies carry ``{"frames": [{"image_data": ..., "timestamp": ..., "camera_id": ...}, ...]}``
+    (a bare data URL string is also accepted per frame). Multipart bodies carry one
+    ``frames`` file part per frame plus optional repeated ``timestamp`` / ``camera_id``
+    form fields in the same order. With ``max_frames`` the body size and the frame
+    count are checked before any part is read into memory (``BatchTooLargeError``).
+    """
+    if max_frames:
+        # Largest body max_frames images can need (base64 in JSON adds a third), checked before parsing
+        limit = max_frames * (MAX_IMAGE_BYTES * 4 // 3 + 1024)
+        if req.content_length and req.content_length > limit:
+            raise BatchTooLargeError(f"At most {max_frames} frames per batch")
+    if req.mimetype == 'multipart/form-data':
+        files = req.files.getlist(field)
+        if max_frames and len(files) > max_frames:
+            raise BatchTooLargeError(f"At most {max_frames} frames per batch")
+        timestamps = req.form.getlist('timestamp')
+        camera_ids = req.form.getlist('camera_id')
+        frames = []
+        for idx, f in enumerate(files):
+            frames.append({
+                "payload": read_stream(f.stream, f.content_length or None),
+                "timestamp": timestamps[idx] if idx < len(timestamps) else None,
+                "camera_id": camera_ids[idx] if idx < len(camera_ids) else None,
+            })
+        return frames
+    items = (req.get_json(silent=True) or {}).get(field) or []
+    if not isinstance(items, list):
+        raise ValueError(f"{field} must be a list")
+    if max_frames and len(items) > max_frames:
+        raise BatchTooLargeError(f"At most {max_frames} frames per batch")
+    frames = []
+    for item in items:
+        if isinstance(item, dict):
+            frames.append({"payload": item.get('image_data'), "timestamp": item.get('timestamp'),
+                           "camera_id": item.get('camera_id')})
+        else:
+            frames.append({"payload": item, "timestamp": None, "camera_id": None})
+    return frames
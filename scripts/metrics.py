@@ -0,0 +1,188 @@
+"""In-process stage timers with a Prometheus text ``/metrics`` endpoint.
+
+Each server process has one registry. Hot paths record durations with
+``observe_stage('detect', seconds, camera='facial')`` or
+``with stage_timer('jpeg_encode'):``. Samples go into a fixed-size window per
+(stage, labels), and ``/metrics`` reports p50/p95/p99 over that window plus
+running ``_sum`` / ``_count`` totals in Prometheus summary format. Counters and
+gauges cover frame counts and queue depths. Nothing here allocates per sample
+beyond a deque append, so timers can stay on in production.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+QUANTILES = (0.5, 0.95, 0.99)
+WINDOW = 1024  # most recent samples kept per series for quantiles
+
+STAGE_METRIC = "vision_stage_seconds"
+REQUEST_METRIC = "vision_http_request_seconds"
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = []
+    for k, v in pairs:
+        v = str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{k}="{v}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+class _Series:
+    __slots__ = ("samples", "total", "count")
+
+    def __init__(self):
+        self.samples = deque(maxlen=WINDOW)
+        self.total = 0.0
+        self.count = 0
+
+
+class Registry:
+    """Summaries (sliding-window quantiles), counters and gauges keyed by name + labels"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.summaries = {}  # name -> {label_key: _Series}
+        self.counters = {}   # name -> {label_key: float}
+        self.gauges = {}     # name -> {label_key: float or callable}
+        self.help = {}
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            series = self.summaries.setdefault(name, {}).get(key)
+            if series is None:
+                series = self.summaries[name][key] = _Series()
+            series.samples.append(value)
+            series.total += value
+            series.count += 1
+
+    def inc(self, name, value=1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            values = self.counters.setdefault(name, {})
+            values[key] = values.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        """Set a gauge; ``value`` may be a callable evaluated at scrape time"""
+        with self.lock:
+            self.gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def summary(self):
+        """{name: [{labels, count, mean, p50, p95, p99}]} for JSON/debug output"""
+        out = {}
+        with self.lock:
+            items = [(name, key, sorted(s.samples), s.total, s.count)
+                     for name, series in self.summaries.items() for key, s in series.items()]
+        for name, key, samples, total, count in items:
+            row = {"labels": dict(key), "count": count, "mean": total / count if count else None}
+            for q in QUANTILES:
+                row[f"p{int(q * 100)}"] = _quantile(samples, q)
+            out.setdefault(name, []).append(row)
+        return out
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self.lock:
+            summaries = {name: [(key, sorted(s.samples), s.total, s.count) for key, s in series.items()]
+                         for name, series in self.summaries.items()}
+            counters = {name: dict(values) for name, values in self.counters.items()}
+            gauges = {name: dict(values) for name, values in self.gauges.items()}
+
+        for name in sorted(summaries):
+            lines.append(f"# HELP {name} {self.help.get(name, name)}")
+            lines.append(f"# TYPE {name} summary")
+            for key, samples, total, count in summaries[name]:
+                for q in QUANTILES:
+                    value = _quantile(samples, q)
+                    lines.append(f"{name}{_format_labels(key, [('quantile', q)])} {value if value is not None else 'NaN'}")
+                lines.append(f"{name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+        for name in sorted(counters):
+            lines.append(f"# HELP {name} {self.help.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in counters[name].items():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        for name in sorted(gauges):
+            lines.append(f"# HELP {name} {self.help.get(name, name)}")
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in gauges[name].items():
+                try:
+                    value = value() if callable(value) else value
+                except Exception:
+                    value = float('nan')
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _quantile(sorted_samples, q):
+    if not sorted_samples:
+        return None
+    idx = min(len(sorted_samples) - 1, int(round(q * (len(sorted_samples) - 1))))
+    return sorted_samples[idx]
+
+
+REGISTRY = Registry()
+REGISTRY.describe(STAGE_METRIC, "Duration of pipeline stages in seconds")
+REGISTRY.describe(REQUEST_METRIC, "HTTP request handling time in seconds (time to first byte for streams)")
+
+
+def observe_stage(stage, seconds, camera=None):
+    REGISTRY.observe(STAGE_METRIC, seconds, stage=stage, camera=camera)
+
+
+def stage_timer(stage, camera=None):
+    return REGISTRY.timer(STAGE_METRIC, stage=stage, camera=camera)
+
+
+def inc(name, value=1, **labels):
+    REGISTRY.inc(name, value, **labels)
+
+
+def set_gauge(name, value, **labels):
+    REGISTRY.set_gauge(name, value, **labels)
+
+
+def install(app, registry=REGISTRY):
+    """Time every request per endpoint and serve ``GET /metrics`` on a Flask app"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = getattr(g, '_metrics_start', None)
+        if start is not None and request.endpoint != 'metrics':
+            registry.observe(REQUEST_METRIC, time.perf_counter() - start,
+                             endpoint=request.endpoint or 'unknown', method=request.method,
+                             status=response.status_code)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus metrics"""
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return app
@@ -0,0 +1,88 @@
+"""Cheap change detection in front of the expensive detection models.
+
+``MotionGate.should_run(image)`` shrinks the frame to ``MOTION_WIDTH`` pixels
+wide, converts it to blurred grayscale and compares it against a running-average
+background. The model only runs when more than ``MOTION_MIN_AREA`` of the pixels
+changed by at least ``MOTION_THRESHOLD`` grey levels, when a face or hand was in
+the previous result (people standing still must keep being recognised), or when
+``MOTION_KEEPALIVE_SECONDS`` passed since the last run. On empty corridors this
+skips most HOG / MediaPipe calls for a fraction of a millisecond per frame.
+
+Decisions are counted in ``vision_motion_frames_total{camera, decision}``, and
+``vision_motion_skip_ratio{camera}`` reports the share of gated frames that were
+skipped.
+"""
+
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import metrics
+
+BACKGROUND_ALPHA = 0.05  # weight of each new frame in the running-average background
+
+
+class MotionGate:
+    """Per-camera frame-differencing gate with a periodic keep-alive"""
+
+    def __init__(self, camera, enabled=None, threshold=None, min_area=None, keepalive=None, width=None):
+        self.camera = camera
+        self.enabled = (os.environ.get('MOTION_GATE', '1') != '0') if enabled is None else enabled
+        self.threshold = float(threshold if threshold is not None else os.environ.get('MOTION_THRESHOLD', 15))
+        self.min_area = float(min_area if min_area is not None else os.environ.get('MOTION_MIN_AREA', 0.005))
+        self.keepalive = float(keepalive if keepalive is not None else os.environ.get('MOTION_KEEPALIVE_SECONDS', 2.0))
+        self.width = int(width if width is not None else os.environ.get('MOTION_WIDTH', 96))
+        self.lock = threading.Lock()
+        self.background = None
+        self.last_run = 0.0
+        self.changed = 0.0  # changed-pixel fraction of the last frame
+        self.counts = {"run": 0, "skip": 0}
+        metrics.set_gauge('vision_motion_skip_ratio', self.skip_ratio, camera=camera)
+
+    def _small_gray(self, image):
+        h, w = image.shape[:2]
+        height = max(1, int(round(h * self.width / w)))
+        # INTER_LINEAR is ~30x cheaper than INTER_AREA at non-integer ratios; the blur below absorbs the aliasing
+        small = cv2.resize(image, (self.width, height), interpolation=cv2.INTER_LINEAR)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def should_run(self, image, subject_present=False, now=None):
+        """True if the model should run on this frame; always updates the background"""
+        if not self.enabled:
+            return True
+        now = time.time() if now is None else now
+        start = time.perf_counter()
+        gray = self._small_gray(image)
+        with self.lock:
+            if self.background is None or self.background.shape != gray.shape:
+                self.background = gray.astype(np.float32)
+                moved = True
+            else:
+                diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+                self.changed = cv2.countNonZero((diff >= self.threshold).view(np.uint8)) / diff.size
+                moved = self.changed > self.min_area
+                cv2.accumulateWeighted(gray, self.background, BACKGROUND_ALPHA)
+            run = moved or subject_present or now - self.last_run >= self.keepalive
+            if run:
+                self.last_run = now
+            decision = "run" if run else "skip"
+            self.counts[decision] += 1
+        metrics.observe_stage('motion', time.perf_counter() - start, camera=self.camera)
+        metrics.inc('vision_motion_frames_total', camera=self.camera, decision=decision)
+        return run
+
+    def skip_ratio(self):
+        total = self.counts["run"] + self.counts["skip"]
+        return self.counts["skip"] / total if total else 0.0
+
+    def snapshot(self):
+        return {
+            "enabled": self.enabled,
+            "changed": round(self.changed, 4),
+            "skip_ratio": round(self.skip_ratio(), 3),
+        }
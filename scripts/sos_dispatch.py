@@ -0,0 +1,199 @@
+"""Background delivery of SOS incidents to the Next.js API.
+
+``trigger_sos_event`` used to POST the incident and the responder notification
+inline, so a slow API stalled the video stream for up to 10 s at the moment an
+SOS was happening. ``SOSDispatcher`` takes those posts off the caller's thread:
+
+* ``enqueue()`` only appends to an in-memory queue;
+* one worker thread delivers jobs in order over a keep-alive ``requests.Session``;
+* connection errors and 5xx responses are retried with exponential backoff;
+* jobs that still fail are written to an on-disk spool directory and replayed
+  periodically (and on the next start), so an outage does not lose incidents.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+
+class SOSDispatcher:
+    """Queue + worker that POSTs JSON payloads with retry and an on-disk spool"""
+
+    def __init__(self, base_url=None, spool_dir=None, retries=None, backoff=None,
+                 timeout=5.0, max_queue=1000, log_prefix="[SOS Dispatch]"):
+        self.base_url = (base_url or os.environ.get('SOS_API_URL', 'http://localhost:3000')).rstrip('/')
+        self.spool_dir = spool_dir or os.environ.get('SOS_SPOOL_DIR') or os.path.join(
+            os.path.dirname(__file__), '..', '.sos_spool')
+        self.retries = int(retries if retries is not None else os.environ.get('SOS_DISPATCH_RETRIES', 3))
+        self.backoff = float(backoff if backoff is not None else os.environ.get('SOS_DISPATCH_BACKOFF', 0.5))
+        self.replay_interval = float(os.environ.get('SOS_SPOOL_REPLAY_SECONDS', 60))
+        self.timeout = timeout
+        self.log_prefix = log_prefix
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.replaying = set()  # spooled job ids currently queued for another attempt
+        self.latencies = deque(maxlen=200)  # enqueue -> delivered, seconds
+        self.counters = {"enqueued": 0, "delivered": 0, "retries": 0, "spooled": 0, "dropped": 0}
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="sos-dispatch", daemon=True)
+            self.thread.start()
+        return self
+
+    def enqueue(self, path, payload):
+        """Queue a POST of ``payload`` to ``path``; never blocks the caller"""
+        job = {"id": uuid.uuid4().hex, "path": path, "payload": payload, "created": time.time()}
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            # Keep it on disk rather than dropping it; the replay loop will pick it up
+            print(f"{self.log_prefix} Queue full; spooling {path}")
+            self._spool(job)
+            return False
+        with self.lock:
+            self.counters["enqueued"] += 1
+        return True
+
+    def _run(self):
+        self._replay_spool()
+        last_replay = time.time()
+        while not self.stop_event.is_set():
+            try:
+                job = self.queue.get(timeout=1.0)
+            except queue.Empty:
+                job = None
+            if job is not None:
+                self._deliver(job)
+            if time.time() - last_replay >= self.replay_interval and self.queue.empty():
+                self._replay_spool()
+                last_replay = time.time()
+
+    def _deliver(self, job):
+        url = self.base_url + job["path"]
+        for attempt in range(self.retries + 1):
+            if attempt:
+                with self.lock:
+                    self.counters["retries"] += 1
+                if self.stop_event.wait(min(30.0, self.backoff * (2 ** (attempt - 1)))):
+                    break
+            try:
+                resp = self.session.post(url, json=job["payload"], timeout=self.timeout)
+            except requests.RequestException as e:
+                print(f"{self.log_prefix} POST {job['path']} failed (attempt {attempt + 1}): {e}")
+                continue
+            if resp.status_code >= 500:
+                print(f"{self.log_prefix} POST {job['path']} returned {resp.status_code} (attempt {attempt + 1})")
+                continue
+            if resp.status_code >= 400:
+                # The API rejected the payload itself; retrying will not help
+                print(f"{self.log_prefix} POST {job['path']} rejected with {resp.status_code}; dropping")
+                with self.lock:
+                    self.counters["dropped"] += 1
+                self._forget(job)
+                return False
+            print(f"{self.log_prefix} POST {job['path']} status: {resp.status_code}")
+            latency = time.time() - job["created"]
+            with self.lock:
+                self.counters["delivered"] += 1
+                self.latencies.append(latency)
+            metrics.observe_stage('sos_dispatch', latency)
+            self._forget(job)
+            return True
+        self._spool(job)
+        return False
+
+    def _spool_path(self, job_id):
+        return os.path.join(self.spool_dir, f"{job_id}.json")
+
+    def _spool(self, job):
+        """Persist an undelivered job so it survives restarts"""
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            path = self._spool_path(job["id"])
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(job, f)
+            os.replace(tmp_path, path)
+            with self.lock:
+                self.counters["spooled"] += 1
+                self.replaying.discard(job["id"])
+            print(f"{self.log_prefix} Spooled undelivered {job['path']} to {path}")
+        except Exception as e:
+            with self.lock:
+                self.counters["dropped"] += 1
+            print(f"{self.log_prefix} Failed to spool {job['path']}: {e}")
+
+    def _forget(self, job):
+        with self.lock:
+            self.replaying.discard(job["id"])
+        try:
+            os.remove(self._spool_path(job["id"]))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"{self.log_prefix} Failed to remove spooled job {job['id']}: {e}")
+
+    def _replay_spool(self):
+        """Queue spooled jobs (oldest first) for another delivery attempt"""
+        try:
+            names = [n for n in os.listdir(self.spool_dir) if n.endswith('.json')]
+        except FileNotFoundError:
+            return
+        jobs = []
+        for name in names:
+            try:
+                with open(os.path.join(self.spool_dir, name), encoding='utf-8') as f:
+                    jobs.append(json.load(f))
+            except Exception as e:
+                print(f"{self.log_prefix} Skipping unreadable spool file {name}: {e}")
+        for job in sorted(jobs, key=lambda j: j.get("created", 0)):
+            with self.lock:
+                if job["id"] in self.replaying:
+                    continue
+                self.replaying.add(job["id"])
+            try:
+                self.queue.put_nowait(job)
+            except queue.Full:
+                with self.lock:
+                    self.replaying.discard(job["id"])
+                return
+        if jobs:
+            print(f"{self.log_prefix} Replaying {len(jobs)} spooled job(s)")
+
+    def metrics(self):
+        """Queue depth, delivery counters and enqueue-to-delivery latency"""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            stats = dict(self.counters)
+        try:
+            spool_depth = sum(1 for n in os.listdir(self.spool_dir) if n.endswith('.json'))
+        except FileNotFoundError:
+            spool_depth = 0
+        stats.update({
+            "queue_depth": self.queue.qsize(),
+            "spool_depth": spool_depth,
+            "latency_ms_p50": latencies[len(latencies) // 2] * 1000.0 if latencies else None,
+            "latency_ms_max": latencies[-1] * 1000.0 if latencies else None,
+        })
+        return stats
+
+    def stop(self, timeout=2.0):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=timeout)
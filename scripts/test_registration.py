@@ -4,6 +4,7 @@ Run with:
     python scripts/test_registration.py --name Test_User
 
 It will create 4 small images in memory, send them as data URLs and print server responses.
+Add --multipart to upload them as binary multipart file parts instead.
 """
 
 import argparse
@@ -25,7 +26,10 @@ def make_dummy_image(seed=0):
     d.ellipse((70, 80, 90, 100), fill=(200, 100, 100))
     buf = io.BytesIO()
     img.save(buf, format='JPEG')
-    b = buf.getvalue()
+    return buf.getvalue()
+
+
+def to_data_url(b):
     return 'data:image/jpeg;base64,' + base64.b64encode(b).decode('ascii')
 
 
@@ -33,16 +37,21 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--name', default='Test_User')
     parser.add_argument('--host', default='http://localhost:5002')
+    parser.add_argument('--multipart', action='store_true', help='send binary multipart uploads instead of data URLs')
     args = parser.parse_args()
 
     images = [make_dummy_image(i) for i in range(4)]
-    payload = {
-        'name': args.name,
-        'responder_id': None,
-        'images': images
-    }
     try:
-        resp = requests.post(args.host + '/api/registration/register', json=payload, timeout=15)
+        if args.multipart:
+            files = [('images', (f'image_{i}.jpg', b, 'image/jpeg')) for i, b in enumerate(images)]
+            resp = requests.post(args.host + '/api/registration/register', data={'name': args.name}, files=files, timeout=15)
+        else:
+            payload = {
+                'name': args.name,
+                'responder_id': None,
+                'images': [to_data_url(b) for b in images]
+            }
+            resp = requests.post(args.host + '/api/registration/register', json=payload, timeout=15)
         try:
             data = resp.json()
         except Exception: